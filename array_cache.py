@@ -0,0 +1,261 @@
+import heapq
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+NIL = -1
+NO_EXPIRY = float('inf')
+
+
+class ArrayLRUCache:
+    """
+    Thread-safe LRU cache with TTL support that stores its list in
+    preallocated arrays instead of Node objects.
+
+    Slot i holds keys[i], values[i], expires[i] and the prev/next slot
+    indices of the recency list. Free slots are chained through next_.
+    The arrays hold plain numbers, so per-entry overhead is a few machine
+    words and the cyclic GC has no per-entry objects to traverse. Same
+    put/get/delete/clear/get_stats/get_all API as ThreadSafeLRUCache.
+    """
+    def __init__(self, max_size: int = 1000, default_ttl: Optional[int] = None, cleanup_interval: int = 10):
+        """
+        Initialize the cache and preallocate max_size slots.
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.cleanup_interval = cleanup_interval
+        self.lock = threading.RLock()
+        self.index: Dict[str, int] = {}
+        self.keys: List[Optional[str]] = [None] * max_size
+        self.values: List[Any] = [None] * max_size
+        self.expires = array('d', [NO_EXPIRY]) * max_size
+        self.prev = array('q', [NIL]) * max_size
+        self.next_ = array('q', range(1, max_size + 1))
+        self.next_[max_size - 1] = NIL
+        self.free = 0
+        self.head = NIL
+        self.tail = NIL
+        self.size = 0
+        # Min-heap of (expire_at, slot); entries are invalidated lazily
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'total_requests': 0,
+            'evictions': 0,
+            'expired_removals': 0
+        }
+        self._stop_event = threading.Event()
+        self._cleanup_thread = threading.Thread(target=self._cleanup_expired_keys, daemon=True)
+        self._cleanup_thread.start()
+
+    def put(self, key: str, value: Any, ttl: Optional[int] = None):
+        """
+        Store a key-value pair with optional TTL (in seconds).
+        """
+        expire_at = NO_EXPIRY
+        if ttl is not None:
+            expire_at = time.time() + ttl
+        elif self.default_ttl is not None:
+            expire_at = time.time() + self.default_ttl
+        with self.lock:
+            slot = self.index.get(key)
+            if slot is not None:
+                self.values[slot] = value
+                self.expires[slot] = expire_at
+                self._move_to_head(slot)
+            else:
+                if self.size >= self.max_size:
+                    self._evict_lru()
+                slot = self.free
+                self.free = self.next_[slot]
+                self.keys[slot] = key
+                self.values[slot] = value
+                self.expires[slot] = expire_at
+                self.index[key] = slot
+                self._add_to_head(slot)
+                self.size += 1
+            if expire_at != NO_EXPIRY:
+                self._schedule_expiry(slot, expire_at)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retrieve a value by key and update access order.
+        """
+        with self.lock:
+            self.stats['total_requests'] += 1
+            slot = self.index.get(key)
+            if slot is None:
+                self.stats['misses'] += 1
+                return None
+            if self.expires[slot] < time.time():
+                self._remove_slot(slot)
+                self.stats['misses'] += 1
+                self.stats['expired_removals'] += 1
+                return None
+            self._move_to_head(slot)
+            self.stats['hits'] += 1
+            return self.values[slot]
+
+    def delete(self, key: str):
+        """
+        Remove a key from cache.
+        """
+        with self.lock:
+            slot = self.index.get(key)
+            if slot is not None:
+                self._remove_slot(slot)
+
+    def clear(self):
+        """
+        Clear the entire cache and return every slot to the free list.
+        """
+        with self.lock:
+            self.index.clear()
+            for slot in range(self.max_size):
+                self.keys[slot] = None
+                self.values[slot] = None
+                self.expires[slot] = NO_EXPIRY
+                self.prev[slot] = NIL
+                self.next_[slot] = slot + 1
+            self.next_[self.max_size - 1] = NIL
+            self.free = 0
+            self.head = NIL
+            self.tail = NIL
+            self.size = 0
+            self._expiry_heap.clear()
+
+    def get_stats(self) -> dict:
+        """
+        Return cache statistics.
+        """
+        with self.lock:
+            total = self.stats['total_requests']
+            hits = self.stats['hits']
+            misses = self.stats['misses']
+            hit_rate = hits / total if total > 0 else 0.0
+            return {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hit_rate, 4),
+                'total_requests': total,
+                'current_size': self.size,
+                'evictions': self.stats['evictions'],
+                'expired_removals': self.stats['expired_removals']
+            }
+
+    def get_all(self):
+        """
+        Return all non-expired items as a list of dicts: {"key": ..., "value": ...}
+        """
+        with self.lock:
+            now = time.time()
+            result = []
+            slot = self.head
+            while slot != NIL:
+                if self.expires[slot] > now:
+                    result.append({"key": self.keys[slot], "value": self.values[slot]})
+                slot = self.next_[slot]
+            return result
+
+    def _evict_lru(self):
+        """
+        Evict the least recently used item.
+        """
+        if self.tail != NIL:
+            self._remove_slot(self.tail)
+            self.stats['evictions'] += 1
+
+    def _unlink(self, slot: int):
+        """
+        Detach a slot from the recency list.
+        """
+        prev, nxt = self.prev[slot], self.next_[slot]
+        if prev != NIL:
+            self.next_[prev] = nxt
+        else:
+            self.head = nxt
+        if nxt != NIL:
+            self.prev[nxt] = prev
+        else:
+            self.tail = prev
+
+    def _add_to_head(self, slot: int):
+        """
+        Link a slot at the head (most recently used) of the list.
+        """
+        self.prev[slot] = NIL
+        self.next_[slot] = self.head
+        if self.head != NIL:
+            self.prev[self.head] = slot
+        self.head = slot
+        if self.tail == NIL:
+            self.tail = slot
+
+    def _move_to_head(self, slot: int):
+        """
+        Move a slot to the head (most recently used).
+        """
+        if slot != self.head:
+            self._unlink(slot)
+            self._add_to_head(slot)
+
+    def _remove_slot(self, slot: int):
+        """
+        Unlink a slot, drop its key and value and push it on the free list.
+        """
+        self._unlink(slot)
+        del self.index[self.keys[slot]]
+        self.keys[slot] = None
+        self.values[slot] = None
+        self.expires[slot] = NO_EXPIRY
+        self.prev[slot] = NIL
+        self.next_[slot] = self.free
+        self.free = slot
+        self.size -= 1
+
+    def _schedule_expiry(self, slot: int, expire_at: float):
+        """
+        Index a slot by its expiry time. A heap entry is stale once the slot's
+        expire_at no longer matches it; stale entries are skipped when popped
+        and the heap is rebuilt once they dominate it.
+        """
+        heapq.heappush(self._expiry_heap, (expire_at, slot))
+        if len(self._expiry_heap) > 2 * self.size + 64:
+            self._expiry_heap = [(self.expires[s], s) for s in self.index.values()
+                                 if self.expires[s] != NO_EXPIRY]
+            heapq.heapify(self._expiry_heap)
+
+    def _remove_expired(self, now: float) -> int:
+        """
+        Pop expired heap entries and remove the slots they still describe.
+        """
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] < now:
+            expire_at, slot = heapq.heappop(heap)
+            if self.keys[slot] is not None and self.expires[slot] == expire_at:
+                self._remove_slot(slot)
+                self.stats['expired_removals'] += 1
+                removed += 1
+        return removed
+
+    def _cleanup_expired_keys(self):
+        """
+        Background thread to clean up expired keys.
+        """
+        while not self._stop_event.is_set():
+            with self.lock:
+                self._remove_expired(time.time())
+            self._stop_event.wait(self.cleanup_interval)
+
+    def stop_cleanup_thread(self):
+        """
+        Stop the background cleanup thread (for testing/teardown).
+        """
+        self._stop_event.set()
+        self._cleanup_thread.join()
@@ -0,0 +1,73 @@
+"""
+Batch get_many/put_many/delete_many against loops of single calls.
+
+Usage: python benchmarks/bench_batch.py [--batch 100] [--rounds 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+
+def timed(fn, rounds: int) -> float:
+    """
+    Return the mean time of fn() in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=100, help="keys per batch")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    cache = ThreadSafeLRUCache(max_size=args.batch * 10, default_ttl=300)
+    keys = [f"key{i}" for i in range(args.batch)]
+    mapping = {key: i for i, key in enumerate(keys)}
+
+    def put_loop():
+        for key, value in mapping.items():
+            cache.put(key, value)
+
+    def get_loop():
+        for key in keys:
+            cache.get(key)
+
+    def delete_loop():
+        for key in keys:
+            cache.delete(key)
+
+    def delete_batch():
+        cache.delete_many(keys)
+        cache.put_many(mapping)
+
+    def delete_single():
+        delete_loop()
+        cache.put_many(mapping)
+
+    cache.put_many(mapping)
+    rows = [
+        ("put", timed(put_loop, args.rounds), timed(lambda: cache.put_many(mapping), args.rounds)),
+        ("get", timed(get_loop, args.rounds), timed(lambda: cache.get_many(keys), args.rounds)),
+        # Both delete variants refill the cache with put_many after deleting
+        ("delete", timed(delete_single, args.rounds), timed(delete_batch, args.rounds)),
+    ]
+    cache.stop_cleanup_thread()
+
+    print(f"batch of {args.batch} keys, mean us per batch")
+    print(f"{'op':>8} {'single calls':>14} {'batch call':>12} {'speedup':>8}")
+    for op, single, batch in rows:
+        print(f"{op:>8} {single:>14.1f} {batch:>12.1f} {single / batch:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
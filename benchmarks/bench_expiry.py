@@ -0,0 +1,77 @@
+"""
+Expiry sweep cost of the full-list scan, the min-heap and the timing wheel.
+
+Each cache is filled with TTLs spread over 1-300 s, then one sweep is run as
+if the clock had moved forward 4 s (about 1% of keys expired).
+
+Usage: python benchmarks/bench_expiry.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+ENGINES = ["scan", "heap", "wheel"]
+
+
+def full_scan(cache: ThreadSafeLRUCache, now: float) -> int:
+    """
+    The original _cleanup_expired_keys body: walk every node from the LRU tail.
+    """
+    removed = 0
+    node = cache._policy.tail
+    while node:
+        prev = node.prev
+        if node.expire_at is not None and node.expire_at < now:
+            cache._remove_node(node)
+            removed += 1
+        node = prev
+    return removed
+
+
+def run(engine: str, size: int, seed: int = 0):
+    """
+    Return (put seconds, sweep seconds, keys removed) for one engine.
+    """
+    rng = random.Random(seed)
+    ttls = [rng.uniform(1, 300) for _ in range(size)]
+    cache = ThreadSafeLRUCache(max_size=size, cleanup_interval=3600,
+                               expiry="heap" if engine == "scan" else engine)
+    start = time.perf_counter()
+    for i, ttl in enumerate(ttls):
+        cache.put(f"key{i}", i, ttl=ttl)
+    put_time = time.perf_counter() - start
+
+    now = time.time() + 4
+    start = time.perf_counter()
+    with cache.lock:
+        if engine == "scan":
+            removed = full_scan(cache, now)
+        else:
+            removed = cache._remove_expired(now)
+    sweep_time = time.perf_counter() - start
+    cache.stop_cleanup_thread()
+    return put_time, sweep_time, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'entries':>10} {'engine':>7} {'put us/op':>10} {'sweep ms':>10} {'removed':>8}")
+    for size in args.sizes:
+        for engine in ENGINES:
+            put_time, sweep_time, removed = run(engine, size)
+            print(f"{size:>10,} {engine:>7} {put_time / size * 1e6:>10.2f} "
+                  f"{sweep_time * 1e3:>10.2f} {removed:>8,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Total miss cost of cost-aware GDSF eviction against LRU and LFU.
+
+Every key is given a recompute cost: most are cheap (2 ms) and a fraction
+are expensive (2 s). The Zipf trace is replayed as get-then-put-on-miss
+with put(..., cost=) and the cost of every miss is added up.
+
+Usage: python benchmarks/bench_gdsf.py [--length 200000] [--keys 10000] [--capacity 1000]
+"""
+import argparse
+import os
+import random
+import sys
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from traces import zipf_trace
+
+# The first policy is the baseline for the "saved" column
+POLICIES = ["lru", "lfu", "gdsf"]
+CHEAP_MS = 2.0
+EXPENSIVE_MS = 2000.0
+
+
+def key_costs(num_keys: int, expensive_fraction: float, seed: int = 0) -> dict:
+    """
+    Assign each key a recompute cost in milliseconds.
+    """
+    rng = random.Random(seed)
+    return {f"key{i}": EXPENSIVE_MS if rng.random() < expensive_fraction else CHEAP_MS
+            for i in range(num_keys)}
+
+
+def simulate(policy: str, trace, costs: dict, capacity: int):
+    """
+    Replay a trace and return (hit ratio, total miss cost in seconds).
+    """
+    cache = ThreadSafeLRUCache(max_size=capacity, cleanup_interval=3600, policy=policy)
+    hits = 0
+    miss_cost = 0.0
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            miss_cost += costs[key]
+            cache.put(key, key, cost=costs[key])
+    cache.stop_cleanup_thread()
+    return hits / len(trace), miss_cost / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--length", type=int, default=200_000, help="requests per trace")
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct Zipf keys")
+    parser.add_argument("--capacity", type=int, default=1000, help="cache max_size")
+    parser.add_argument("--expensive", type=float, default=0.1, help="fraction of expensive keys")
+    args = parser.parse_args()
+
+    trace = zipf_trace(args.length, args.keys, alpha=0.9)
+    costs = key_costs(args.keys, args.expensive)
+    print(f"{'policy':>8} {'hit ratio':>10} {'miss cost s':>12} {'saved vs lru':>13}")
+    baseline = None
+    for policy in POLICIES:
+        hit_ratio, miss_cost = simulate(policy, trace, costs, args.capacity)
+        if baseline is None:
+            baseline = miss_cost
+        saved = (1 - miss_cost / baseline) * 100 if baseline else 0.0
+        print(f"{policy:>8} {hit_ratio:>10.4f} {miss_cost:>12,.1f} {saved:>12.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Backend calls per expiry when concurrent HTTP requests miss on a hot key,
+with a naive get-then-load endpoint vs one using aget_or_load.
+
+Requests go through a FastAPI app in-process via httpx's ASGI transport.
+Each round clears the cache (as if the key had just expired) and fires
+--concurrency requests at once; the backend takes --latency seconds.
+Requires fastapi and httpx, both in requirements.txt.
+
+Usage: python benchmarks/bench_http_stampede.py [--concurrency 100] [--rounds 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+MODES = ["naive", "coalesced"]
+
+
+def build_app(cache: ThreadSafeLRUCache, latency: float, backend_calls: list) -> FastAPI:
+    """
+    Return an app whose endpoints read one key through the cache.
+    """
+    app = FastAPI()
+
+    async def backend(key: str) -> str:
+        backend_calls.append(key)
+        await asyncio.sleep(latency)
+        return f"value-{key}"
+
+    @app.get("/naive/{key}")
+    async def naive(key: str):
+        value = cache.get(key)
+        if value is None:
+            value = await backend(key)
+            cache.put(key, value, ttl=60)
+        return {"key": key, "value": value}
+
+    @app.get("/coalesced/{key}")
+    async def coalesced(key: str):
+        return {"key": key, "value": await cache.aget_or_load(key, backend, ttl=60)}
+
+    return app
+
+
+async def run(mode: str, concurrency: int, rounds: int, latency: float):
+    """
+    Return (backend calls per expiry, mean round seconds) for one endpoint.
+    """
+    cache = ThreadSafeLRUCache(max_size=1000, cleanup_interval=3600)
+    backend_calls = []
+    app = build_app(cache, latency, backend_calls)
+    elapsed = 0.0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(rounds):
+            cache.clear()
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(client.get(f"/{mode}/hot") for _ in range(concurrency)))
+            elapsed += time.perf_counter() - start
+            assert all(response.status_code == 200 for response in responses)
+    cache.stop_cleanup_thread()
+    return len(backend_calls) / rounds, elapsed / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100, help="simultaneous requests per round")
+    parser.add_argument("--rounds", type=int, default=10, help="expiries to simulate")
+    parser.add_argument("--latency", type=float, default=0.05, help="backend latency in seconds")
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent requests per expiry, {args.rounds} expiries")
+    print(f"{'endpoint':>10} {'backend calls/expiry':>21} {'round ms':>9}")
+    for mode in MODES:
+        calls, seconds = asyncio.run(run(mode, args.concurrency, args.rounds, args.latency))
+        print(f"{mode:>10} {calls:>21.1f} {seconds * 1e3:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
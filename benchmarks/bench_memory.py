@@ -0,0 +1,73 @@
+"""
+Bytes per entry and gen2 GC pause of the Node-based cache vs ArrayLRUCache.
+
+Keys and values are created before measuring so that only the cache's own
+structures are counted.
+
+Usage: python benchmarks/bench_memory.py [--entries 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from array_cache import ArrayLRUCache
+from cache import ThreadSafeLRUCache
+
+IMPLEMENTATIONS = [("node", ThreadSafeLRUCache), ("array", ArrayLRUCache)]
+
+
+def bytes_per_entry(cls, keys, values) -> float:
+    """
+    Fill a cache under tracemalloc and return allocated bytes per entry.
+    """
+    gc.collect()
+    tracemalloc.start()
+    cache = cls(max_size=len(keys), default_ttl=3600, cleanup_interval=3600)
+    for key, value in zip(keys, values):
+        cache.put(key, value)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cache.stop_cleanup_thread()
+    return current / len(keys)
+
+
+def gen2_pause(cls, keys, values, rounds: int = 5) -> float:
+    """
+    Fill a cache and return the median full collection time in milliseconds.
+    """
+    cache = cls(max_size=len(keys), default_ttl=3600, cleanup_interval=3600)
+    for key, value in zip(keys, values):
+        cache.put(key, value)
+    pauses = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        gc.collect(2)
+        pauses.append((time.perf_counter() - start) * 1000)
+    cache.stop_cleanup_thread()
+    del cache
+    gc.collect()
+    return sorted(pauses)[rounds // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    keys = [f"key{i}" for i in range(args.entries)]
+    values = list(range(args.entries))
+    print(f"{args.entries:,} entries")
+    print(f"{'storage':>8} {'bytes/entry':>12} {'gen2 pause ms':>14}")
+    for name, cls in IMPLEMENTATIONS:
+        print(f"{name:>8} {bytes_per_entry(cls, keys, values):>12.1f} "
+              f"{gen2_pause(cls, keys, values):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
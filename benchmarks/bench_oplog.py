@@ -0,0 +1,84 @@
+"""
+put throughput and latency with the operation log under each fsync policy,
+against a cache without one, plus the time to replay the log.
+
+Several threads put into a shared cache; group commit shows up as many
+records per batch (and, with fsync='always', per fsync).
+
+Usage: python benchmarks/bench_oplog.py [--puts 20000] [--threads 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+MODES = ["off", "no", "everysec", "always"]
+
+
+def run(mode: str, args, directory: str):
+    """
+    Return (puts/s, p99 put us, stats, replay seconds) for one mode.
+    """
+    path = os.path.join(directory, f"{mode}.log")
+    options = {} if mode == "off" else {"oplog_path": path, "oplog_fsync": mode}
+    cache = ThreadSafeLRUCache(max_size=args.keys, cleanup_interval=3600, **options)
+    per_thread = args.puts // args.threads
+    latencies = [[] for _ in range(args.threads)]
+
+    def writer(n: int):
+        samples = latencies[n]
+        for i in range(per_thread):
+            start = time.perf_counter()
+            cache.put(f"key{(n * per_thread + i) % args.keys}", {"n": n, "i": i})
+            samples.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(args.threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cache.stop_cleanup_thread()
+    stats = cache.get_stats()
+
+    replay_time = 0.0
+    if mode != "off":
+        start = time.perf_counter()
+        restored = ThreadSafeLRUCache(max_size=args.keys, cleanup_interval=3600, oplog_path=path)
+        replay_time = time.perf_counter() - start
+        restored.stop_cleanup_thread()
+    samples = sorted(s for thread_samples in latencies for s in thread_samples)
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    return per_thread * args.threads / elapsed, p99, stats, replay_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--puts", type=int, default=20_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.puts:,} puts from {args.threads} threads over {args.keys:,} keys")
+    print(f"{'fsync':>9} {'puts/s':>9} {'p99 us':>8} {'batches':>8} {'recs/batch':>11} "
+          f"{'fsyncs':>7} {'log MB':>7} {'replay s':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in MODES:
+            rate, p99, stats, replay_time = run(mode, args, directory)
+            batches = stats.get("oplog_batches", 0)
+            per_batch = stats.get("oplog_records", 0) / batches if batches else 0.0
+            print(f"{mode:>9} {rate:>9,.0f} {p99:>8.1f} {batches:>8,} {per_batch:>11.1f} "
+                  f"{stats.get('oplog_fsyncs', 0):>7,} {stats.get('oplog_bytes', 0) / 1e6:>7.2f} "
+                  f"{replay_time:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
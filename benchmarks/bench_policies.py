@@ -0,0 +1,84 @@
+"""
+Hit ratio and replay throughput of the eviction policies on Zipf,
+scan-heavy and phase-shifting (recency/frequency) traces, plus
+multi-threaded throughput on the Zipf trace.
+
+Usage: python benchmarks/bench_policies.py [--length 200000] [--keys 10000] [--capacity 1000]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from traces import phase_trace, replay, scan_trace, zipf_trace
+
+# The first policy is the baseline for the "vs lru" column
+POLICIES = ["lru", "clock", "tinylfu", "arc", "s3fifo", "lfu"]
+THREAD_COUNTS = [1, 4, 16]
+
+
+def threaded_throughput(policy: str, num_threads: int, trace, capacity: int) -> float:
+    """
+    Replay a trace split across threads against one cache; return ops/sec.
+    """
+    cache = ThreadSafeLRUCache(max_size=capacity, policy=policy)
+    chunk = len(trace) // num_threads
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(part):
+        barrier.wait()
+        replay(cache, part)
+
+    threads = [threading.Thread(target=worker, args=(trace[i * chunk:(i + 1) * chunk],))
+               for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cache.stop_cleanup_thread()
+    return chunk * num_threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--length", type=int, default=200_000, help="requests per trace")
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct Zipf keys")
+    parser.add_argument("--capacity", type=int, default=1000, help="cache max_size")
+    args = parser.parse_args()
+
+    traces = {
+        "zipf-0.9": zipf_trace(args.length, args.keys, alpha=0.9),
+        "zipf+scan": scan_trace(args.length, args.keys, alpha=0.9),
+        "phases": phase_trace(args.length, args.keys, alpha=0.9),
+    }
+    print(f"{'trace':>10} {'policy':>8} {'hit ratio':>10} {'vs lru':>8} {'ops/sec':>12}")
+    for trace_name, trace in traces.items():
+        baseline = None
+        for policy in POLICIES:
+            cache = ThreadSafeLRUCache(max_size=args.capacity, policy=policy)
+            start = time.perf_counter()
+            ratio = replay(cache, trace)
+            elapsed = time.perf_counter() - start
+            cache.stop_cleanup_thread()
+            if baseline is None:
+                baseline = ratio
+            print(f"{trace_name:>10} {policy:>8} {ratio:>10.4f} {ratio - baseline:>+8.4f} "
+                  f"{len(trace) / elapsed:>12,.0f}")
+
+    print(f"\nmulti-threaded ops/sec on zipf-0.9")
+    print(f"{'policy':>8}" + "".join(f"{f'{n} threads':>14}" for n in THREAD_COUNTS))
+    for policy in POLICIES:
+        row = [threaded_throughput(policy, n, traces["zipf-0.9"], args.capacity) for n in THREAD_COUNTS]
+        print(f"{policy:>8}" + "".join(f"{ops:>14,.0f}" for ops in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Read throughput and hit ratio of buffered reads against exact LRU.
+
+Usage: python benchmarks/bench_read_buffer.py [--ops 50000] [--buffer 128]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from traces import replay, zipf_trace
+
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def read_throughput(read_buffer_size: int, num_threads: int, ops_per_thread: int) -> float:
+    """
+    Run a 100% hit read workload and return gets per second.
+    """
+    cache = ThreadSafeLRUCache(max_size=1000, read_buffer_size=read_buffer_size)
+    keys = [f"key{i}" for i in range(1000)]
+    cache.put_many({key: key for key in keys})
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker():
+        barrier.wait()
+        for i in range(ops_per_thread):
+            cache.get(keys[i % 1000])
+
+    threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cache.stop_cleanup_thread()
+    return num_threads * ops_per_thread / elapsed
+
+
+def hit_ratio(read_buffer_size: int, num_threads: int, trace) -> float:
+    """
+    Replay a Zipf trace split across threads and return the overall hit ratio.
+    """
+    cache = ThreadSafeLRUCache(max_size=1000, read_buffer_size=read_buffer_size)
+    chunk = len(trace) // num_threads
+    threads = [threading.Thread(target=replay, args=(cache, trace[i * chunk:(i + 1) * chunk]))
+               for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ratio = cache.get_stats()["hit_rate"]
+    cache.stop_cleanup_thread()
+    return ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=50000, help="gets per thread")
+    parser.add_argument("--buffer", type=int, default=128, help="read buffer size per thread")
+    args = parser.parse_args()
+
+    print("read throughput, gets/sec")
+    print(f"{'threads':>8} {'exact LRU':>12} {'buffered':>12}")
+    for num_threads in THREAD_COUNTS:
+        exact = read_throughput(0, num_threads, args.ops)
+        buffered = read_throughput(args.buffer, num_threads, args.ops)
+        print(f"{num_threads:>8} {exact:>12,.0f} {buffered:>12,.0f}")
+
+    trace = zipf_trace(200_000, 10_000, alpha=0.9)
+    print("\nhit ratio on Zipf(0.9), 10k keys, 1k entries")
+    print(f"{'threads':>8} {'exact LRU':>10} {'buffered':>10} {'delta':>8}")
+    for num_threads in [1, 4, 16]:
+        exact = hit_ratio(0, num_threads, trace)
+        buffered = hit_ratio(args.buffer, num_threads, trace)
+        print(f"{num_threads:>8} {exact:>10.4f} {buffered:>10.4f} {buffered - exact:>+8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+get latency of a read-through cache over SQLite at several hit ratios.
+
+The store holds --keys keys and the cache is sized to a fraction of them,
+so uniform random reads hit about that fraction of the time. After a
+warm-up, single gets are timed one by one and get_many batches per key.
+
+Usage: python benchmarks/bench_read_through.py [--keys 20000] [--ops 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from stores import SQLiteStore
+
+
+def percentile(samples, fraction: float) -> float:
+    """
+    Return the given percentile of sorted samples.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run(store: SQLiteStore, ratio: float, args, seed: int = 0):
+    """
+    Return (hit ratio, sorted get latencies in us, get_many us per key).
+    """
+    rng = random.Random(seed)
+    keys = [f"key{i}" for i in range(args.keys)]
+    cache = ThreadSafeLRUCache(max_size=max(1, int(args.keys * ratio)), cleanup_interval=3600,
+                               store=store)
+    for key in keys:
+        cache.get(key)
+    for _ in range(args.keys):
+        cache.get(rng.choice(keys))
+    before = cache.get_stats()
+
+    samples = []
+    for _ in range(args.ops):
+        key = rng.choice(keys)
+        start = time.perf_counter()
+        cache.get(key)
+        samples.append((time.perf_counter() - start) * 1e6)
+    after = cache.get_stats()
+    hits = after["hits"] - before["hits"]
+    requests = after["total_requests"] - before["total_requests"]
+
+    batches = args.ops // args.batch
+    start = time.perf_counter()
+    for _ in range(batches):
+        cache.get_many([rng.choice(keys) for _ in range(args.batch)])
+    batch_us = (time.perf_counter() - start) / (batches * args.batch) * 1e6
+    cache.stop_cleanup_thread()
+    samples.sort()
+    return hits / requests, samples, batch_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20_000)
+    parser.add_argument("--ops", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=50, help="keys per get_many")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.0, 0.5, 0.9, 0.99])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteStore(os.path.join(directory, "store.db"))
+        store.put_many({f"key{i}": {"id": i, "name": f"user{i}"} for i in range(args.keys)})
+        print(f"{args.keys:,} keys in SQLite, {args.ops:,} gets per ratio")
+        print(f"{'hit ratio':>9} {'mean us':>8} {'p50 us':>7} {'p99 us':>7} {'p99.9 us':>9} "
+              f"{'get_many us/key':>16}")
+        for ratio in args.ratios:
+            hit_ratio, samples, batch_us = run(store, ratio, args)
+            print(f"{hit_ratio:>9.1%} {sum(samples) / len(samples):>8.2f} {percentile(samples, 0.5):>7.2f} "
+                  f"{percentile(samples, 0.99):>7.2f} {percentile(samples, 0.999):>9.2f} {batch_us:>16.2f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
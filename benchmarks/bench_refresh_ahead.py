@@ -0,0 +1,98 @@
+"""
+Miss rate on hot keys with and without refresh-ahead.
+
+Reader threads draw keys from a Zipf trace and read them with get_or_load
+for --seconds, so hot keys cross many TTL boundaries. Without refresh_after
+each expiry of a hot key is a synchronous miss; with it (at half the TTL),
+the --hot keys are registered with register_refresh and reloaded in the
+background before they expire. Requests in the
+first TTL are a warm-up and not counted.
+
+Usage: python benchmarks/bench_refresh_ahead.py [--threads 4] [--seconds 3] [--ttl 0.5] [--hot 20]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from traces import zipf_trace
+
+
+def run(refresh_after, args):
+    """
+    Return (hot-key miss rate, overall miss rate, refresh-aheads) for one setting.
+    """
+    def loader(key):
+        time.sleep(args.load_ms / 1000)
+        return key
+
+    cache = ThreadSafeLRUCache(max_size=args.keys, cleanup_interval=3600, loader=loader,
+                               refresh_after=refresh_after, refresh_rate=args.refresh_rate)
+    hot_keys = {f"key{rank}" for rank in range(args.hot)}
+    if refresh_after is not None:
+        for key in hot_keys:
+            cache.register_refresh(key)
+    counts = [[0, 0, 0, 0] for _ in range(args.threads)]  # hot requests, hot misses, requests, misses
+    measure_from = time.perf_counter() + args.ttl
+    stop = measure_from + args.seconds
+
+    def reader(trace, count):
+        # A miss is a request whose caller had to run the loader
+        def missing(key):
+            if time.perf_counter() >= measure_from:
+                count[3] += 1
+                if key in hot_keys:
+                    count[1] += 1
+            return loader(key)
+
+        i = 0
+        while time.perf_counter() < stop:
+            key = trace[i % len(trace)]
+            i += 1
+            if time.perf_counter() >= measure_from:
+                count[2] += 1
+                if key in hot_keys:
+                    count[0] += 1
+            cache.get_or_load(key, missing, ttl=args.ttl)
+            if args.think_ms:
+                time.sleep(args.think_ms / 1000)
+
+    workers = [threading.Thread(target=reader, args=(zipf_trace(50_000, args.keys, seed=i), count))
+               for i, count in enumerate(counts)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    refresh_aheads = cache.get_stats()["refresh_aheads"]
+    cache.stop_cleanup_thread()
+    hot_requests, hot_misses, requests, misses = (sum(column) for column in zip(*counts))
+    return hot_misses / max(hot_requests, 1), misses / max(requests, 1), refresh_aheads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--keys", type=int, default=10_000, help="distinct Zipf keys")
+    parser.add_argument("--hot", type=int, default=20, help="most popular keys counted as hot")
+    parser.add_argument("--ttl", type=float, default=0.5, help="entry TTL in seconds")
+    parser.add_argument("--load-ms", type=float, default=1.0, help="loader latency")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a reader's requests")
+    parser.add_argument("--refresh-rate", type=float, default=None, help="max refresh-aheads per second")
+    args = parser.parse_args()
+
+    print(f"top {args.hot} keys of {args.keys:,}, ttl {args.ttl}s, {args.seconds}s measured")
+    print(f"{'refresh_after':>14} {'hot miss rate':>14} {'miss rate':>10} {'refresh-aheads':>15}")
+    for refresh_after in [None, args.ttl / 2]:
+        hot, overall, refresh_aheads = run(refresh_after, args)
+        label = "off" if refresh_after is None else f"{refresh_after:.2f}s"
+        print(f"{label:>14} {hot:>14.4f} {overall:>10.4f} {refresh_aheads:>15,}")
+
+
+if __name__ == "__main__":
+    main()
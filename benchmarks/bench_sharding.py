@@ -0,0 +1,66 @@
+"""
+Throughput of ShardedLRUCache against thread count for several shard counts.
+
+Usage: python benchmarks/bench_sharding.py [--ops 20000] [--keys 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ShardedLRUCache
+
+SHARD_COUNTS = [1, 4, 16, 64]
+THREAD_COUNTS = [1, 2, 4, 8, 16]
+
+
+def run(num_shards: int, num_threads: int, ops_per_thread: int, num_keys: int) -> float:
+    """
+    Run a 80% get / 20% put mix and return operations per second.
+    """
+    cache = ShardedLRUCache(max_size=num_keys // 2, num_shards=num_shards)
+    for i in range(num_keys // 2):
+        cache.put(f"key{i}", i)
+    barrier = threading.Barrier(num_threads + 1)
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        keys = [f"key{rng.randrange(num_keys)}" for _ in range(ops_per_thread)]
+        barrier.wait()
+        for i, key in enumerate(keys):
+            if i % 5 == 0:
+                cache.put(key, i)
+            else:
+                cache.get(key)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cache.stop_cleanup_thread()
+    return num_threads * ops_per_thread / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=20000, help="operations per thread")
+    parser.add_argument("--keys", type=int, default=10000, help="size of the key space")
+    args = parser.parse_args()
+
+    print(f"{'threads':>8}" + "".join(f"{f'{s} shards':>14}" for s in SHARD_COUNTS))
+    for num_threads in THREAD_COUNTS:
+        row = [run(s, num_threads, args.ops, args.keys) for s in SHARD_COUNTS]
+        print(f"{num_threads:>8}" + "".join(f"{ops:>14,.0f}" for ops in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+snapshot and load times for a large cache, and how long snapshot holds the
+lock while a reader thread keeps calling get.
+
+Usage: python benchmarks/bench_snapshot.py [--entries 1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+
+def reader(cache: ThreadSafeLRUCache, keys, stop: threading.Event, worst: list):
+    """
+    Call get in a loop and record the slowest call, in seconds.
+    """
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        cache.get(keys[i % len(keys)])
+        worst[0] = max(worst[0], time.perf_counter() - start)
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    keys = [f"key{i}" for i in range(args.entries)]
+    cache = ThreadSafeLRUCache(max_size=args.entries, cleanup_interval=3600)
+    for i, key in enumerate(keys):
+        cache.put(key, {"id": i, "name": f"user{i}"}, ttl=3600)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.snap")
+        stop = threading.Event()
+        worst = [0.0]
+        thread = threading.Thread(target=reader, args=(cache, keys, stop, worst))
+        thread.start()
+        time.sleep(0.2)
+        start = time.perf_counter()
+        written = cache.snapshot(path)
+        snapshot_time = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        size = os.path.getsize(path)
+        lock_ms = cache.get_stats()["max_snapshot_lock_ms"]
+        cache.stop_cleanup_thread()
+
+        restored = ThreadSafeLRUCache(max_size=args.entries, cleanup_interval=3600)
+        start = time.perf_counter()
+        loaded = restored.load(path)
+        load_time = time.perf_counter() - start
+        restored.stop_cleanup_thread()
+
+    print(f"entries:          {written:,} written, {loaded:,} loaded")
+    print(f"file size:        {size / 1e6:.1f} MB ({size / written:.1f} bytes/entry)")
+    print(f"snapshot:         {snapshot_time:.2f} s, lock held {lock_ms:.1f} ms")
+    print(f"slowest get:      {worst[0] * 1e3:.1f} ms during snapshot")
+    print(f"load:             {load_time:.2f} s ({load_time / loaded * 1e6:.2f} us/entry)")
+
+
+if __name__ == "__main__":
+    main()
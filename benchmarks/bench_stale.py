@@ -0,0 +1,79 @@
+"""
+get_or_load latency on a hot key across expiry boundaries, with and
+without stale-while-revalidate.
+
+Reader threads request one key every --think-ms; its loader takes
+--load-ms and its TTL is --ttl seconds, so the run crosses many expiries. Without stale_ttl every
+expiry puts a synchronous load on the request path; with it, readers get
+the stale value while the refresh pool reloads.
+
+Usage: python benchmarks/bench_stale.py [--threads 8] [--seconds 3]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+
+MODES = [("no stale", None), ("stale_ttl=1", 1.0)]
+
+
+def percentile(samples, fraction: float) -> float:
+    """
+    Return the given percentile of a sorted list.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run(stale_ttl, threads: int, seconds: float, ttl: float, load_ms: float, think_ms: float):
+    """
+    Return (sorted latencies in ms, loads) for one mode.
+    """
+    def loader(key):
+        time.sleep(load_ms / 1000)
+        return key
+
+    cache = ThreadSafeLRUCache(max_size=100, cleanup_interval=3600)
+    latencies = [[] for _ in range(threads)]
+    stop = time.perf_counter() + seconds
+
+    def reader(samples):
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            cache.get_or_load("hot", loader, ttl=ttl, stale_ttl=stale_ttl)
+            samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(think_ms / 1000)
+
+    workers = [threading.Thread(target=reader, args=(samples,)) for samples in latencies]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    loads = cache.get_stats()["loads"]
+    cache.stop_cleanup_thread()
+    return sorted(sample for samples in latencies for sample in samples), loads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--ttl", type=float, default=0.2, help="fresh TTL in seconds")
+    parser.add_argument("--load-ms", type=float, default=20.0, help="loader latency")
+    parser.add_argument("--think-ms", type=float, default=1.0, help="pause between a reader's requests")
+    args = parser.parse_args()
+
+    print(f"{'mode':>12} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'max ms':>8} {'loads':>6}")
+    for name, stale_ttl in MODES:
+        samples, loads = run(stale_ttl, args.threads, args.seconds, args.ttl, args.load_ms, args.think_ms)
+        print(f"{name:>12} {percentile(samples, 0.5):>8.3f} {percentile(samples, 0.99):>8.3f} "
+              f"{percentile(samples, 0.999):>9.3f} {samples[-1]:>8.2f} {loads:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+SQLite write volume and put throughput of write-behind vs writing every
+put straight to the store.
+
+A bursty Zipf trace of updates over --keys keys is applied with put. The
+direct mode writes each put to SQLite as it happens; write-behind
+coalesces updates per key and flushes them in batches.
+
+Usage: python benchmarks/bench_write_behind.py [--updates 30000] [--keys 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add the repository root to Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import ThreadSafeLRUCache
+from stores import SQLiteStore
+from traces import zipf_trace
+
+
+class CountingStore(SQLiteStore):
+    """
+    SQLiteStore that counts transactions and rows written.
+    """
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.transactions = 0
+        self.rows = 0
+
+    def put_many(self, items):
+        self.transactions += 1
+        self.rows += len(items)
+        super().put_many(items)
+
+
+def run(mode: str, trace, args, directory: str):
+    """
+    Return (seconds, transactions, rows, max flush lag ms) for one mode.
+    """
+    store = CountingStore(os.path.join(directory, f"{mode}.db"))
+    if mode == "direct":
+        cache = ThreadSafeLRUCache(max_size=args.keys, cleanup_interval=3600)
+    else:
+        cache = ThreadSafeLRUCache(max_size=args.keys, cleanup_interval=3600, store=store,
+                                   write_behind=True, flush_size=args.flush_size,
+                                   flush_interval=args.flush_interval)
+    start = time.perf_counter()
+    for i, key in enumerate(trace):
+        cache.put(key, i)
+        if mode == "direct":
+            store.put_many({key: i})
+        if args.burst and i % args.burst == args.burst - 1:
+            time.sleep(args.pause_ms / 1000)
+    cache.flush()
+    elapsed = time.perf_counter() - start
+    lag = cache.get_stats().get("max_write_behind_lag_ms", 0.0)
+    cache.stop_cleanup_thread()
+    store.close()
+    return elapsed, store.transactions, store.rows, lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=30_000)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--flush-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.1)
+    parser.add_argument("--burst", type=int, default=5000, help="updates per burst (0 for one burst)")
+    parser.add_argument("--pause-ms", type=float, default=20.0, help="pause between bursts")
+    args = parser.parse_args()
+
+    trace = zipf_trace(args.updates, args.keys, alpha=0.9)
+    print(f"{args.updates:,} updates over {args.keys:,} keys")
+    print(f"{'mode':>13} {'seconds':>8} {'transactions':>13} {'rows':>9} {'max lag ms':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ["direct", "write-behind"]:
+            elapsed, transactions, rows, lag = run(mode, trace, args, directory)
+            print(f"{mode:>13} {elapsed:>8.2f} {transactions:>13,} {rows:>9,} {lag:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Synthetic key traces shared by the benchmarks.
+"""
+import itertools
+import random
+from typing import List
+
+
+def zipf_trace(length: int, num_keys: int, alpha: float = 1.0, seed: int = 0) -> List[str]:
+    """
+    Keys drawn from a Zipf(alpha) popularity distribution over num_keys keys.
+    """
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1.0 / (rank ** alpha) for rank in range(1, num_keys + 1)))
+    ranks = rng.choices(range(num_keys), cum_weights=cum_weights, k=length)
+    return [f"key{rank}" for rank in ranks]
+
+
+def scan_trace(length: int, num_keys: int, scan_every: int = 5000, scan_length: int = 2000,
+               alpha: float = 1.0, seed: int = 0) -> List[str]:
+    """
+    A Zipf trace interrupted every scan_every requests by a sequential scan
+    over scan_length keys that are never requested again.
+    """
+    base = zipf_trace(length, num_keys, alpha, seed)
+    trace = []
+    scan_id = 0
+    for i, key in enumerate(base):
+        if i and i % scan_every == 0:
+            trace.extend(f"scan{scan_id}-{j}" for j in range(scan_length))
+            scan_id += 1
+        trace.append(key)
+    return trace
+
+
+def phase_trace(length: int, num_keys: int, phase_length: int = 20000, window: int = 500,
+                alpha: float = 1.0, seed: int = 0) -> List[str]:
+    """
+    Alternate between a recency-heavy phase (requests drawn from a window of
+    keys that slides forward through fresh keys) and a frequency-heavy
+    phase (Zipf over a fixed key set).
+    """
+    rng = random.Random(seed)
+    zipf = zipf_trace(length, num_keys, alpha, seed)
+    trace = []
+    position = 0
+    for i in range(length):
+        if (i // phase_length) % 2 == 0:
+            position += 1 if rng.random() < 0.2 else 0
+            trace.append(f"recent{position + rng.randrange(window)}")
+        else:
+            trace.append(zipf[i])
+    return trace
+
+
+def replay(cache, trace: List[str]) -> float:
+    """
+    Replay a trace as get-then-put-on-miss and return the hit ratio.
+    """
+    hits = 0
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, key)
+    return hits / len(trace)
@@ -1,211 +1,1406 @@
+import asyncio
+import contextlib
+import gc
+import itertools
+import math
+import random
+import sys
 import threading
 import time
-from typing import Any, Optional, Dict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List, Tuple
+
+from expiry import make_expiry
+from oplog import CLEAR, FSYNC_POLICIES, OpLog, replay as replay_oplog
+from policies import make_policy
+from snapshot import read_snapshot, write_snapshot
+from write_behind import DELETE, PUT, WriteBehindQueue
 
 class Node:
     """
-    Doubly linked list node for LRU tracking.
+    Cache entry. prev/next link it into the LRU policy's list; other
+    eviction policies attach their own bookkeeping attributes.
+
+    expire_at is when the entry is removed. An entry stored with a
+    stale_ttl also has stale_at, the end of its fresh period. refresh_at is
+    when a hit should start reloading the entry (stale_at, or earlier with
+    refresh_after); such entries keep the ttl and stale_ttl they were
+    stored with for the reload.
     """
-    def __init__(self, key: str, value: Any, expire_at: Optional[float]):
+    ttl: Optional[float] = None
+    stale_ttl: Optional[float] = None
+
+    def __init__(self, key: str, value: Any, expire_at: Optional[float], weight: int = 0,
+                 cost: float = 1.0):
         self.key = key
         self.value = value
         self.expire_at = expire_at
+        self.weight = weight
+        self.cost = cost
+        # Seconds the last get_or_load took to compute the value
+        self.delta = 0.0
+        self.written_at = 0.0
+        self.stale_at: Optional[float] = None
+        self.refresh_at: Optional[float] = None
         self.prev: Optional['Node'] = None
         self.next: Optional['Node'] = None
 
+# default_weigher looks at no more than this many items of each container
+# and this many levels down, so it visits at most 1 + 8 + ... + 8**4 objects
+WEIGHER_SAMPLE = 8
+WEIGHER_DEPTH = 4
+
+def _estimate_size(value: Any, depth: int, seen: set) -> int:
+    """
+    Shallow sys.getsizeof, descending into containers up to depth levels.
+    Only the first WEIGHER_SAMPLE items of a container are weighed and the
+    rest are assumed to be alike; objects in seen count as zero.
+    """
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if depth <= 0 or isinstance(value, (str, bytes, bytearray)):
+        return size
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    else:
+        return size
+    sampled = 0
+    inner = 0
+    for item in itertools.islice(items, WEIGHER_SAMPLE):
+        if isinstance(value, dict):
+            inner += _estimate_size(item[0], depth - 1, seen) + _estimate_size(item[1], depth - 1, seen)
+        else:
+            inner += _estimate_size(item, depth - 1, seen)
+        sampled += 1
+    if sampled:
+        size += inner * len(value) // sampled
+    return size
+
+def default_weigher(key: str, value: Any) -> int:
+    """
+    Estimate the bytes an entry occupies: the key plus the value, following
+    containers WEIGHER_DEPTH levels deep and extrapolating each one from its
+    first WEIGHER_SAMPLE items. Objects shared within the value count once.
+    """
+    return sys.getsizeof(key) + _estimate_size(value, WEIGHER_DEPTH, set())
+
+# Returned by a get_or_load loader to record that the key does not exist
+MISSING = object()
+
+class ReadBuffer:
+    """
+    One thread's stripe of recorded cache hits. Only the owning thread
+    appends and bumps its counters; the deque is drained under the cache
+    lock by whichever thread gets there first.
+    """
+    def __init__(self, size: int):
+        self.thread = threading.current_thread()
+        self.pending: deque = deque(maxlen=size)
+        self.hits = 0
+        self.drops = 0
+
+class PendingLoad:
+    """
+    A get_or_load call in progress. The loading thread sets value or error
+    and then done; coalesced callers wait on done.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+        # Set when the key is written or deleted during the load, so the
+        # loaded (older) value is handed to waiters but not cached
+        self.superseded = False
+
 class ThreadSafeLRUCache:
     """
-    Thread-safe in-memory cache with LRU eviction and TTL support.
+    Thread-safe in-memory cache with LRU (or another selectable) eviction
+    and TTL support.
     """
-    def __init__(self, max_size: int = 1000, default_ttl: Optional[int] = None, cleanup_interval: int = 10):
+    # Snapshot entries inserted per lock acquisition by load()
+    LOAD_BATCH_SIZE = 1000
+
+    def __init__(self, max_size: int = 1000, default_ttl: Optional[int] = None, cleanup_interval: int = 10,
+                 expiry: Any = 'heap', cleanup_batch_size: int = 256, cleanup_max_lock_time: float = 0.005,
+                 cleanup_time_budget: float = 0.05, read_buffer_size: int = 0, policy: Any = 'lru',
+                 policy_options: Optional[dict] = None, max_bytes: Optional[int] = None,
+                 weigher: Optional[Callable[[str, Any], int]] = None, max_inflight: int = 1024,
+                 early_refresh_beta: Optional[float] = None, loader: Optional[Callable[[str], Any]] = None,
+                 refresh_workers: int = 4, refresh_after: Optional[float] = None,
+                 refresh_rate: Optional[float] = None, negative_max_size: Optional[int] = None,
+                 negative_ttl: float = 60, store: Any = None, write_behind: bool = False,
+                 flush_size: int = 100, flush_interval: float = 1.0, max_pending: int = 10000,
+                 oplog_path: Optional[str] = None, oplog_fsync: str = 'everysec',
+                 oplog_compact_size: int = 64 << 20):
         """
-        Initialize the cache.
+        Initialize the cache. expiry selects the engine that tracks TTLs:
+        'heap' (min-heap), 'wheel' (hierarchical timing wheel), 'sampled'
+        (Redis-style probabilistic sampling) or an engine instance from
+        expiry.py.
+
+        Each cleanup pass removes expired keys in batches of
+        cleanup_batch_size, holds the lock for at most about
+        cleanup_max_lock_time seconds at a time, and stops after
+        cleanup_time_budget seconds. Limits are checked between batches.
+
+        With read_buffer_size > 0, hits skip the lock: each thread records
+        them in its own bounded buffer, and the buffers are drained in
+        batches under the lock to apply LRU promotion. Promotions may be
+        dropped when a buffer overflows, so eviction order is approximate.
+
+        policy selects the eviction policy: 'lru' (default), 'clock',
+        'tinylfu' (W-TinyLFU admission with a count-min sketch), 'arc'
+        (Adaptive Replacement Cache), 's3fifo' (small/main/ghost FIFOs),
+        'lfu' (frequency buckets) or 'gdsf' (cost-aware GreedyDual-Size-
+        Frequency, using put(..., cost=)), a name added with
+        policies.register_policy, or an EvictionPolicy instance.
+        policy_options are passed to a named policy's constructor, e.g.
+        {'decay_every': 10000} for 'lfu'.
+
+        With max_bytes set, entries are also weighed with weigher(key, value)
+        (default_weigher if not given) and evicted until the total weight
+        fits. max_size still caps the entry count. A value heavier than
+        max_bytes on its own is rejected with ValueError.
+
+        max_inflight bounds the number of keys get_or_load tracks as being
+        loaded; past it, callers run their loader without coalescing.
+
+        With early_refresh_beta set, get_or_load and aget_or_load refresh hot
+        entries before they expire (XFetch): a hit triggers a background
+        reload with a probability that rises as expire_at approaches, scaled
+        by how long the value took to load and by the beta. 1.0 is the usual
+        choice; larger values refresh earlier.
+
+        Entries put with a stale_ttl are served for that many seconds past
+        their TTL, counted as stale_hits. The first stale hit reloads the key
+        through loader(key) on a pool of refresh_workers threads, which also
+        runs early refreshes.
+
+        With refresh_after set, keys opted in with register_refresh are
+        refresh-ahead keys: the first hit on such an entry written more than
+        refresh_after seconds ago queues a reload on the same pool, so hot
+        keys are renewed before they expire. Reloads are deduplicated per
+        key and, with refresh_rate set, limited to that many per second.
+
+        Keys known not to exist (put_missing, or a loader returning MISSING)
+        are kept as negative entries for negative_ttl seconds, in their own
+        LRU of negative_max_size keys (default a tenth of max_size), so they
+        never evict values.
+
+        With write_behind=True, put, put_many, delete and delete_many also
+        queue the change for store (e.g. stores.SQLiteStore). A flusher
+        thread writes the latest change per key in batches of flush_size,
+        every flush_interval seconds or sooner when a batch is full. Writers
+        block while max_pending keys are waiting.
+
+        With a store and write_behind=False, the cache reads and writes
+        through it: get and get_many load misses from the store (get_many in
+        one store.get_many call), keys the store lacks become negative
+        entries, and put, put_many, delete and delete_many write to the
+        store before updating memory. The store also serves as the loader
+        for stale and refresh-ahead reloads unless loader is given.
+
+        With oplog_path, put, put_many, delete, delete_many and clear are
+        appended to an operation log there by a writer thread, and the
+        cache is rebuilt on startup by replaying it. oplog_fsync is
+        'always' (writers wait for the fsync of their batch, outside the
+        lock), 'everysec' or 'no'. The log is rewritten from live entries
+        once it reaches oplog_compact_size bytes and has doubled since.
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
         self.cleanup_interval = cleanup_interval
+        self.cleanup_batch_size = cleanup_batch_size
+        self.cleanup_max_lock_time = cleanup_max_lock_time
+        self.cleanup_time_budget = cleanup_time_budget
+        self.read_buffer_size = read_buffer_size
+        self.max_bytes = max_bytes
+        self.weigher = weigher or default_weigher
+        self.total_weight = 0
+        self.max_inflight = max_inflight
+        self.early_refresh_beta = early_refresh_beta
+        self.loader = loader
+        self.refresh_workers = refresh_workers
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self.refresh_after = refresh_after
+        # Keys registered for refresh-ahead
+        self._refresh_keys: set = set()
+        self.refresh_rate = refresh_rate
+        self._refresh_tokens = refresh_rate or 0.0
+        self._refresh_tokens_at = time.monotonic()
+        self.negative_max_size = negative_max_size if negative_max_size is not None else max(1, max_size // 10)
+        self.negative_ttl = negative_ttl
+        # key -> expire_at of negative entries, least recently used first
+        self._negative: OrderedDict = OrderedDict()
+        if write_behind and store is None:
+            raise ValueError("write_behind requires a store")
+        if oplog_fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {oplog_fsync!r}; expected one of {', '.join(FSYNC_POLICIES)}")
+        self.store = store
+        self._write_behind = WriteBehindQueue(store, flush_size, flush_interval, max_pending) if write_behind else None
+        self._read_through = self._write_through = store is not None and not write_behind
+        # Held across a store write and the matching cache update, so that
+        # concurrent writers leave both in the same order
+        self._write_lock = threading.Lock() if self._write_through else contextlib.nullcontext()
+        if self._read_through and loader is None:
+            self.loader = self._read_store
         self.lock = threading.RLock()
         self.cache: Dict[str, Node] = {}
-        self.head: Optional[Node] = None
-        self.tail: Optional[Node] = None
+        self._policy = make_policy(policy, max_size, policy_options)
+        # Bound once, as it runs on every hit
+        self._on_access = self._policy.on_access
         self.size = 0
         self.stats = {
             'hits': 0,
             'misses': 0,
             'total_requests': 0,
             'evictions': 0,
-            'expired_removals': 0
+            'expired_removals': 0,
+            'max_cleanup_lock_time': 0.0,
+            'max_snapshot_lock_time': 0.0,
+            'read_buffer_drops': 0,
+            'oversize_rejections': 0,
+            'loads': 0,
+            'load_failures': 0,
+            'coalesced_waits': 0,
+            'inflight_overflows': 0,
+            'early_refreshes': 0,
+            'stale_hits': 0,
+            'stale_refreshes': 0,
+            'refresh_aheads': 0,
+            'refresh_ahead_throttled': 0,
+            'negative_hits': 0,
+            'store_reads': 0,
+            'store_writes': 0
         }
+        self._inflight: Dict[str, PendingLoad] = {}
+        # key -> (load task, its PendingLoad, used only to mark it superseded)
+        self._async_inflight: Dict[str, Tuple[asyncio.Task, PendingLoad]] = {}
+        # Strong references to running early-refresh tasks
+        self._refresh_tasks: set = set()
+        self._expiry = make_expiry(expiry)
+        self._local = threading.local()
+        self._read_buffers: List[ReadBuffer] = []
         self._stop_event = threading.Event()
         self._cleanup_thread = threading.Thread(target=self._cleanup_expired_keys, daemon=True)
         self._cleanup_thread.start()
+        self._oplog: Optional[OpLog] = None
+        if oplog_path is not None:
+            self._replay(oplog_path)
+            self._oplog = OpLog(oplog_path, oplog_fsync, oplog_compact_size, self.lock, self._live_keys,
+                                self._live_entries)
 
-    def put(self, key: str, value: Any, ttl: Optional[int] = None):
+    def put(self, key: str, value: Any, ttl: Optional[int] = None, cost: float = 1.0,
+            stale_ttl: Optional[float] = None):
         """
-        Store a key-value pair with optional TTL (in seconds).
+        Store a key-value pair with optional TTL (in seconds). cost is how
+        expensive the value is to recompute, in any consistent unit; only
+        cost-aware policies such as "gdsf" use it. With stale_ttl, the entry
+        is still served for that many seconds after the TTL while it is
+        refreshed in the background.
+        """
+        expire_at = self._expire_at(ttl, None)
+        weight = self._weigh(key, value)
+        if self._write_behind:
+            self._write_behind.wait_for_room()
+        with self._write_lock:
+            if self._write_through:
+                self._write_store({key: value})
+            with self.lock:
+                self._supersede(key)
+                self._store(key, value, expire_at, weight, cost, ttl, stale_ttl)
+                if self._write_behind:
+                    # Queued under the lock so the store sees changes in cache order
+                    self._write_behind.enqueue(key, PUT, value)
+                seq = self._log_put(key, value) if self._oplog else 0
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def put_missing(self, key: str, ttl: Optional[float] = None):
+        """
+        Record that key does not exist, for ttl seconds (default
+        negative_ttl). get returns None for it and get_or_load does not call
+        its loader. Any cached value for the key is dropped.
         """
-        expire_at = None
-        if ttl is not None:
-            expire_at = time.time() + ttl
-        elif self.default_ttl is not None:
-            expire_at = time.time() + self.default_ttl
         with self.lock:
+            self._supersede(key)
+            seq = self._store_missing(key, ttl)
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def register_refresh(self, key: str):
+        """
+        Opt key into refresh-ahead: once its entry is older than
+        refresh_after, the next hit reloads it in the background. Applies
+        from the key's next write (put or load).
+        """
+        if self.refresh_after is None:
+            raise ValueError("register_refresh requires refresh_after")
+        with self.lock:
+            self._refresh_keys.add(key)
+
+    def unregister_refresh(self, key: str):
+        """
+        Stop refreshing key ahead of time. A stale entry is still refreshed.
+        """
+        with self.lock:
+            self._refresh_keys.discard(key)
             node = self.cache.get(key)
-            if node:
-                node.value = value
-                node.expire_at = expire_at
-                self._move_to_head(node)
-            else:
-                # If cache is full, evict LRU item before adding new one
-                if self.size >= self.max_size:
-                    self._evict_lru()
-                new_node = Node(key, value, expire_at)
-                self.cache[key] = new_node
-                self._add_to_head(new_node)
-                self.size += 1
+            if node is not None:
+                node.refresh_at = node.stale_at
 
     def get(self, key: str) -> Optional[Any]:
         """
         Retrieve a value by key and update access order.
         """
+        if self.read_buffer_size:
+            # Lock-free hit path; misses, expired keys and reloads take the lock below
+            node = self.cache.get(key)
+            if node is not None and (node.expire_at is None or node.expire_at >= time.time()) \
+                    and node.refresh_at is None:
+                self._record_read(node)
+                return node.value
         with self.lock:
             self.stats['total_requests'] += 1
             node = self.cache.get(key)
-            if not node:
-                self.stats['misses'] += 1
+            # Hit path inlined; misses, expired keys and reloads go through _lookup
+            now = time.time()
+            if node is not None and (node.expire_at is None or node.expire_at >= now) \
+                    and (node.refresh_at is None or node.refresh_at >= now):
+                self._on_access(node)
+                self.stats['hits'] += 1
+                return node.value
+            node = self._lookup(key, now)
+            if node:
+                return node.value
+            if not self._read_through or key in self._negative:
                 return None
-            if node.expire_at is not None and node.expire_at < time.time():
-                self._remove_node(node)
-                self.stats['misses'] += 1
-                self.stats['expired_removals'] += 1
+        return self._load_miss(key, self._read_store, None, None)
+
+    def _get_cached(self, key: str) -> Optional[Any]:
+        """
+        get without read-through, for callers that bring their own loader.
+        """
+        with self.lock:
+            self.stats['total_requests'] += 1
+            node = self._lookup(key, None)
+            return node.value if node else None
+
+    def get_or_load(self, key: str, loader: Callable[[str], Any], ttl: Optional[int] = None,
+                    stale_ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value for key, or call loader(key), cache its
+        result with the given TTL (and stale_ttl, as for put) and return it.
+        Concurrent misses on the same key are coalesced: one caller runs the
+        loader and the others wait for its value, or re-raise its exception.
+        A stale value, or one due under refresh_after, is returned while
+        loader reloads it in the background. loader is used instead of a
+        read-through store.
+        """
+        value = self._get_cached(key) if self._read_through else self.get(key)
+        if value is not None:
+            node = self.cache.get(key)
+            now = time.time()
+            if node is not None and node.refresh_at is not None and node.refresh_at < now:
+                self._reload(node, loader, ttl, stale_ttl, now)
+            elif self.early_refresh_beta is not None and self._refresh_due(key):
+                self._start_refresh(key, loader, ttl, stale_ttl, 'early_refreshes')
+            return value
+        return self._load_miss(key, loader, ttl, stale_ttl)
+
+    def _load_miss(self, key: str, loader: Callable[[str], Any], ttl: Optional[int],
+                   stale_ttl: Optional[float]) -> Any:
+        """
+        Load a key that just missed, coalescing with a load in flight.
+        """
+        with self.lock:
+            node = self.cache.get(key)
+            if node is not None and (node.expire_at is None or node.expire_at >= time.time()):
+                # Loaded by another caller since our miss
+                return node.value
+            if key in self._negative and self._negative[key] >= time.time():
                 return None
-            self._move_to_head(node)
-            self.stats['hits'] += 1
-            return node.value
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if not leader:
+                self.stats['coalesced_waits'] += 1
+            elif len(self._inflight) < self.max_inflight:
+                pending = self._inflight[key] = PendingLoad()
+            else:
+                self.stats['inflight_overflows'] += 1
+        if leader:
+            return self._load(key, loader, ttl, pending, stale_ttl)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.value
 
-    def delete(self, key: str):
+    def _load(self, key: str, loader: Callable[[str], Any], ttl: Optional[int],
+              pending: Optional[PendingLoad], stale_ttl: Optional[float] = None) -> Any:
         """
-        Remove a key from cache.
+        Run a loader without the lock, store its result and hand the outcome
+        to the callers waiting on pending, if any. MISSING is stored as a
+        negative entry and handed out as None.
         """
+        try:
+            start = time.perf_counter()
+            value = loader(key)
+            self._store_loaded(key, value, ttl, time.perf_counter() - start, stale_ttl, pending)
+            if value is MISSING:
+                value = None
+        except BaseException as exc:
+            with self.lock:
+                self.stats['load_failures'] += 1
+                if pending is not None:
+                    del self._inflight[key]
+            if pending is not None:
+                pending.error = exc
+                pending.done.set()
+            raise
+        if pending is not None:
+            # The value is cached already, so new callers hit before this
+            with self.lock:
+                del self._inflight[key]
+            pending.value = value
+            pending.done.set()
+        return value
+
+    def _store_loaded(self, key: str, value: Any, ttl: Optional[int], delta: float,
+                      stale_ttl: Optional[float] = None, pending: Optional[PendingLoad] = None):
+        """
+        Store a loader's result with the time it took, and count the load.
+        Nothing is stored if the key was written during the load.
+        """
+        if value is MISSING:
+            with self.lock:
+                self.stats['loads'] += 1
+                if pending is None or not pending.superseded:
+                    self._store_missing(key, None)
+            return
+        weight = self._weigh(key, value)
         with self.lock:
+            self.stats['loads'] += 1
+            if pending is not None and pending.superseded:
+                return
+            self._store(key, value, self._expire_at(ttl, None), weight, ttl=ttl, stale_ttl=stale_ttl)
             node = self.cache.get(key)
-            if node:
-                self._remove_node(node)
+            if node is not None:
+                node.delta = delta
+
+    def _read_store(self, key: str) -> Any:
+        """
+        Read-through loader: fetch a key from the store, MISSING if absent.
+        """
+        self._count('store_reads')
+        value = self.store.get(key)
+        return MISSING if value is None else value
+
+    def _read_store_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Load several missed keys from the store with one get_many call and
+        cache them; keys the store lacks become negative entries. Keys that
+        are already loading are waited on instead of fetched again. Only as
+        many keys as max_inflight leaves room for are registered as loading;
+        the rest are fetched in the same call, counted as inflight_overflows,
+        and not cached over a value written meanwhile.
+        """
+        leading: Dict[str, PendingLoad] = {}
+        untracked: List[str] = []
+        waiting: Dict[str, PendingLoad] = {}
+        with self.lock:
+            free = self.max_inflight - len(self._inflight)
+            for key in keys:
+                pending = self._inflight.get(key)
+                if pending is not None:
+                    self.stats['coalesced_waits'] += 1
+                    waiting[key] = pending
+                elif len(leading) < free:
+                    leading[key] = self._inflight[key] = PendingLoad()
+                else:
+                    self.stats['inflight_overflows'] += 1
+                    untracked.append(key)
+        result = {}
+        if leading or untracked:
+            self._count('store_reads')
+            start = time.perf_counter()
+            try:
+                found = self.store.get_many(list(leading) + untracked)
+                delta = time.perf_counter() - start
+                weights = {key: self._weigh_loaded(key, value) for key, value in found.items()}
+            except BaseException as exc:
+                with self.lock:
+                    self.stats['load_failures'] += 1
+                    for key in leading:
+                        del self._inflight[key]
+                for pending in leading.values():
+                    pending.error = exc
+                    pending.done.set()
+                raise
+            with self.lock:
+                for key, pending in leading.items():
+                    pending.value = found.get(key)
+                    del self._inflight[key]
+                    if pending.superseded:
+                        self.stats['loads'] += 1
+                    else:
+                        self._cache_fetched(key, pending.value, weights.get(key), delta)
+                for key in untracked:
+                    if key in self.cache:
+                        # Written during the fetch, which is not tracked
+                        self.stats['loads'] += 1
+                    else:
+                        self._cache_fetched(key, found.get(key), weights.get(key), delta)
+            for key, pending in leading.items():
+                pending.done.set()
+                if pending.value is not None:
+                    result[key] = pending.value
+            for key in untracked:
+                if found.get(key) is not None:
+                    result[key] = found[key]
+        for key, pending in waiting.items():
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.value is not None:
+                result[key] = pending.value
+        return result
+
+    def _cache_fetched(self, key: str, value: Any, weight: Optional[int], delta: float):
+        """
+        Cache a value read by get_many from the store, or a negative entry
+        if it is None, and count the load. Caller must hold the lock.
+        """
+        self.stats['loads'] += 1
+        if value is None:
+            self._store_missing(key, None)
+            return
+        if weight is None:
+            # Too heavy for max_bytes: returned but not cached
+            return
+        self._store(key, value, self._expire_at(None, None), weight)
+        node = self.cache.get(key)
+        if node is not None:
+            node.delta = delta
+
+    def _weigh_loaded(self, key: str, value: Any) -> Optional[int]:
+        """
+        Weigh a value read from the store, or return None if it is too
+        heavy to cache.
+        """
+        try:
+            return self._weigh(key, value)
+        except ValueError:
+            return None
+
+    def _write_store(self, items: Dict[str, Any]):
+        """
+        Write-through: put items to the store. Caller holds the write lock.
+        """
+        self._count('store_writes')
+        self.store.put_many(items)
+
+    def _delete_store(self, keys: List[str]):
+        """
+        Write-through: delete keys from the store. Caller holds the write lock.
+        """
+        self._count('store_writes')
+        self.store.delete_many(keys)
+
+    def _supersede(self, key: str):
+        """
+        Keep a load in flight for key from caching its result over a newer
+        write. Caller must hold the lock.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            pending.superseded = True
+        _, pending = self._async_inflight.get(key, (None, None))
+        if pending is not None:
+            pending.superseded = True
+
+    def _refresh_due(self, key: str) -> bool:
+        """
+        XFetch: decide whether this hit should refresh the entry early.
+        Refreshes when now - delta * beta * ln(U) >= expiry for uniform U in
+        (0, 1], so the chance grows as expiry nears and is higher for values
+        that are slow to compute. Expiry is the end of the fresh period.
+        """
+        node = self.cache.get(key)
+        if node is None or node.expire_at is None or not node.delta:
+            return False
+        gap = -node.delta * self.early_refresh_beta * math.log(1.0 - random.random())
+        return time.time() + gap >= (node.stale_at or node.expire_at)
+
+    def _reload(self, node: Node, loader: Callable[[str], Any], ttl: Optional[int],
+                stale_ttl: Optional[float], now: float):
+        """
+        Start the reload of a node past its refresh_at: a stale refresh, or
+        a rate-limited refresh-ahead while it is still fresh.
+        """
+        if node.stale_at is not None and node.stale_at < now:
+            self._start_refresh(node.key, loader, ttl, stale_ttl, 'stale_refreshes')
+        else:
+            self._start_refresh(node.key, loader, ttl, stale_ttl, 'refresh_aheads', limited=True)
+
+    def _start_refresh(self, key: str, loader: Callable[[str], Any], ttl: Optional[int],
+                       stale_ttl: Optional[float], stat: str, limited: bool = False):
+        """
+        Reload a key on the refresh pool unless a load is already in flight,
+        counting it under stat. The in-flight table bounds the pool's queue,
+        and misses that arrive meanwhile wait on the refresh like any other
+        load. limited reloads are subject to refresh_rate.
+        """
+        with self.lock:
+            if key in self._inflight or len(self._inflight) >= self.max_inflight or self._stop_event.is_set():
+                return
+            if limited and not self._take_refresh_token():
+                self.stats['refresh_ahead_throttled'] += 1
+                return
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                        thread_name_prefix='cache-refresh')
+            pending = PendingLoad()
+            try:
+                self._refresh_pool.submit(self._refresh, key, loader, ttl, stale_ttl, pending)
+            except RuntimeError:
+                # The pool was shut down
+                return
+            # Registered after submit, which can fail; the refresh cannot
+            # finish before this as it needs the lock
+            self._inflight[key] = pending
+            self.stats[stat] += 1
+
+    def _take_refresh_token(self) -> bool:
+        """
+        Token bucket behind refresh_rate: refills at refresh_rate tokens per
+        second up to one second's worth. Caller must hold the lock.
+        """
+        if self.refresh_rate is None:
+            return True
+        now = time.monotonic()
+        self._refresh_tokens = min(max(self.refresh_rate, 1.0),
+                                   self._refresh_tokens + (now - self._refresh_tokens_at) * self.refresh_rate)
+        self._refresh_tokens_at = now
+        if self._refresh_tokens < 1:
+            return False
+        self._refresh_tokens -= 1
+        return True
+
+    def _refresh(self, key: str, loader: Callable[[str], Any], ttl: Optional[int],
+                 stale_ttl: Optional[float], pending: PendingLoad):
+        """
+        Run a background refresh. Failures are counted by _load and passed
+        to any waiters; the cached value stays until it expires.
+        """
+        try:
+            self._load(key, loader, ttl, pending, stale_ttl)
+        except Exception:
+            pass
+
+    async def aget_or_load(self, key: str, loader: Callable[[str], Awaitable[Any]],
+                           ttl: Optional[int] = None, stale_ttl: Optional[float] = None) -> Any:
+        """
+        Coroutine version of get_or_load for an async loader. Concurrent
+        coroutines on the same event loop share one loader call through a
+        future per key. The event loop never waits on the cache lock: when
+        it is taken, the cache call runs in a worker thread instead. A stale
+        value, or one due under refresh_after, is returned while loader
+        reloads it in a background task, unless the registered (sync) loader
+        is already reloading it.
+        """
+        value = await self._run_unblocked(self._get_cached if self._read_through else self.get, key)
+        if value is not None:
+            node = self.cache.get(key)
+            now = time.time()
+            if node is not None and node.refresh_at is not None and node.refresh_at < now:
+                await self._areload(node, loader, ttl, stale_ttl, now)
+            elif self.early_refresh_beta is not None and self._refresh_due(key):
+                await self._start_async_refresh(key, loader, ttl, stale_ttl, 'early_refreshes')
+            return value
+        expire_at = self._negative.get(key)
+        if expire_at is not None and expire_at >= time.time():
+            return None
+        loop = asyncio.get_running_loop()
+        task, _ = self._async_inflight.get(key, (None, None))
+        if task is not None and task.get_loop() is loop:
+            await self._run_unblocked(self._count, 'coalesced_waits')
+        elif task is not None:
+            # Being loaded on another event loop; its task is not ours to await
+            return await self._aload(key, loader, ttl, stale_ttl)
+        elif len(self._async_inflight) >= self.max_inflight:
+            await self._run_unblocked(self._count, 'inflight_overflows')
+            return await self._aload(key, loader, ttl, stale_ttl)
+        else:
+            task = self._start_async_load(key, loader, ttl, stale_ttl)
+        # Every caller, the one that started the load included, awaits it
+        # shielded, so a cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _start_async_load(self, key: str, loader: Callable[[str], Awaitable[Any]], ttl: Optional[int],
+                          stale_ttl: Optional[float]) -> asyncio.Task:
+        """
+        Run a load in its own task, registered in _async_inflight until it
+        finishes.
+        """
+        pending = PendingLoad()
+        task = asyncio.get_running_loop().create_task(self._aload(key, loader, ttl, stale_ttl, pending))
+        entry = self._async_inflight[key] = (task, pending)
+        task.add_done_callback(lambda _: self._async_inflight.get(key) is entry and self._async_inflight.pop(key))
+        # Mark a failure retrieved in case nobody is left waiting
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _aload(self, key: str, loader: Callable[[str], Awaitable[Any]], ttl: Optional[int],
+                     stale_ttl: Optional[float] = None, pending: Optional[PendingLoad] = None) -> Any:
+        """
+        Await a loader and store its result, unless pending was superseded.
+        """
+        try:
+            start = time.perf_counter()
+            value = await loader(key)
+            await self._run_unblocked(self._store_loaded, key, value, ttl,
+                                      time.perf_counter() - start, stale_ttl, pending)
+        except BaseException:
+            await self._run_unblocked(self._count, 'load_failures')
+            raise
+        return None if value is MISSING else value
+
+    async def _areload(self, node: Node, loader: Callable[[str], Awaitable[Any]], ttl: Optional[int],
+                       stale_ttl: Optional[float], now: float):
+        """
+        _reload for an async loader.
+        """
+        if node.stale_at is not None and node.stale_at < now:
+            await self._start_async_refresh(node.key, loader, ttl, stale_ttl, 'stale_refreshes')
+        else:
+            await self._start_async_refresh(node.key, loader, ttl, stale_ttl, 'refresh_aheads', limited=True)
+
+    async def _start_async_refresh(self, key: str, loader: Callable[[str], Awaitable[Any]],
+                                   ttl: Optional[int], stale_ttl: Optional[float], stat: str,
+                                   limited: bool = False):
+        """
+        Reload a key in a background task unless a load is already in flight,
+        counting it under stat. limited reloads are subject to refresh_rate.
+        """
+        if key in self._async_inflight or key in self._inflight or len(self._async_inflight) >= self.max_inflight:
+            return
+        if not await self._run_unblocked(self._admit_refresh, stat, limited):
+            return
+        if key in self._async_inflight:
+            # Started by another coroutine while we waited for the lock
+            return
+        task = self._start_async_load(key, loader, ttl, stale_ttl)
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def _admit_refresh(self, stat: str, limited: bool) -> bool:
+        """
+        Count a refresh under stat and return True, or, for a limited one
+        refresh_rate does not allow now, count it as throttled and return
+        False.
+        """
+        with self.lock:
+            if limited and not self._take_refresh_token():
+                self.stats['refresh_ahead_throttled'] += 1
+                return False
+            self.stats[stat] += 1
+            return True
+
+    async def _run_unblocked(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call a method that takes the cache lock without blocking the event
+        loop on it: inline if the lock is free, else in a worker thread.
+        """
+        if self.lock.acquire(blocking=False):
+            try:
+                return func(*args)
+            finally:
+                self.lock.release()
+        return await asyncio.to_thread(func, *args)
+
+    def _count(self, name: str):
+        """
+        Increment a counter in stats.
+        """
+        with self.lock:
+            self.stats[name] += 1
+
+    def delete(self, key: str):
+        """
+        Remove a key from cache, including a negative entry for it.
+        """
+        if self._write_behind:
+            self._write_behind.wait_for_room()
+        with self._write_lock:
+            if self._write_through:
+                self._delete_store([key])
+            with self.lock:
+                self._supersede(key)
+                node = self.cache.get(key)
+                if node:
+                    self._remove_node(node)
+                self._negative.pop(key, None)
+                if self._write_behind:
+                    self._write_behind.enqueue(key, DELETE)
+                seq = self._oplog.append(DELETE, key) if self._oplog else 0
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Retrieve several keys under a single lock acquisition and clock read.
+        Returns a dict of the keys that were found; hits are promoted in the
+        order given, as if get had been called for each key. In read-through
+        mode the misses are fetched with one store.get_many call.
+        """
+        now = time.time()
+        result = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                self.stats['total_requests'] += 1
+                node = self._lookup(key, now)
+                if node:
+                    result[key] = node.value
+                elif self._read_through and key not in self._negative:
+                    missing.append(key)
+        if missing:
+            result.update(self._read_store_many(missing))
+        return result
+
+    def put_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None):
+        """
+        Store several key-value pairs under a single lock acquisition, all
+        with the same TTL. With max_bytes set, nothing is stored if any
+        value is too heavy.
+        """
+        expire_at = self._expire_at(ttl, time.time())
+        weights = [self._weigh(key, value) for key, value in mapping.items()]
+        if self._write_behind:
+            self._write_behind.wait_for_room()
+        with self._write_lock:
+            if self._write_through:
+                self._write_store(mapping)
+            seq = 0
+            with self.lock:
+                for (key, value), weight in zip(mapping.items(), weights):
+                    self._supersede(key)
+                    self._store(key, value, expire_at, weight)
+                    if self._write_behind:
+                        self._write_behind.enqueue(key, PUT, value)
+                    if self._oplog:
+                        seq = self._log_put(key, value)
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def delete_many(self, keys: Iterable[str]):
+        """
+        Remove several keys under a single lock acquisition.
+        """
+        keys = list(keys)
+        if self._write_behind:
+            self._write_behind.wait_for_room()
+        with self._write_lock:
+            if self._write_through:
+                self._delete_store(keys)
+            seq = 0
+            with self.lock:
+                for key in keys:
+                    self._supersede(key)
+                    node = self.cache.get(key)
+                    if node:
+                        self._remove_node(node)
+                    self._negative.pop(key, None)
+                    if self._write_behind:
+                        self._write_behind.enqueue(key, DELETE)
+                    if self._oplog:
+                        seq = self._oplog.append(DELETE, key)
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def _expire_at(self, ttl: Optional[int], now: Optional[float]) -> Optional[float]:
+        """
+        Turn a TTL (or the default TTL) into an absolute expiry time.
+        """
+        if ttl is None:
+            ttl = self.default_ttl
+        if ttl is None:
+            return None
+        return (now if now is not None else time.time()) + ttl
+
+    def _weigh(self, key: str, value: Any) -> int:
+        """
+        Return the entry's weight when max_bytes is set (0 otherwise), and
+        reject entries heavier than the whole budget without touching the
+        cache.
+        """
+        if self.max_bytes is None:
+            return 0
+        weight = self.weigher(key, value)
+        if weight > self.max_bytes:
+            with self.lock:
+                self.stats['oversize_rejections'] += 1
+            raise ValueError(f"Entry for {key!r} weighs {weight} bytes, more than max_bytes={self.max_bytes}")
+        return weight
+
+    def _store(self, key: str, value: Any, expire_at: Optional[float], weight: int = 0,
+               cost: float = 1.0, ttl: Optional[float] = None, stale_ttl: Optional[float] = None):
+        """
+        Insert or update a key. expire_at ends the fresh period; with a
+        stale_ttl the entry is removed that much later. Entries that will
+        need a reload keep ttl and stale_ttl for it. Caller must hold the
+        lock.
+        """
+        if self._read_buffers:
+            self._drain_read_buffers()
+        if self._negative:
+            self._negative.pop(key, None)
+        now = time.time()
+        stale_at = None
+        if stale_ttl is not None and expire_at is not None:
+            stale_at = expire_at
+            expire_at += stale_ttl
+        refresh_at = stale_at
+        if self._refresh_keys and key in self._refresh_keys and (
+                refresh_at is None or now + self.refresh_after < refresh_at):
+            refresh_at = now + self.refresh_after
+        node = self.cache.get(key)
+        if node:
+            node.value = value
+            node.expire_at = expire_at
+            self.total_weight += weight - node.weight
+            node.weight = weight
+            node.cost = cost
+            node.written_at = now
+            node.stale_at = stale_at
+            node.refresh_at = refresh_at
+            self._on_access(node)
+            self._expiry.schedule(node)
+            # A heavier value may push the cache over budget; the policy may
+            # even pick this node, which is then simply not kept
+            while self.max_bytes is not None and self.total_weight > self.max_bytes:
+                if not self._evict(key):
+                    break
+        else:
+            # If cache is full, evict before adding the new item
+            while self.size >= self.max_size or (
+                    self.max_bytes is not None and self.total_weight + weight > self.max_bytes):
+                if not self._evict(key):
+                    break
+            new_node = Node(key, value, expire_at, weight, cost)
+            new_node.written_at = now
+            new_node.stale_at = stale_at
+            new_node.refresh_at = refresh_at
+            self.cache[key] = new_node
+            self._policy.on_insert(new_node)
+            self.size += 1
+            self.total_weight += weight
+            self._expiry.schedule(new_node)
+            node = new_node
+        if refresh_at is not None:
+            node.ttl = ttl
+            node.stale_ttl = stale_ttl
+
+    def _store_missing(self, key: str, ttl: Optional[float]) -> int:
+        """
+        Insert or renew a negative entry, evicting the least recently used
+        negative entry if there are too many. A cached value it replaces is
+        logged as deleted; returns that record's sequence number, or 0.
+        Caller must hold the lock.
+        """
+        seq = 0
+        node = self.cache.get(key)
+        if node:
+            self._remove_node(node)
+            if self._oplog:
+                seq = self._oplog.append(DELETE, key)
+        self._negative[key] = time.time() + (ttl if ttl is not None else self.negative_ttl)
+        self._negative.move_to_end(key)
+        if len(self._negative) > self.negative_max_size:
+            self._negative.popitem(last=False)
+        return seq
+
+    def _lookup(self, key: str, now: Optional[float]) -> Optional[Node]:
+        """
+        Return the live node for a key, promoting it, and count the hit,
+        stale hit, negative hit or miss. Expired nodes are removed, and nodes
+        past their refresh_at are reloaded through the registered loader.
+        Caller must hold the lock.
+        """
+        node = self.cache.get(key)
+        if now is None:
+            now = time.time()
+        if not node:
+            if self._negative:
+                expire_at = self._negative.get(key)
+                if expire_at is not None:
+                    if expire_at >= now:
+                        self._negative.move_to_end(key)
+                        self.stats['negative_hits'] += 1
+                        return None
+                    del self._negative[key]
+            self.stats['misses'] += 1
+            return None
+        if node.expire_at is not None and node.expire_at < now:
+            self._remove_node(node)
+            self.stats['misses'] += 1
+            self.stats['expired_removals'] += 1
+            return None
+        self._on_access(node)
+        if node.stale_at is not None and node.stale_at < now:
+            self.stats['stale_hits'] += 1
+        else:
+            self.stats['hits'] += 1
+        if node.refresh_at is not None and node.refresh_at < now and self.loader is not None:
+            self._reload(node, self.loader, node.ttl, node.stale_ttl, now)
+        return node
 
     def clear(self):
         """
         Clear the entire cache.
         """
         with self.lock:
-            self.cache.clear()
-            self.head = None
-            self.tail = None
-            self.size = 0
+            self._clear()
+            seq = self._oplog.append(CLEAR) if self._oplog else 0
+        if seq:
+            self._oplog.wait_synced(seq)
+
+    def _clear(self):
+        """
+        Body of clear. Caller must hold the lock.
+        """
+        self.cache.clear()
+        self._policy.clear()
+        self.total_weight = 0
+        self.size = 0
+        self._expiry.clear()
+        self._negative.clear()
+
+    def compact(self):
+        """
+        Rewrite the operation log from the live entries now.
+        """
+        if self._oplog:
+            self._oplog.compact()
+
+    def _live_keys(self) -> List[str]:
+        """
+        List the cached keys for an operation log compaction. Caller must
+        hold the lock.
+        """
+        return list(self.cache)
+
+    def _live_entries(self, keys: List[str]) -> List[tuple]:
+        """
+        Copy (written_at, key, value, expire_at, stale_at) for those of keys
+        still live, for an operation log compaction. Caller must hold the
+        lock.
+        """
+        now = time.time()
+        entries = []
+        gc_enabled = gc.isenabled()
+        # As in _snapshot_entries, keep a collection off the lock
+        gc.disable()
+        try:
+            for key in keys:
+                node = self.cache.get(key)
+                if node is not None and (node.expire_at is None or node.expire_at > now):
+                    entries.append((node.written_at, key, node.value, node.expire_at, node.stale_at))
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return entries
+
+    def _log_put(self, key: str, value: Any) -> int:
+        """
+        Append a put to the operation log with the expiry it was stored with,
+        or a delete if it was not kept. Caller must hold the lock.
+        """
+        node = self.cache.get(key)
+        if node is None:
+            return self._oplog.append(DELETE, key)
+        return self._oplog.append(PUT, key, value, node.expire_at, node.stale_at)
+
+    def _replay(self, path: str):
+        """
+        Rebuild the cache from an operation log. Puts that have expired
+        since are applied as deletes.
+        """
+        now = time.time()
+        # Runs of live puts are stored in batches, like a snapshot load
+        puts = []
+        for op, key, value, expire_at, stale_at in replay_oplog(path):
+            if op == PUT and (expire_at is None or expire_at > now):
+                puts.append((key, value, expire_at, stale_at))
+                continue
+            self._load_entries(puts)
+            puts = []
+            with self.lock:
+                if op == CLEAR:
+                    self._clear()
+                    continue
+                node = self.cache.get(key)
+                if node:
+                    self._remove_node(node)
+        self._load_entries(puts)
 
     def get_stats(self) -> dict:
         """
         Return cache statistics.
         """
         with self.lock:
-            total = self.stats['total_requests']
-            hits = self.stats['hits']
+            buffered_hits = sum(buf.hits for buf in self._read_buffers)
+            total = self.stats['total_requests'] + buffered_hits
+            hits = self.stats['hits'] + buffered_hits
             misses = self.stats['misses']
-            hit_rate = hits / total if total > 0 else 0.0
-            return {
+            # Stale hits were served from the cache too
+            hit_rate = (hits + self.stats['stale_hits']) / total if total > 0 else 0.0
+            stats = {
                 'hits': hits,
                 'misses': misses,
                 'hit_rate': round(hit_rate, 4),
                 'total_requests': total,
                 'current_size': self.size,
                 'evictions': self.stats['evictions'],
-                'expired_removals': self.stats['expired_removals']
+                'expired_removals': self.stats['expired_removals'],
+                'max_cleanup_lock_ms': round(self.stats['max_cleanup_lock_time'] * 1000, 3),
+                'max_snapshot_lock_ms': round(self.stats['max_snapshot_lock_time'] * 1000, 3),
+                'read_buffer_drops': self.stats['read_buffer_drops'] + sum(buf.drops for buf in self._read_buffers),
+                'total_weight': self.total_weight,
+                'oversize_rejections': self.stats['oversize_rejections'],
+                'loads': self.stats['loads'],
+                'load_failures': self.stats['load_failures'],
+                'coalesced_waits': self.stats['coalesced_waits'],
+                'inflight_overflows': self.stats['inflight_overflows'],
+                'early_refreshes': self.stats['early_refreshes'],
+                'stale_hits': self.stats['stale_hits'],
+                'stale_refreshes': self.stats['stale_refreshes'],
+                'refresh_aheads': self.stats['refresh_aheads'],
+                'refresh_ahead_throttled': self.stats['refresh_ahead_throttled'],
+                'negative_hits': self.stats['negative_hits'],
+                'negative_size': len(self._negative),
+                'store_reads': self.stats['store_reads'],
+                'store_writes': self.stats['store_writes']
             }
+            stats.update(self._policy.stats())
+        if self._write_behind:
+            stats.update(self._write_behind.metrics())
+        if self._oplog:
+            stats.update(self._oplog.metrics())
+        return stats
 
     def get_all(self):
         """
         Return all non-expired items as a list of dicts: {"key": ..., "value": ...}
         """
         with self.lock:
+            self._drain_read_buffers()
             now = time.time()
             result = []
-            node = self.head
-            while node:
+            for node in self._policy:
                 if node.expire_at is None or node.expire_at > now:
                     result.append({"key": node.key, "value": node.value})
-                node = node.next
             return result
 
-    def _evict_lru(self):
+    def snapshot(self, path: str) -> int:
         """
-        Evict the least recently used item.
+        Write the live entries to path in the snapshot module's binary
+        format and return how many were written. The lock is held only to
+        copy (key, value, expire_at, stale_at) of each entry; values are
+        pickled afterwards, so a value mutated in place meanwhile is saved
+        as it is then. Entries are written least recently used first.
         """
-        if self.tail:
-            self._remove_node(self.tail)
-            self.stats['evictions'] += 1
+        entries = self._snapshot_entries()
+        write_snapshot(path, entries, len(entries))
+        return len(entries)
 
-    def _remove_node(self, node: Node):
+    def _snapshot_entries(self) -> List[tuple]:
+        """
+        Copy the live entries for a snapshot, least recently used first.
+        """
+        gc_enabled = gc.isenabled()
+        with self.lock:
+            start = time.perf_counter()
+            self._drain_read_buffers()
+            now = time.time()
+            # A collection set off by the new tuples would scan the whole heap
+            # under the lock
+            gc.disable()
+            try:
+                entries = [(node.key, node.value, node.expire_at, node.stale_at) for node in self._policy
+                           if node.expire_at is None or node.expire_at > now]
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            held = time.perf_counter() - start
+            if held > self.stats['max_snapshot_lock_time']:
+                self.stats['max_snapshot_lock_time'] = held
+        entries.reverse()
+        return entries
+
+    def load(self, path: str) -> int:
+        """
+        Insert the entries of a snapshot written by snapshot(), skipping
+        those that have expired since, and return how many were inserted.
+        Entries keep their absolute expiry and overwrite cached keys; the
+        lock is taken once per LOAD_BATCH_SIZE entries. Nothing is written
+        to a store.
+        """
+        return self._load_entries(read_snapshot(path, time.time()))
+
+    def _load_entries(self, entries: Iterable[tuple]) -> int:
+        """
+        Weigh snapshot entries outside the lock and store them in batches.
+        Entries too heavy for max_bytes are skipped.
+        """
+        loaded = 0
+        batch = []
+        for key, value, expire_at, stale_at in entries:
+            try:
+                weight = self._weigh(key, value)
+            except ValueError:
+                continue
+            batch.append((key, value, expire_at, stale_at, weight))
+            if len(batch) == self.LOAD_BATCH_SIZE:
+                loaded += self._restore(batch)
+                batch = []
+        return loaded + self._restore(batch)
+
+    def _restore(self, batch: List[tuple]) -> int:
+        """
+        Store a batch of loaded snapshot entries under one lock acquisition.
+        """
+        with self.lock:
+            for key, value, expire_at, stale_at, weight in batch:
+                if stale_at is None:
+                    self._store(key, value, expire_at, weight)
+                else:
+                    self._store(key, value, stale_at, weight, stale_ttl=expire_at - stale_at)
+                if self._oplog:
+                    self._log_put(key, value)
+        return len(batch)
+
+    def _record_read(self, node: Node):
         """
-        Remove a node from the doubly linked list and cache dict.
+        Record a lock-free hit in the calling thread's read buffer, and drain
+        the buffers if this one is half full and the lock is free.
         """
-        if node.prev:
-            node.prev.next = node.next
-        if node.next:
-            node.next.prev = node.prev
-        if node == self.head:
-            self.head = node.next
-        if node == self.tail:
-            self.tail = node.prev
-        node.prev = node.next = None
-        if node.key in self.cache:
-            del self.cache[node.key]
-            self.size -= 1
+        buf = getattr(self._local, 'buffer', None)
+        if buf is None:
+            buf = ReadBuffer(self.read_buffer_size)
+            self._local.buffer = buf
+            with self.lock:
+                self._read_buffers.append(buf)
+        buf.hits += 1
+        if len(buf.pending) == self.read_buffer_size:
+            buf.drops += 1
+        buf.pending.append(node)
+        if len(buf.pending) * 2 >= self.read_buffer_size and self.lock.acquire(blocking=False):
+            try:
+                self._drain_read_buffers()
+            finally:
+                self.lock.release()
 
-    def _add_to_head(self, node: Node):
+    def _drain_read_buffers(self):
         """
-        Add a node to the head (most recently used) of the list.
+        Apply buffered hits to the eviction policy. Buffers of finished threads are
+        folded into the shared stats and dropped. Caller must hold the lock.
         """
-        node.prev = None
-        node.next = self.head
-        if self.head:
-            self.head.prev = node
-        self.head = node
-        if not self.tail:
-            self.tail = node
+        retired = []
+        for buf in self._read_buffers:
+            pending = buf.pending
+            while pending:
+                node = pending.popleft()
+                if self.cache.get(node.key) is node:
+                    self._on_access(node)
+            if not buf.thread.is_alive():
+                retired.append(buf)
+        for buf in retired:
+            self._read_buffers.remove(buf)
+            self.stats['hits'] += buf.hits
+            self.stats['total_requests'] += buf.hits
+            self.stats['read_buffer_drops'] += buf.drops
 
-    def _move_to_head(self, node: Node):
+    def _evict(self, key: str) -> bool:
+        """
+        Evict the item the eviction policy chooses to make room for key.
+        Returns False if the policy had nothing to evict.
+        """
+        victim = self._policy.choose_victim(key)
+        if not victim:
+            return False
+        if self.cache.get(victim.key) is not victim:
+            # Removing it would free nothing, so the caller's loop would spin
+            raise RuntimeError(f"Eviction policy chose {victim.key!r}, which is not in this cache")
+        self._remove_node(victim)
+        self.stats['evictions'] += 1
+        return True
+
+    def _remove_node(self, node: Node):
         """
-        Move a node to the head (most recently used).
+        Remove a node from the eviction policy, expiry index and cache dict.
         """
-        if node == self.head:
+        if self.cache.get(node.key) is not node:
             return
-        # Remove from current position
-        if node.prev:
-            node.prev.next = node.next
-        if node.next:
-            node.next.prev = node.prev
-        if node == self.tail:
-            self.tail = node.prev
-        # Add to head
-        node.prev = None
-        node.next = self.head
-        if self.head:
-            self.head.prev = node
-        self.head = node
+        self._policy.on_remove(node)
+        self._expiry.cancel(node)
+        del self.cache[node.key]
+        self.size -= 1
+        self.total_weight -= node.weight
+
+    def _remove_expired(self, now: float, deadline: Optional[float] = None) -> int:
+        """
+        Remove the entries the expiry engine reports as expired. Runs in time
+        proportional to the number of expired entries, not the cache size.
+        With a perf_counter deadline, works in batches and stops at the first
+        batch boundary past it.
+        """
+        limit = self.cleanup_batch_size if deadline is not None else None
+        removed = 0
+        while True:
+            for node in self._expiry.pop_expired(now, limit):
+                if self.cache.get(node.key) is node:
+                    self._remove_node(node)
+                    self.stats['expired_removals'] += 1
+                    removed += 1
+            if not self._expiry.expired_pending(now):
+                return removed
+            if deadline is None or time.perf_counter() >= deadline:
+                return removed
+
+    def _run_cleanup_pass(self) -> int:
+        """
+        Run one cleanup pass, releasing the lock between bounded batches and
+        recording the longest lock hold.
+        """
+        pass_deadline = time.perf_counter() + self.cleanup_time_budget
+        removed = 0
+        while True:
+            with self.lock:
+                start = time.perf_counter()
+                self._drain_read_buffers()
+                now = time.time()
+                removed += self._remove_expired(now, min(start + self.cleanup_max_lock_time, pass_deadline))
+                held = time.perf_counter() - start
+                if held > self.stats['max_cleanup_lock_time']:
+                    self.stats['max_cleanup_lock_time'] = held
+                pending = self._expiry.expired_pending(now)
+            if not pending or time.perf_counter() >= pass_deadline:
+                return removed
+            # Let waiting readers and writers take the lock between batches
+            time.sleep(0)
 
     def _cleanup_expired_keys(self):
         """
         Background thread to clean up expired keys.
         """
         while not self._stop_event.is_set():
-            with self.lock:
-                now = time.time()
-                node = self.tail
-                while node:
-                    prev = node.prev
-                    if node.expire_at is not None and node.expire_at < now:
-                        self._remove_node(node)
-                        self.stats['expired_removals'] += 1
-                    node = prev
+            self._run_cleanup_pass()
             self._stop_event.wait(self.cleanup_interval)
 
     def stop_cleanup_thread(self):
@@ -213,4 +1408,223 @@ class ThreadSafeLRUCache:
         Stop the background cleanup thread (for testing/teardown).
         """
         self._stop_event.set()
-        self._cleanup_thread.join() 
\ No newline at end of file
+        self._cleanup_thread.join()
+        if self._refresh_pool is not None:
+            self._refresh_pool.shutdown(wait=False)
+        if self._write_behind:
+            self._write_behind.close()
+        if self._oplog:
+            self._oplog.close()
+
+    def flush(self):
+        """
+        Write every change queued for the store now (write-behind only).
+        """
+        if self._write_behind:
+            self._write_behind.flush() 
+
+class ShardedLRUCache:
+    """
+    Lock-striped cache that hash-partitions keys across independent
+    ThreadSafeLRUCache shards, each with its own lock, list and stats.
+    """
+    def __init__(self, max_size: int = 1000, num_shards: int = 16, **cache_options):
+        """
+        Initialize the shards. Capacity is split as evenly as possible, so
+        LRU order is only exact within a shard. cache_options (default_ttl,
+        cleanup_interval, expiry, ...) are passed to every shard; max_bytes
+        is split like max_size. policy is a registered name or a factory
+        called with each shard's capacity, such as an EvictionPolicy
+        subclass; expiry is a name or a factory taking no arguments.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if cache_options.get('oplog_path') is not None:
+            # Keys are assigned to shards by hash(), which changes between runs
+            raise ValueError("oplog_path is not supported by ShardedLRUCache")
+        num_shards = min(num_shards, max(max_size, 1))
+        self.max_size = max_size
+        self.num_shards = num_shards
+        base, extra = divmod(max_size, num_shards)
+        max_bytes = cache_options.pop('max_bytes', None)
+        if max_bytes is not None:
+            byte_base, byte_extra = divmod(max_bytes, num_shards)
+        policy = cache_options.pop('policy', 'lru')
+        if not isinstance(policy, str) and not callable(policy):
+            raise ValueError("ShardedLRUCache needs a policy name or a factory taking the shard's "
+                             "capacity; one policy instance cannot be shared by shards")
+        expiry = cache_options.pop('expiry', 'heap')
+        if not isinstance(expiry, str) and not callable(expiry):
+            raise ValueError("ShardedLRUCache needs an expiry engine name or a factory; "
+                             "one engine instance cannot be shared by shards")
+        self.shards = []
+        for i in range(num_shards):
+            shard_size = base + (1 if i < extra else 0)
+            self.shards.append(ThreadSafeLRUCache(
+                max_size=shard_size,
+                max_bytes=None if max_bytes is None else byte_base + (1 if i < byte_extra else 0),
+                policy=policy if isinstance(policy, str) else policy(shard_size),
+                expiry=expiry if isinstance(expiry, str) else expiry(),
+                **cache_options))
+
+    def _shard_for(self, key: str) -> ThreadSafeLRUCache:
+        """
+        Return the shard responsible for a key.
+        """
+        return self.shards[hash(key) % self.num_shards]
+
+    def put(self, key: str, value: Any, ttl: Optional[int] = None, cost: float = 1.0,
+            stale_ttl: Optional[float] = None):
+        """
+        Store a key-value pair in its shard.
+        """
+        self._shard_for(key).put(key, value, ttl, cost, stale_ttl)
+
+    def put_missing(self, key: str, ttl: Optional[float] = None):
+        """
+        Record in its shard that a key does not exist.
+        """
+        self._shard_for(key).put_missing(key, ttl)
+
+    def register_refresh(self, key: str):
+        """
+        Opt a key into refresh-ahead in its shard.
+        """
+        self._shard_for(key).register_refresh(key)
+
+    def unregister_refresh(self, key: str):
+        """
+        Stop refreshing a key ahead of time in its shard.
+        """
+        self._shard_for(key).unregister_refresh(key)
+
+    def flush(self):
+        """
+        Write every change queued for the store in every shard.
+        """
+        for shard in self.shards:
+            shard.flush()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retrieve a value from its shard.
+        """
+        return self._shard_for(key).get(key)
+
+    def get_or_load(self, key: str, loader: Callable[[str], Any], ttl: Optional[int] = None,
+                    stale_ttl: Optional[float] = None) -> Any:
+        """
+        Return a value from its shard, loading it on a miss; loads are
+        coalesced per key within the shard.
+        """
+        return self._shard_for(key).get_or_load(key, loader, ttl, stale_ttl)
+
+    async def aget_or_load(self, key: str, loader: Callable[[str], Awaitable[Any]],
+                           ttl: Optional[int] = None, stale_ttl: Optional[float] = None) -> Any:
+        """
+        Coroutine version of get_or_load, coalesced per key within the shard.
+        """
+        return await self._shard_for(key).aget_or_load(key, loader, ttl, stale_ttl)
+
+    def delete(self, key: str):
+        """
+        Remove a key from its shard.
+        """
+        self._shard_for(key).delete(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Retrieve several keys, taking each shard's lock once.
+        """
+        result = {}
+        for shard, shard_keys in self._group_by_shard(keys).items():
+            result.update(shard.get_many(shard_keys))
+        return result
+
+    def put_many(self, mapping: Dict[str, Any], ttl: Optional[int] = None):
+        """
+        Store several key-value pairs, taking each shard's lock once.
+        """
+        groups: Dict[ThreadSafeLRUCache, Dict[str, Any]] = {}
+        for key, value in mapping.items():
+            groups.setdefault(self._shard_for(key), {})[key] = value
+        for shard, shard_mapping in groups.items():
+            shard.put_many(shard_mapping, ttl)
+
+    def delete_many(self, keys: Iterable[str]):
+        """
+        Remove several keys, taking each shard's lock once.
+        """
+        for shard, shard_keys in self._group_by_shard(keys).items():
+            shard.delete_many(shard_keys)
+
+    def _group_by_shard(self, keys: Iterable[str]) -> Dict[ThreadSafeLRUCache, List[str]]:
+        """
+        Split keys by the shard responsible for them.
+        """
+        groups: Dict[ThreadSafeLRUCache, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self._shard_for(key), []).append(key)
+        return groups
+
+    def snapshot(self, path: str) -> int:
+        """
+        Write every shard's live entries to one snapshot file. Each shard is
+        copied under its own lock, one after another.
+        """
+        entries = [entry for shard in self.shards for entry in shard._snapshot_entries()]
+        write_snapshot(path, entries, len(entries))
+        return len(entries)
+
+    def load(self, path: str) -> int:
+        """
+        Insert the unexpired entries of a snapshot, each into its shard.
+        """
+        groups: Dict[ThreadSafeLRUCache, List[tuple]] = {}
+        for entry in read_snapshot(path, time.time()):
+            groups.setdefault(self._shard_for(entry[0]), []).append(entry)
+        return sum(shard._load_entries(entries) for shard, entries in groups.items())
+
+    def clear(self):
+        """
+        Clear every shard.
+        """
+        for shard in self.shards:
+            shard.clear()
+
+    def get_stats(self) -> dict:
+        """
+        Return statistics merged across all shards.
+        """
+        merged = {}
+        for shard in self.shards:
+            for name, value in shard.get_stats().items():
+                if name.startswith('max_'):
+                    merged[name] = max(merged.get(name, 0), value)
+                elif isinstance(value, dict):
+                    counts = merged.setdefault(name, {})
+                    for label, count in value.items():
+                        counts[label] = counts.get(label, 0) + count
+                elif name != 'hit_rate':
+                    merged[name] = merged.get(name, 0) + value
+        total = merged.get('total_requests', 0)
+        served = merged.get('hits', 0) + merged.get('stale_hits', 0)
+        merged['hit_rate'] = round(served / total, 4) if total > 0 else 0.0
+        merged['num_shards'] = self.num_shards
+        return merged
+
+    def get_all(self):
+        """
+        Return all non-expired items from every shard.
+        """
+        result = []
+        for shard in self.shards:
+            result.extend(shard.get_all())
+        return result
+
+    def stop_cleanup_thread(self):
+        """
+        Stop the background cleanup thread of every shard.
+        """
+        for shard in self.shards:
+            shard.stop_cleanup_thread()
@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class HeapExpiry:
+    """
+    Expiry index backed by a lazily-invalidated min-heap of expire_at times.
+    """
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+        self._scheduled: Dict[Any, float] = {}
+
+    def schedule(self, node: Any):
+        """
+        Index a node by its expire_at, replacing any earlier schedule.
+        Superseded heap entries are skipped when popped, and the heap is
+        rebuilt once they dominate it.
+        """
+        if node.expire_at is None:
+            self.cancel(node)
+            return
+        self._scheduled[node] = node.expire_at
+        heapq.heappush(self._heap, (node.expire_at, next(self._seq), node))
+        if len(self._heap) > 2 * len(self._scheduled) + 64:
+            self._heap = [(expire_at, next(self._seq), n) for n, expire_at in self._scheduled.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, node: Any):
+        """
+        Forget a node. Its heap entry becomes stale.
+        """
+        self._scheduled.pop(node, None)
+
+    def pop_expired(self, now: float, limit: Optional[int] = None) -> List[Any]:
+        """
+        Return up to limit scheduled nodes whose expire_at is before now. Runs
+        in time proportional to the number of expired (and stale) entries.
+        """
+        heap = self._heap
+        expired = []
+        while heap and heap[0][0] < now:
+            if limit is not None and len(expired) >= limit:
+                break
+            expire_at, _, node = heapq.heappop(heap)
+            if self._scheduled.get(node) == expire_at:
+                del self._scheduled[node]
+                expired.append(node)
+        return expired
+
+    def expired_pending(self, now: float) -> bool:
+        """
+        Whether a further pop_expired call may return nodes.
+        """
+        return bool(self._heap) and self._heap[0][0] < now
+
+    def clear(self):
+        """
+        Drop every scheduled node.
+        """
+        self._heap.clear()
+        self._scheduled.clear()
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+
+class TimingWheelExpiry:
+    """
+    Hierarchical timing wheel. Scheduling and cancelling are O(1); each tick
+    fires one level-0 slot and occasionally cascades a coarser slot down,
+    which is amortized O(1) per expired key.
+    """
+    def __init__(self, tick: float = 1.0, wheel_bits: int = 6, levels: int = 4):
+        """
+        Each level has 2**wheel_bits slots; level L slots span
+        2**(wheel_bits * L) ticks. The default covers ~194 days of 1s ticks,
+        later deadlines wait in an overflow set.
+        """
+        if tick <= 0:
+            raise ValueError("tick must be positive")
+        self.tick = tick
+        self.wheel_bits = wheel_bits
+        self.levels = levels
+        self._mask = (1 << wheel_bits) - 1
+        self._wheels: List[List[Dict[Any, int]]] = [
+            [{} for _ in range(1 << wheel_bits)] for _ in range(levels)
+        ]
+        self._overflow: Dict[Any, int] = {}
+        self._slot_of: Dict[Any, Dict[Any, int]] = {}
+        self._current = int(time.time() // tick)
+
+    def schedule(self, node: Any):
+        """
+        Place a node in the slot for its expiry tick, replacing any earlier
+        schedule.
+        """
+        self.cancel(node)
+        if node.expire_at is None:
+            return
+        # Overdue nodes go in the slot that fires next
+        self._place(node, max(math.ceil(node.expire_at / self.tick), self._current + 1))
+
+    def _place(self, node: Any, due: int):
+        """
+        Put a node in the finest level whose current revolution contains its
+        due tick.
+        """
+        slot = self._overflow
+        for level in range(self.levels):
+            shift = self.wheel_bits * (level + 1)
+            if due >> shift == self._current >> shift:
+                slot = self._wheels[level][(due >> (self.wheel_bits * level)) & self._mask]
+                break
+        slot[node] = due
+        self._slot_of[node] = slot
+
+    def cancel(self, node: Any):
+        """
+        Remove a node from its slot, if it is scheduled.
+        """
+        slot = self._slot_of.pop(node, None)
+        if slot is not None:
+            del slot[node]
+
+    def pop_expired(self, now: float, limit: Optional[int] = None) -> List[Any]:
+        """
+        Advance the wheel towards now and return up to limit nodes whose slots
+        fired. A partly drained slot is finished before the wheel moves on.
+        """
+        target = int(now // self.tick)
+        expired = []
+        while True:
+            slot = self._wheels[0][self._current & self._mask]
+            while slot:
+                if limit is not None and len(expired) >= limit:
+                    return expired
+                node, _ = slot.popitem()
+                del self._slot_of[node]
+                expired.append(node)
+            if self._current >= target:
+                return expired
+            if not self._slot_of:
+                self._current = target
+                return expired
+            self._current += 1
+            self._cascade()
+
+    def expired_pending(self, now: float) -> bool:
+        """
+        Whether a further pop_expired call may return nodes.
+        """
+        if self._wheels[0][self._current & self._mask]:
+            return True
+        return bool(self._slot_of) and self._current < int(now // self.tick)
+
+    def _cascade(self):
+        """
+        At each level boundary, re-place the nodes of the coarser slot that
+        has just come due into finer levels, coarsest first.
+        """
+        current = self._current
+        if current & ((1 << (self.wheel_bits * self.levels)) - 1) == 0 and self._overflow:
+            self._redistribute(self._overflow)
+        for level in range(self.levels - 1, 0, -1):
+            if current & ((1 << (self.wheel_bits * level)) - 1) == 0:
+                slot = self._wheels[level][(current >> (self.wheel_bits * level)) & self._mask]
+                if slot:
+                    self._redistribute(slot)
+
+    def _redistribute(self, slot: Dict[Any, int]):
+        """
+        Empty a slot and place each of its nodes again.
+        """
+        entries = list(slot.items())
+        slot.clear()
+        for node, due in entries:
+            self._place(node, due)
+
+    def clear(self):
+        """
+        Drop every scheduled node.
+        """
+        for slot in self._slot_of.values():
+            slot.clear()
+        self._slot_of.clear()
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+
+class SampledExpiry:
+    """
+    Redis-style probabilistic active expiry. Each round samples sample_size
+    keys that have a TTL and removes the expired ones; rounds repeat only
+    while the expired fraction of the sample stays above threshold. Keys that
+    are never sampled are still expired lazily by get.
+    """
+    def __init__(self, sample_size: int = 20, threshold: float = 0.25):
+        if sample_size < 1:
+            raise ValueError("sample_size must be at least 1")
+        self.sample_size = sample_size
+        self.threshold = threshold
+        # Volatile nodes in a list with a reverse index, for O(1) sampling and removal
+        self._nodes: List[Any] = []
+        self._index: Dict[Any, int] = {}
+        self._more = False
+
+    def schedule(self, node: Any):
+        """
+        Track a node while it has an expire_at.
+        """
+        if node.expire_at is None:
+            self.cancel(node)
+        elif node not in self._index:
+            self._index[node] = len(self._nodes)
+            self._nodes.append(node)
+
+    def cancel(self, node: Any):
+        """
+        Stop tracking a node by swapping the last node into its position.
+        """
+        i = self._index.pop(node, None)
+        if i is None:
+            return
+        last = self._nodes.pop()
+        if last is not node:
+            self._nodes[i] = last
+            self._index[last] = i
+
+    def pop_expired(self, now: float, limit: Optional[int] = None) -> List[Any]:
+        """
+        Run sampling rounds until the expired fraction drops to threshold or
+        at least limit nodes have been collected.
+        """
+        expired = []
+        self._more = False
+        while self._nodes:
+            if limit is not None and len(expired) >= limit:
+                self._more = True
+                break
+            sample = random.sample(self._nodes, min(self.sample_size, len(self._nodes)))
+            found = [node for node in sample if node.expire_at < now]
+            for node in found:
+                self.cancel(node)
+            expired.extend(found)
+            if len(found) <= self.threshold * len(sample):
+                break
+        return expired
+
+    def expired_pending(self, now: float) -> bool:
+        """
+        Whether the last round stopped with the expired fraction still high.
+        """
+        return self._more
+
+    def clear(self):
+        """
+        Drop every tracked node.
+        """
+        self._nodes.clear()
+        self._index.clear()
+        self._more = False
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+EXPIRY_ENGINES = {
+    'heap': HeapExpiry,
+    'wheel': TimingWheelExpiry,
+    'sampled': SampledExpiry,
+}
+
+
+def make_expiry(expiry: Any):
+    """
+    Build an expiry engine from its name, or return an engine instance as is.
+    """
+    if isinstance(expiry, str):
+        try:
+            return EXPIRY_ENGINES[expiry]()
+        except KeyError:
+            raise ValueError(f"Unknown expiry engine: {expiry!r}") from None
+    return expiry
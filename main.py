@@ -7,11 +7,23 @@ import pytest
 import sys
 import io
 import os
-from contextlib import redirect_stdout
+from contextlib import asynccontextmanager, redirect_stdout
 import json
 from datetime import datetime
 
-app = FastAPI(title="Thread-Safe LRU Cache API")
+# Set to a file path to reload the cache from it on startup and save it on shutdown
+SNAPSHOT_PATH = os.environ.get("CACHE_SNAPSHOT_PATH")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Restore the cache from its snapshot on startup and save it on shutdown"""
+    if SNAPSHOT_PATH and os.path.exists(SNAPSHOT_PATH):
+        cache.load(SNAPSHOT_PATH)
+    yield
+    if SNAPSHOT_PATH:
+        cache.snapshot(SNAPSHOT_PATH)
+
+app = FastAPI(title="Thread-Safe LRU Cache API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
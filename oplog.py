@@ -0,0 +1,345 @@
+import math
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from write_behind import DELETE, PUT
+
+CLEAR = 'clear'
+# On-disk op codes
+OPCODES = {PUT: 1, DELETE: 2, CLEAR: 3}
+OPS = {code: op for op, code in OPCODES.items()}
+
+FSYNC_POLICIES = ('always', 'everysec', 'no')
+
+# Per record: op, expire_at, stale_at (NaN for None), key length, value
+# length and CRC-32 of key and value, followed by the UTF-8 key and the
+# pickled value (empty for DELETE and CLEAR)
+RECORD = struct.Struct('<BddIII')
+
+# Live entry copied for compaction: (written_at, key, value, expire_at, stale_at)
+Record = Tuple[float, str, Any, Optional[float], Optional[float]]
+
+# Keys whose entries compaction copies per acquisition of the cache lock
+COMPACT_CHUNK = 1000
+
+
+def encode(op: str, key: str = '', value: Any = None, expire_at: Optional[float] = None,
+           stale_at: Optional[float] = None) -> bytes:
+    """
+    Encode one log record.
+    """
+    key_bytes = key.encode('utf-8')
+    value_bytes = pickle.dumps(value, pickle.HIGHEST_PROTOCOL) if op == PUT else b''
+    payload = key_bytes + value_bytes
+    return RECORD.pack(OPCODES[op], math.nan if expire_at is None else expire_at,
+                       math.nan if stale_at is None else stale_at,
+                       len(key_bytes), len(value_bytes), zlib.crc32(payload)) + payload
+
+
+def replay(path: str) -> Iterator[Tuple[str, str, Any, Optional[float], Optional[float]]]:
+    """
+    Yield the (op, key, value, expire_at, stale_at) records of the log at
+    path in order. A torn or corrupt record at the end, left by a crash
+    mid-write, is cut off so that appends continue after the last good one.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb', buffering=1 << 20) as f:
+        good = 0
+        while True:
+            header = f.read(RECORD.size)
+            if not header:
+                break
+            if len(header) < RECORD.size:
+                break
+            code, expire_at, stale_at, key_len, value_len, crc = RECORD.unpack(header)
+            payload = f.read(key_len + value_len)
+            if len(payload) < key_len + value_len or zlib.crc32(payload) != crc or code not in OPS:
+                break
+            good = f.tell()
+            op = OPS[code]
+            value = pickle.loads(payload[key_len:]) if op == PUT else None
+            yield (op, payload[:key_len].decode('utf-8'), value,
+                   None if math.isnan(expire_at) else expire_at,
+                   None if math.isnan(stale_at) else stale_at)
+    if good < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(good)
+
+
+class OpLog:
+    """
+    Append-only log of cache mutations, written by a writer thread with
+    group commit.
+
+    append only queues the record and returns its sequence number, so it
+    can be called under the cache lock. The writer takes everything queued
+    since its last pass, pickles it and writes it with one write call;
+    fsync is 'always' (once per batch, and wait_synced blocks until then),
+    'everysec' or 'no' (left to the OS). Once the file reaches
+    compact_size and has doubled since the last compaction, a background
+    thread rewrites it from the live entries: live_keys() lists the keys
+    and live_entries(keys) copies the entries of COMPACT_CHUNK of them at a
+    time, each call under lock, so the lock is never held for a full copy.
+    Records appended meanwhile are carried over to the new file.
+    """
+    def __init__(self, path: str, fsync: str = 'everysec', compact_size: int = 64 << 20,
+                 lock: Any = None, live_keys: Optional[Callable[[], List[str]]] = None,
+                 live_entries: Optional[Callable[[List[str]], List[Record]]] = None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}; expected one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.fsync = fsync
+        self.compact_size = compact_size
+        self._lock = lock
+        self._live_keys = live_keys
+        self._live_entries = live_entries
+        self._cond = threading.Condition()
+        # (seq, op, key, value, expire_at, stale_at) waiting for the writer
+        self._queue: List[tuple] = []
+        self._seq = 0
+        # Last record written (and, with fsync='always', synced)
+        self._synced_seq = 0
+        # Held while writing to the file or swapping in a compacted one
+        self._io_lock = threading.Lock()
+        self._file = open(path, 'ab')
+        self._size = self._file.tell()
+        self._base_size = self._size
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        # While compacting: records after _tail_from, to append to the new file
+        self._tail: Optional[List[bytes]] = None
+        self._tail_from = 0
+        # Records up to here are covered by the last compacted file; ones
+        # still queued when it was swapped in are dropped by the writer
+        self._compacted_seq = 0
+        self._compacting = False
+        self.stats = {
+            'records': 0,
+            'batches': 0,
+            'fsyncs': 0,
+            'compactions': 0,
+            'errors': 0,
+            'max_lock_time': 0.0
+        }
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def append(self, op: str, key: str = '', value: Any = None, expire_at: Optional[float] = None,
+               stale_at: Optional[float] = None) -> int:
+        """
+        Queue a record for the writer and return its sequence number.
+        """
+        with self._cond:
+            self._seq += 1
+            self._queue.append((self._seq, op, key, value, expire_at, stale_at))
+            self._cond.notify()
+            return self._seq
+
+    def wait_synced(self, seq: int):
+        """
+        With fsync='always', block until record seq is on disk.
+        """
+        if self.fsync != 'always':
+            return
+        with self._cond:
+            self._cond.wait_for(lambda: self._synced_seq >= seq or self._closed)
+
+    def compact(self):
+        """
+        Rewrite the log from live state now, in the caller's thread.
+        """
+        with self._cond:
+            if self._compacting or self._closed:
+                return
+            self._compacting = True
+        try:
+            self._compact()
+        finally:
+            with self._cond:
+                self._compacting = False
+                self._cond.notify_all()
+
+    def close(self):
+        """
+        Write and sync everything queued, then stop the writer thread. A
+        compaction under way is finished first. Must not be called with the
+        cache lock held, which compaction takes.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._compacting)
+        self._thread.join()
+        with self._io_lock:
+            self._file.close()
+
+    def metrics(self) -> dict:
+        """
+        Return the log's statistics as reported by the cache's get_stats.
+        """
+        with self._cond:
+            return {
+                'oplog_records': self.stats['records'],
+                'oplog_batches': self.stats['batches'],
+                'oplog_fsyncs': self.stats['fsyncs'],
+                'oplog_compactions': self.stats['compactions'],
+                'oplog_errors': self.stats['errors'],
+                'oplog_pending': len(self._queue),
+                'oplog_bytes': self._size,
+                'oplog_max_lock_ms': round(self.stats['max_lock_time'] * 1000, 3)
+            }
+
+    def _run(self):
+        """
+        Writer thread: write whatever is queued as one batch.
+        """
+        timeout = 1.0 if self.fsync == 'everysec' else None
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._closed, timeout)
+                batch, self._queue = self._queue, []
+                closed = self._closed
+            if batch:
+                self._write_batch(batch)
+            elif self.fsync == 'everysec' and self._dirty and time.monotonic() - self._last_fsync >= 1.0:
+                with self._io_lock:
+                    self._sync()
+            if closed and not batch:
+                if self._dirty and self.fsync != 'no':
+                    with self._io_lock:
+                        self._sync()
+                return
+            if self._should_compact():
+                threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        """
+        Compaction thread body; a failure is already counted under errors.
+        """
+        try:
+            self.compact()
+        except Exception:
+            pass
+
+    def _write_batch(self, batch: List[tuple]):
+        """
+        Encode and write a batch, then fsync as the policy says.
+        """
+        chunks = []
+        errors = 0
+        for seq, op, key, value, expire_at, stale_at in batch:
+            try:
+                chunks.append((seq, encode(op, key, value, expire_at, stale_at)))
+            except Exception:
+                # Unpicklable value: the entry lives in memory only
+                errors += 1
+        data = b''.join(chunk for _, chunk in chunks)
+        with self._io_lock:
+            if batch[0][0] <= self._compacted_seq:
+                chunks = [(seq, chunk) for seq, chunk in chunks if seq > self._compacted_seq]
+                data = b''.join(chunk for _, chunk in chunks)
+            try:
+                self._file.write(data)
+                self._file.flush()
+                self._size += len(data)
+                self._dirty = True
+                if self._tail is not None:
+                    self._tail.extend(chunk for seq, chunk in chunks if seq > self._tail_from)
+                if self.fsync == 'always' or (self.fsync == 'everysec' and
+                                              time.monotonic() - self._last_fsync >= 1.0):
+                    self._sync()
+            except OSError:
+                # Keep going (and release waiters); the batch is lost
+                errors += len(chunks)
+                chunks = []
+        with self._cond:
+            self.stats['records'] += len(chunks)
+            self.stats['batches'] += 1
+            self.stats['errors'] += errors
+            self._synced_seq = batch[-1][0]
+            self._cond.notify_all()
+
+    def _sync(self):
+        """
+        fsync the file. Caller must hold the io lock.
+        """
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        with self._cond:
+            self.stats['fsyncs'] += 1
+
+    def _should_compact(self) -> bool:
+        """
+        Return True if the log is big enough, and has grown enough since the
+        last compaction, to be rewritten.
+        """
+        if self._live_entries is None or self._compacting:
+            return False
+        return self._size >= self.compact_size and self._size >= 2 * self._base_size
+
+    def _compact(self):
+        """
+        Write live state to a new file, append the records logged since the
+        key list was taken and swap the new file in. Entries are written in
+        the order they were last written, as replay would have applied them.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            keys = self._live_keys()
+            with self._cond:
+                # _tail_from first: the writer reads both without the cond
+                self._tail_from = self._seq
+                self._tail = []
+            self._lock_held(start)
+        tmp_path = self.path + '.tmp'
+        try:
+            entries: List[Record] = []
+            for i in range(0, len(keys), COMPACT_CHUNK):
+                with self._lock:
+                    start = time.perf_counter()
+                    entries.extend(self._live_entries(keys[i:i + COMPACT_CHUNK]))
+                    self._lock_held(start)
+            entries.sort(key=lambda entry: entry[0])
+            with open(tmp_path, 'wb', buffering=1 << 20) as f:
+                for _, key, value, expire_at, stale_at in entries:
+                    try:
+                        f.write(encode(PUT, key, value, expire_at, stale_at))
+                    except Exception:
+                        continue
+                with self._io_lock:
+                    for chunk in self._tail:
+                        f.write(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+                    size = f.tell()
+                    os.replace(tmp_path, self.path)
+                    self._file.close()
+                    self._file = open(self.path, 'ab')
+                    self._size = self._base_size = size
+                    self._compacted_seq = self._tail_from
+                    self._tail = None
+        except BaseException:
+            with self._io_lock:
+                self._tail = None
+            with self._cond:
+                self.stats['errors'] += 1
+            raise
+        with self._cond:
+            self.stats['compactions'] += 1
+
+    def _lock_held(self, start: float):
+        """
+        Record how long compaction has held the cache lock since start.
+        """
+        held = time.perf_counter() - start
+        with self._cond:
+            if held > self.stats['max_lock_time']:
+                self.stats['max_lock_time'] = held
@@ -0,0 +1,851 @@
+import heapq
+import inspect
+import itertools
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Type
+
+
+class EvictionPolicy(ABC):
+    """
+    Interface between ThreadSafeLRUCache and an eviction policy.
+
+    The cache owns the key -> Node dict, TTL handling and hit/miss stats,
+    and calls these hooks with its lock held:
+      on_insert(node)      a new node was added to the dict
+      on_access(node)      a live node was read or overwritten
+      on_remove(node)      a node is leaving (delete, expiry or eviction)
+      choose_victim(key)   the cache is full and needs room for key; return
+                           a node to evict (the cache then calls on_remove)
+    Policies keep their own bookkeeping, usually as attributes on the node.
+    Subclasses must implement these hooks, clear and __iter__, and are
+    constructed as cls(capacity, **policy_options).
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+
+    @abstractmethod
+    def on_insert(self, node: Any):
+        raise NotImplementedError
+
+    @abstractmethod
+    def on_access(self, node: Any):
+        raise NotImplementedError
+
+    @abstractmethod
+    def on_remove(self, node: Any):
+        raise NotImplementedError
+
+    @abstractmethod
+    def choose_victim(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        """
+        Forget every node; called by ThreadSafeLRUCache.clear.
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """
+        Return policy-specific statistics to merge into get_stats().
+        """
+        return {}
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate over resident nodes; get_all uses this order.
+        """
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    Least recently used eviction over a doubly linked list of nodes.
+    """
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self.head: Optional[Any] = None
+        self.tail: Optional[Any] = None
+
+    def on_insert(self, node: Any):
+        """
+        Add a node to the head (most recently used) of the list.
+        """
+        node.prev = None
+        node.next = self.head
+        if self.head:
+            self.head.prev = node
+        self.head = node
+        if not self.tail:
+            self.tail = node
+
+    def on_access(self, node: Any):
+        """
+        Move a node to the head (most recently used).
+        """
+        if node == self.head:
+            return
+        # Remove from current position
+        if node.prev:
+            node.prev.next = node.next
+        if node.next:
+            node.next.prev = node.prev
+        if node == self.tail:
+            self.tail = node.prev
+        # Add to head
+        node.prev = None
+        node.next = self.head
+        if self.head:
+            self.head.prev = node
+        self.head = node
+
+    def on_remove(self, node: Any):
+        """
+        Unlink a node from the list.
+        """
+        if node.prev:
+            node.prev.next = node.next
+        if node.next:
+            node.next.prev = node.prev
+        if node == self.head:
+            self.head = node.next
+        if node == self.tail:
+            self.tail = node.prev
+        node.prev = node.next = None
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Return the least recently used node.
+        """
+        return self.tail
+
+    def clear(self):
+        """
+        Forget every node.
+        """
+        self.head = None
+        self.tail = None
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate from most to least recently used.
+        """
+        node = self.head
+        while node:
+            yield node
+            node = node.next
+
+
+class ClockPolicy(EvictionPolicy):
+    """
+    CLOCK (second chance) eviction. Nodes sit in a circular array of slots;
+    a hit only sets the node's reference bit, and eviction sweeps a hand
+    that clears set bits until it finds a node whose bit is clear.
+    """
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self._slots: List[Optional[Any]] = []
+        self._free: List[int] = []
+        self._hand = 0
+        self._count = 0
+
+    def on_insert(self, node: Any):
+        """
+        Place a node in a free slot with its reference bit clear, so entries
+        that are never read again are the first to go.
+        """
+        node.ref = False
+        if self._free:
+            node.slot = self._free.pop()
+            self._slots[node.slot] = node
+        else:
+            node.slot = len(self._slots)
+            self._slots.append(node)
+        self._count += 1
+
+    def on_access(self, node: Any):
+        """
+        Set the node's reference bit.
+        """
+        node.ref = True
+
+    def on_remove(self, node: Any):
+        """
+        Free the node's slot.
+        """
+        self._slots[node.slot] = None
+        self._free.append(node.slot)
+        self._count -= 1
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Advance the hand, giving referenced nodes a second chance.
+        """
+        if not self._count:
+            return None
+        slots = self._slots
+        while True:
+            node = slots[self._hand]
+            self._hand = (self._hand + 1) % len(slots)
+            if node is None:
+                continue
+            if node.ref:
+                node.ref = False
+                continue
+            return node
+
+    def clear(self):
+        """
+        Forget every node.
+        """
+        self._slots.clear()
+        self._free.clear()
+        self._hand = 0
+        self._count = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate in slot order.
+        """
+        return (node for node in self._slots if node is not None)
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of key frequencies with 4-bit saturating counters.
+    Once sample_size increments have been recorded, every counter is
+    halved so that old popularity fades.
+    """
+    MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+    HALVE = bytes(c >> 1 for c in range(256))
+
+    def __init__(self, capacity: int, sample_factor: int = 10):
+        self.bits = max(4, (max(capacity, 1) - 1).bit_length())
+        self.width = 1 << self.bits
+        self.table = bytearray(self.width * len(self.MULTIPLIERS))
+        self.sample_size = sample_factor * max(capacity, 1)
+        self.additions = 0
+        self._rows = tuple((row * self.width, multiplier) for row, multiplier in enumerate(self.MULTIPLIERS))
+        self._shift = 64 - self.bits
+
+    def _indexes(self, key: Any) -> List[int]:
+        """
+        Return one counter index per row using multiplicative hashing.
+        """
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        shift = self._shift
+        return [offset + (((h * multiplier) & 0xFFFFFFFFFFFFFFFF) >> shift) for offset, multiplier in self._rows]
+
+    def increment(self, key: Any):
+        """
+        Count one occurrence of key, aging the sketch when the sample is full.
+        """
+        table = self.table
+        for i in self._indexes(key):
+            if table[i] < 15:
+                table[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table = table.translate(self.HALVE)
+            self.additions //= 2
+
+    def frequency(self, key: Any) -> int:
+        """
+        Return the estimated frequency of key.
+        """
+        table = self.table
+        return min([table[i] for i in self._indexes(key)])
+
+
+class TinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU. New entries land in a small LRU window; the main region is a
+    segmented LRU (probation and protected). When the window overflows, its
+    LRU entry is only admitted to the main region if the frequency sketch
+    rates it above the main region's victim, so one-off scans cannot flush
+    the hot set.
+    """
+    def __init__(self, capacity: int, window_ratio: float = 0.01, protected_ratio: float = 0.8):
+        super().__init__(capacity)
+        self.window_capacity = max(1, int(capacity * window_ratio))
+        main_capacity = max(capacity - self.window_capacity, 1)
+        self.protected_capacity = max(1, int(main_capacity * protected_ratio))
+        self.sketch = CountMinSketch(capacity)
+        self._window: OrderedDict = OrderedDict()
+        self._probation: OrderedDict = OrderedDict()
+        self._protected: OrderedDict = OrderedDict()
+        self.admission_rejections = 0
+
+    def on_insert(self, node: Any):
+        """
+        Record the key and place the node at the MRU end of the window. While
+        the cache is filling up, window overflow moves straight to probation.
+        """
+        self.sketch.increment(node.key)
+        node.segment = self._window
+        self._window[node.key] = node
+        if len(self._window) > self.window_capacity:
+            _, overflow = self._window.popitem(last=False)
+            overflow.segment = self._probation
+            self._probation[overflow.key] = overflow
+
+    def on_access(self, node: Any):
+        """
+        Record the key and promote the node within its segment. A probation
+        hit moves the node to protected, demoting protected's LRU entry if
+        protected is over capacity.
+        """
+        self.sketch.increment(node.key)
+        if node.segment is self._probation:
+            del self._probation[node.key]
+            node.segment = self._protected
+            self._protected[node.key] = node
+            if len(self._protected) > self.protected_capacity:
+                _, demoted = self._protected.popitem(last=False)
+                demoted.segment = self._probation
+                self._probation[demoted.key] = demoted
+        else:
+            node.segment.move_to_end(node.key)
+
+    def on_remove(self, node: Any):
+        """
+        Remove the node from its segment.
+        """
+        del node.segment[node.key]
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Once the window is full, pit its LRU entry (the candidate) against the
+        main region's victim and evict whichever the sketch rates lower.
+        """
+        main_victim = self._main_victim()
+        if len(self._window) < self.window_capacity or not self._window:
+            return main_victim or next(iter(self._window.values()), None)
+        candidate = next(iter(self._window.values()))
+        if main_victim is None:
+            return candidate
+        if self.sketch.frequency(candidate.key) > self.sketch.frequency(main_victim.key):
+            del self._window[candidate.key]
+            candidate.segment = self._probation
+            self._probation[candidate.key] = candidate
+            return main_victim
+        self.admission_rejections += 1
+        return candidate
+
+    def _main_victim(self) -> Optional[Any]:
+        """
+        Return the LRU entry of probation, falling back to protected.
+        """
+        for segment in (self._probation, self._protected):
+            if segment:
+                return next(iter(segment.values()))
+        return None
+
+    def clear(self):
+        """
+        Forget every node. The frequency sketch is kept.
+        """
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+
+    def stats(self) -> dict:
+        """
+        Return policy-specific statistics.
+        """
+        return {'admission_rejections': self.admission_rejections}
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate over the window, protected and probation segments, each from
+        most to least recently used.
+        """
+        for segment in (self._window, self._protected, self._probation):
+            yield from reversed(list(segment.values()))
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache. T1 holds keys seen once recently and T2 keys
+    seen at least twice; B1 and B2 remember only the keys recently evicted
+    from each. A new key that hits a ghost list shifts the target size p of
+    T1 towards recency (B1) or frequency (B2). Ghost lists are capped so
+    that |T1| + |B1| <= capacity and all four lists hold <= 2 * capacity keys.
+    """
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self.p = 0.0
+        self._t1: OrderedDict = OrderedDict()
+        self._t2: OrderedDict = OrderedDict()
+        self._b1: OrderedDict = OrderedDict()
+        self._b2: OrderedDict = OrderedDict()
+
+    def on_insert(self, node: Any):
+        """
+        Place a new node in T1, or in T2 if its key is a ghost, adapting p.
+        """
+        key = node.key
+        # p adapts here, just after the victim for this insert was chosen,
+        # rather than before it as in the original algorithm
+        if key in self._b1:
+            self.p = min(self.p + max(len(self._b2) / len(self._b1), 1), self.capacity)
+            del self._b1[key]
+            node.segment = self._t2
+        elif key in self._b2:
+            self.p = max(self.p - max(len(self._b1) / len(self._b2), 1), 0)
+            del self._b2[key]
+            node.segment = self._t2
+        else:
+            node.segment = self._t1
+        node.segment[key] = node
+        self._trim_ghosts()
+
+    def on_access(self, node: Any):
+        """
+        Move a node to the MRU end of T2.
+        """
+        if node.segment is self._t1:
+            del self._t1[node.key]
+            node.segment = self._t2
+            self._t2[node.key] = node
+        else:
+            self._t2.move_to_end(node.key)
+
+    def on_remove(self, node: Any):
+        """
+        Remove a node from T1 or T2 without leaving a ghost.
+        """
+        del node.segment[node.key]
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Pick the LRU node of T1 if T1 is above its target p, otherwise of T2,
+        and remember its key in the matching ghost list.
+        """
+        t1_len = len(self._t1)
+        if self._t1 and (t1_len > self.p or (key in self._b2 and t1_len >= self.p) or not self._t2):
+            victim = next(iter(self._t1.values()))
+            self._b1[victim.key] = None
+        elif self._t2:
+            victim = next(iter(self._t2.values()))
+            self._b2[victim.key] = None
+        else:
+            return None
+        return victim
+
+    def _trim_ghosts(self):
+        """
+        Drop the oldest ghost keys beyond the ARC bounds.
+        """
+        while self._b1 and len(self._t1) + len(self._b1) > self.capacity:
+            self._b1.popitem(last=False)
+        while self._b2 and len(self._t1) + len(self._t2) + len(self._b1) + len(self._b2) > 2 * self.capacity:
+            self._b2.popitem(last=False)
+
+    def clear(self):
+        """
+        Forget every node and ghost key.
+        """
+        self.p = 0.0
+        self._t1.clear()
+        self._t2.clear()
+        self._b1.clear()
+        self._b2.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the adaptive target and list sizes.
+        """
+        return {
+            'arc_target_t1': round(self.p, 2),
+            'arc_t1': len(self._t1),
+            'arc_t2': len(self._t2),
+            'arc_b1': len(self._b1),
+            'arc_b2': len(self._b2)
+        }
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate over T2 then T1, each from most to least recently used.
+        """
+        for segment in (self._t2, self._t1):
+            yield from reversed(list(segment.values()))
+
+
+class S3FIFOPolicy(EvictionPolicy):
+    """
+    S3-FIFO. New keys enter a small FIFO; keys read at least twice while
+    there move to the main FIFO, others leave a key in a ghost FIFO so that
+    their next insert goes straight to main. Main entries are reinserted
+    while their 2-bit frequency counter is non-zero. Hits only bump the
+    counter and never reorder a queue.
+    """
+    def __init__(self, capacity: int, small_ratio: float = 0.1):
+        super().__init__(capacity)
+        self.small_capacity = max(1, int(capacity * small_ratio))
+        self.ghost_capacity = max(1, capacity - self.small_capacity)
+        self._small: OrderedDict = OrderedDict()
+        self._main: OrderedDict = OrderedDict()
+        self._ghost: OrderedDict = OrderedDict()
+
+    def on_insert(self, node: Any):
+        """
+        Place a node in main if its key is a ghost, otherwise in small.
+        """
+        node.freq = 0
+        if node.key in self._ghost:
+            del self._ghost[node.key]
+            node.segment = self._main
+        else:
+            node.segment = self._small
+        node.segment[node.key] = node
+
+    def on_access(self, node: Any):
+        """
+        Bump the node's frequency counter, saturating at 3.
+        """
+        if node.freq < 3:
+            node.freq += 1
+
+    def on_remove(self, node: Any):
+        """
+        Remove a node from its queue.
+        """
+        del node.segment[node.key]
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Evict from small while it is at its share, otherwise from main,
+        moving or reinserting entries that were read in the meantime.
+        """
+        small, main = self._small, self._main
+        while small or main:
+            if small and (len(small) >= self.small_capacity or not main):
+                node = next(iter(small.values()))
+                if node.freq > 1:
+                    del small[node.key]
+                    node.freq = 0
+                    node.segment = main
+                    main[node.key] = node
+                    continue
+                self._ghost[node.key] = None
+                if len(self._ghost) > self.ghost_capacity:
+                    self._ghost.popitem(last=False)
+                return node
+            node = next(iter(main.values()))
+            if node.freq > 0:
+                node.freq -= 1
+                main.move_to_end(node.key)
+                continue
+            return node
+        return None
+
+    def clear(self):
+        """
+        Forget every node and ghost key.
+        """
+        self._small.clear()
+        self._main.clear()
+        self._ghost.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the queue sizes.
+        """
+        return {
+            's3fifo_small': len(self._small),
+            's3fifo_main': len(self._main),
+            's3fifo_ghost': len(self._ghost)
+        }
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate over main then small, each from newest to oldest.
+        """
+        for queue in (self._main, self._small):
+            yield from reversed(list(queue.values()))
+
+
+class FrequencyBucket:
+    """
+    Node of the LFU bucket list: every cached node with this frequency, in
+    insertion order.
+    """
+    def __init__(self, freq: int):
+        self.freq = freq
+        self.nodes: OrderedDict = OrderedDict()
+        self.prev: Optional['FrequencyBucket'] = None
+        self.next: Optional['FrequencyBucket'] = None
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    O(1) LFU over a doubly linked list of frequency buckets, lowest first.
+    Ties within a bucket are broken by least recent arrival. With
+    decay_every set, all counts are halved after that many accesses so old
+    popularity fades.
+    """
+    def __init__(self, capacity: int, decay_every: Optional[int] = None):
+        super().__init__(capacity)
+        self.decay_every = decay_every
+        self._head: Optional[FrequencyBucket] = None
+        self._accesses = 0
+        self.decays = 0
+
+    def on_insert(self, node: Any):
+        """
+        Add a node to the frequency-1 bucket.
+        """
+        head = self._head
+        if head is None or head.freq != 1:
+            bucket = FrequencyBucket(1)
+            self._link_after(bucket, None)
+        else:
+            bucket = head
+        node.bucket = bucket
+        bucket.nodes[node.key] = node
+
+    def on_access(self, node: Any):
+        """
+        Move a node to the bucket for its next frequency.
+        """
+        bucket = node.bucket
+        target = bucket.next
+        if target is None or target.freq != bucket.freq + 1:
+            target = FrequencyBucket(bucket.freq + 1)
+            self._link_after(target, bucket)
+        self._detach(node)
+        node.bucket = target
+        target.nodes[node.key] = node
+        if self.decay_every:
+            self._accesses += 1
+            if self._accesses >= self.decay_every:
+                self._decay()
+
+    def on_remove(self, node: Any):
+        """
+        Remove a node from its bucket.
+        """
+        self._detach(node)
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Return the oldest node of the lowest-frequency bucket.
+        """
+        if self._head is None:
+            return None
+        return next(iter(self._head.nodes.values()))
+
+    def _link_after(self, bucket: FrequencyBucket, prev: Optional[FrequencyBucket]):
+        """
+        Link a bucket after prev, or at the head when prev is None.
+        """
+        nxt = prev.next if prev else self._head
+        bucket.prev = prev
+        bucket.next = nxt
+        if nxt:
+            nxt.prev = bucket
+        if prev:
+            prev.next = bucket
+        else:
+            self._head = bucket
+
+    def _detach(self, node: Any):
+        """
+        Take a node out of its bucket, unlinking the bucket once empty.
+        """
+        bucket = node.bucket
+        del bucket.nodes[node.key]
+        if not bucket.nodes:
+            if bucket.prev:
+                bucket.prev.next = bucket.next
+            else:
+                self._head = bucket.next
+            if bucket.next:
+                bucket.next.prev = bucket.prev
+
+    def _decay(self):
+        """
+        Halve every frequency (minimum 1), merging buckets that collide.
+        Halving preserves order, so one pass over the list rebuilds it.
+        """
+        self._accesses = 0
+        self.decays += 1
+        bucket = self._head
+        self._head = None
+        tail: Optional[FrequencyBucket] = None
+        while bucket:
+            freq = max(1, bucket.freq // 2)
+            if tail is None or tail.freq != freq:
+                merged = FrequencyBucket(freq)
+                self._link_after(merged, tail)
+                tail = merged
+            for node in bucket.nodes.values():
+                node.bucket = tail
+                tail.nodes[node.key] = node
+            bucket = bucket.next
+
+    def _buckets(self) -> Iterator[FrequencyBucket]:
+        """
+        Iterate over buckets from lowest to highest frequency.
+        """
+        bucket = self._head
+        while bucket:
+            yield bucket
+            bucket = bucket.next
+
+    def clear(self):
+        """
+        Forget every node.
+        """
+        self._head = None
+        self._accesses = 0
+
+    def stats(self) -> dict:
+        """
+        Return the frequency distribution, grouped into power-of-two ranges
+        ("1", "2-3", "4-7", ...), and the number of decays.
+        """
+        distribution = {}
+        for bucket in self._buckets():
+            low = 1 << (bucket.freq.bit_length() - 1)
+            label = str(low) if low == 1 else f"{low}-{2 * low - 1}"
+            distribution[label] = distribution.get(label, 0) + len(bucket.nodes)
+        return {'lfu_frequency_distribution': distribution, 'lfu_decays': self.decays}
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate from most to least frequently used.
+        """
+        for bucket in reversed(list(self._buckets())):
+            yield from reversed(list(bucket.nodes.values()))
+
+
+class GDSFPolicy(EvictionPolicy):
+    """
+    GreedyDual-Size-Frequency: evict the node with the lowest priority
+    clock + frequency * cost / size, where cost is what put(..., cost=)
+    recorded and size is the node's weight (1 unless max_bytes is set).
+    Each eviction advances the clock to the victim's priority, so entries
+    that stop being accessed age out however expensive they were.
+
+    Priorities live in a lazily invalidated min-heap: a heap entry is stale
+    once its node has been re-prioritized or removed, stale entries are
+    skipped when they reach the top and the heap is rebuilt once they
+    dominate it.
+    """
+    def __init__(self, capacity: int):
+        super().__init__(capacity)
+        self.clock = 0.0
+        self._heap: List[list] = []
+        self._nodes: Dict[str, Any] = {}
+        self._seq = itertools.count()
+
+    def on_insert(self, node: Any):
+        """
+        Give a new node frequency 1 and push its priority.
+        """
+        node.freq = 1
+        self._nodes[node.key] = node
+        self._push(node)
+
+    def on_access(self, node: Any):
+        """
+        Count the access and re-prioritize the node, picking up any new
+        cost or weight from an overwrite.
+        """
+        node.freq += 1
+        self._push(node)
+
+    def on_remove(self, node: Any):
+        """
+        Forget a node; its heap entries become stale.
+        """
+        del self._nodes[node.key]
+        node.gdsf_entry = None
+
+    def choose_victim(self, key: str) -> Optional[Any]:
+        """
+        Return the lowest-priority node and advance the clock to its
+        priority.
+        """
+        heap = self._heap
+        while heap and heap[0][2].gdsf_entry is not heap[0]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        self.clock = heap[0][0]
+        return heap[0][2]
+
+    def _priority(self, node: Any) -> float:
+        return self.clock + node.freq * node.cost / max(node.weight, 1)
+
+    def _push(self, node: Any):
+        """
+        Push a fresh heap entry for a node, invalidating its previous one.
+        """
+        entry = [self._priority(node), next(self._seq), node]
+        node.gdsf_entry = entry
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * len(self._nodes) + 64:
+            self._heap = [n.gdsf_entry for n in self._nodes.values()]
+            heapq.heapify(self._heap)
+
+    def clear(self):
+        """
+        Forget every node and reset the clock.
+        """
+        self._heap.clear()
+        self._nodes.clear()
+        self.clock = 0.0
+
+    def stats(self) -> dict:
+        """
+        Return the inflation clock.
+        """
+        return {'gdsf_clock': round(self.clock, 6)}
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate from highest to lowest priority.
+        """
+        return iter(sorted(self._nodes.values(), key=lambda n: n.gdsf_entry[0], reverse=True))
+
+
+POLICIES: Dict[str, Type[EvictionPolicy]] = {
+    'lru': LRUPolicy,
+    'clock': ClockPolicy,
+    'tinylfu': TinyLFUPolicy,
+    'arc': ARCPolicy,
+    's3fifo': S3FIFOPolicy,
+    'lfu': LFUPolicy,
+    'gdsf': GDSFPolicy,
+}
+
+
+def register_policy(name: str, cls: Type[EvictionPolicy]):
+    """
+    Make a policy class selectable by name through policy=. Raises
+    TypeError if cls leaves any EvictionPolicy hook unimplemented.
+    """
+    if inspect.isabstract(cls):
+        missing = ', '.join(sorted(cls.__abstractmethods__))
+        raise TypeError(f"Policy {cls.__name__} does not implement {missing}")
+    POLICIES[name] = cls
+
+
+def make_policy(policy: Any, capacity: int, options: Optional[dict] = None) -> EvictionPolicy:
+    """
+    Build an eviction policy from its registered name, passing options to
+    its constructor, or return a policy instance as is.
+    """
+    if not isinstance(policy, str):
+        return policy
+    try:
+        cls = POLICIES[policy]
+    except KeyError:
+        raise ValueError(f"Unknown eviction policy: {policy!r}") from None
+    return cls(capacity, **(options or {}))
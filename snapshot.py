@@ -0,0 +1,61 @@
+import math
+import os
+import pickle
+import struct
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+MAGIC = b'LRUSNAP1'
+# Entry count after the magic
+COUNT = struct.Struct('<Q')
+# Per entry: expire_at, stale_at (NaN for None), key length, value length,
+# followed by the UTF-8 key and the pickled value
+RECORD = struct.Struct('<ddII')
+
+Entry = Tuple[str, Any, Optional[float], Optional[float]]
+
+
+def write_snapshot(path: str, entries: Iterable[Entry], count: int):
+    """
+    Write count (key, value, expire_at, stale_at) entries to path. The file
+    is written under a temporary name, synced and then renamed, so a crash
+    leaves the previous snapshot intact.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb', buffering=1 << 20) as f:
+        f.write(MAGIC)
+        f.write(COUNT.pack(count))
+        for key, value, expire_at, stale_at in entries:
+            key_bytes = key.encode('utf-8')
+            value_bytes = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            f.write(RECORD.pack(math.nan if expire_at is None else expire_at,
+                                math.nan if stale_at is None else stale_at,
+                                len(key_bytes), len(value_bytes)))
+            f.write(key_bytes)
+            f.write(value_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str, now: Optional[float] = None) -> Iterator[Entry]:
+    """
+    Yield the (key, value, expire_at, stale_at) entries in a snapshot, in
+    the order written, skipping those that expired before now without
+    unpickling them.
+    """
+    with open(path, 'rb', buffering=1 << 20) as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a cache snapshot")
+        count, = COUNT.unpack(f.read(COUNT.size))
+        for _ in range(count):
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                raise ValueError(f"{path} is truncated")
+            expire_at, stale_at, key_len, value_len = RECORD.unpack(header)
+            if now is not None and expire_at < now:
+                f.seek(key_len + value_len, os.SEEK_CUR)
+                continue
+            key = f.read(key_len).decode('utf-8')
+            value = pickle.loads(f.read(value_len))
+            yield (key, value, None if math.isnan(expire_at) else expire_at,
+                   None if math.isnan(stale_at) else stale_at)
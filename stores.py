@@ -0,0 +1,136 @@
+import pickle
+import queue
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional
+
+# Keys per SELECT ... IN (...), below SQLite's default limit of 999 parameters
+GET_MANY_CHUNK = 500
+
+
+class BackingStore(ABC):
+    """
+    Base class for the stores a cache writes to (write-behind) or reads and
+    writes through. Subclasses implement get_many, put_many and
+    delete_many. Values are never None; a missing key is simply absent.
+    """
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the stored value for key, or None.
+        """
+        return self.get_many([key]).get(key)
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Return a dict of the given keys that are stored.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def put_many(self, items: Dict[str, Any]):
+        """
+        Insert or replace several values.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]):
+        """
+        Delete several keys.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the store's resources.
+        """
+
+
+class SQLiteStore(BackingStore):
+    """
+    Backing store that keeps pickled values in a SQLite table keyed by the
+    cache key. Connections come from a pool of pool_size, opened in WAL
+    mode so that readers do not block on the writer or on each other; path
+    must therefore be a file, not ":memory:".
+    """
+    def __init__(self, path: str, table: str = 'cache', pool_size: int = 4):
+        """
+        Open (or create) the database at path and its key/value table.
+        """
+        self.path = path
+        self.table = table
+        self.pool_size = pool_size
+        self._pool: 'queue.Queue[sqlite3.Connection]' = queue.Queue()
+        for _ in range(pool_size):
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints, and no fsync per commit
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(conn)
+        conn = self._pool.get()
+        try:
+            with conn:
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        finally:
+            self._pool.put(conn)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the stored value for key, or None.
+        """
+        conn = self._pool.get()
+        try:
+            row = conn.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        finally:
+            self._pool.put(conn)
+        return pickle.loads(row[0]) if row else None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Return a dict of the given keys that are stored, querying them in
+        chunks of GET_MANY_CHUNK.
+        """
+        keys = list(keys)
+        rows = []
+        conn = self._pool.get()
+        try:
+            for i in range(0, len(keys), GET_MANY_CHUNK):
+                chunk = keys[i:i + GET_MANY_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                rows.extend(conn.execute(f"SELECT key, value FROM {self.table} WHERE key IN ({marks})",
+                                         chunk).fetchall())
+        finally:
+            self._pool.put(conn)
+        return {key: pickle.loads(value) for key, value in rows}
+
+    def put_many(self, items: Dict[str, Any]):
+        """
+        Insert or replace several values in one transaction.
+        """
+        rows = [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for key, value in items.items()]
+        conn = self._pool.get()
+        try:
+            with conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)", rows)
+        finally:
+            self._pool.put(conn)
+
+    def delete_many(self, keys: Iterable[str]):
+        """
+        Delete several keys in one transaction.
+        """
+        rows = [(key,) for key in keys]
+        conn = self._pool.get()
+        try:
+            with conn:
+                conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", rows)
+        finally:
+            self._pool.put(conn)
+
+    def close(self):
+        """
+        Close every connection in the pool.
+        """
+        for _ in range(self.pool_size):
+            self._pool.get().close()
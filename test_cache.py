@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 import time
 import threading
@@ -7,7 +8,11 @@ import sys
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from cache import ThreadSafeLRUCache
+from cache import MISSING, Node, ThreadSafeLRUCache, ShardedLRUCache, default_weigher
+from expiry import TimingWheelExpiry
+from array_cache import ArrayLRUCache
+from policies import POLICIES, CountMinSketch, EvictionPolicy, register_policy
+from stores import BackingStore, SQLiteStore
 
 @pytest.fixture
 def cache():
@@ -170,3 +175,1823 @@ class TestStatistics:
         stats = cache.get_stats()
         assert stats["expired_removals"] == 1
         assert stats["misses"] == 1
+
+class TestShardedCache:
+    def test_put_get_delete(self):
+        """Test that the sharded cache keeps the single-cache API"""
+        sharded = ShardedLRUCache(max_size=64, num_shards=4)
+        for i in range(20):
+            sharded.put(f"key{i}", f"value{i}")
+        assert sharded.get("key7") == "value7"
+        sharded.delete("key7")
+        assert sharded.get("key7") is None
+        assert len(sharded.get_all()) == 19
+        sharded.clear()
+        assert sharded.get_all() == []
+
+    def test_capacity_split(self):
+        """Test that shard capacities add up to max_size"""
+        sharded = ShardedLRUCache(max_size=10, num_shards=4)
+        assert sum(shard.max_size for shard in sharded.shards) == 10
+        for i in range(100):
+            sharded.put(f"key{i}", i)
+        assert sharded.get_stats()["current_size"] <= 10
+
+    def test_merged_stats(self):
+        """Test that statistics are merged across shards"""
+        sharded = ShardedLRUCache(max_size=16, num_shards=4)
+        sharded.put("key1", "value1")
+        sharded.get("key1")  # Hit
+        sharded.get("key2")  # Miss
+        stats = sharded.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["total_requests"] == 2
+        assert stats["hit_rate"] == 0.5
+        assert stats["num_shards"] == 4
+
+    def test_concurrent_access(self):
+        """Test concurrent puts and gets across shards"""
+        sharded = ShardedLRUCache(max_size=8000, num_shards=8)
+
+        def worker(offset):
+            for i in range(200):
+                sharded.put(f"key{offset}-{i}", i)
+                assert sharded.get(f"key{offset}-{i}") == i
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sharded.get_stats()["current_size"] == 800
+
+    def test_expiry_engine_per_shard(self):
+        """Test that shards get one expiry engine each, and instances are refused"""
+        sharded = ShardedLRUCache(max_size=400, num_shards=4, cleanup_interval=3600,
+                                  expiry=lambda: TimingWheelExpiry(tick=0.01))
+        assert len({id(shard._expiry) for shard in sharded.shards}) == 4
+        for i in range(200):
+            sharded.put(f"key{i}", i, ttl=0.05)
+        time.sleep(0.2)
+        for shard in sharded.shards:
+            with shard.lock:
+                shard._remove_expired(time.time())
+        assert sharded.get_stats()["expired_removals"] == 200
+        sharded.stop_cleanup_thread()
+        with pytest.raises(ValueError):
+            ShardedLRUCache(max_size=100, num_shards=4, expiry=TimingWheelExpiry())
+
+class TestExpiryIndex:
+    def test_background_cleanup_removes_expired(self):
+        """Test that the cleanup thread removes expired keys without a get"""
+        cache = ThreadSafeLRUCache(max_size=10, cleanup_interval=0.1)
+        cache.put("short", "value", ttl=0.2)
+        cache.put("long", "value", ttl=60)
+        cache.put("forever", "value")
+        time.sleep(0.5)
+        stats = cache.get_stats()
+        assert stats["current_size"] == 2
+        assert stats["expired_removals"] == 1
+        assert cache.get("long") == "value"
+        cache.stop_cleanup_thread()
+
+    def test_overwritten_ttl_is_respected(self):
+        """Test that a stale heap entry does not expire a refreshed key"""
+        cache = ThreadSafeLRUCache(max_size=10, cleanup_interval=0.1)
+        cache.put("key1", "value1", ttl=0.2)
+        cache.put("key1", "value2", ttl=60)
+        time.sleep(0.5)
+        assert cache.get("key1") == "value2"
+        assert cache.get_stats()["expired_removals"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_heap_stays_bounded(self):
+        """Test that repeated overwrites do not grow the expiry heap without bound"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        for i in range(10000):
+            cache.put(f"key{i % 5}", i, ttl=60)
+        assert len(cache._expiry._heap) <= 2 * 5 + 64
+
+class TestTimingWheelExpiry:
+    def test_wheel_cleanup_removes_expired(self):
+        """Test that the timing wheel engine expires keys in the background"""
+        cache = ThreadSafeLRUCache(max_size=10, cleanup_interval=0.1,
+                                   expiry=TimingWheelExpiry(tick=0.1))
+        cache.put("short", "value", ttl=0.2)
+        cache.put("long", "value", ttl=60)
+        time.sleep(0.6)
+        stats = cache.get_stats()
+        assert stats["current_size"] == 1
+        assert stats["expired_removals"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_wheel_cancel_on_delete_and_overwrite(self):
+        """Test that delete and overwrite cancel the scheduled expiry"""
+        cache = ThreadSafeLRUCache(max_size=10, expiry="wheel")
+        cache.put("key1", "value1", ttl=30)
+        cache.put("key2", "value2", ttl=30)
+        cache.delete("key1")
+        cache.put("key2", "value2")  # No TTL any more
+        assert len(cache._expiry) == 0
+
+    def test_wheel_cascades_long_ttls(self):
+        """Test that TTLs beyond the first wheel level still fire on time"""
+        wheel = TimingWheelExpiry(tick=1.0)
+        cache = ThreadSafeLRUCache(max_size=10, expiry=wheel)
+        cache.put("key1", "value1", ttl=300)
+        now = time.time()
+        assert cache._remove_expired(now + 299) == 0
+        assert cache._remove_expired(now + 302) == 1
+        assert cache.get_stats()["current_size"] == 0
+
+    def test_unknown_engine(self):
+        """Test that an unknown expiry engine name is rejected"""
+        with pytest.raises(ValueError):
+            ThreadSafeLRUCache(max_size=10, expiry="nope")
+
+class TestBoundedCleanup:
+    def test_sampled_expiry_removes_expired(self):
+        """Test that the sampled engine expires keys in the background"""
+        cache = ThreadSafeLRUCache(max_size=200, cleanup_interval=0.1, expiry="sampled")
+        for i in range(100):
+            cache.put(f"short{i}", i, ttl=0.2)
+        for i in range(50):
+            cache.put(f"long{i}", i, ttl=60)
+        time.sleep(0.6)
+        stats = cache.get_stats()
+        # Sampling stops once few sampled keys are expired, so a handful may linger
+        assert stats["current_size"] < 65
+        assert cache.get("long0") == 0
+        cache.stop_cleanup_thread()
+
+    def test_pass_stops_at_batch_boundary(self):
+        """Test that a pass with no time budget removes a single batch"""
+        cache = ThreadSafeLRUCache(max_size=200, cleanup_batch_size=10, cleanup_max_lock_time=0,
+                                   cleanup_time_budget=0)
+        for i in range(100):
+            cache.put(f"key{i}", i, ttl=0.01)
+        time.sleep(0.05)
+        assert cache._run_cleanup_pass() == 10
+        assert cache.get_stats()["current_size"] == 90
+
+    def test_pass_releases_lock_between_batches(self):
+        """Test that a pass keeps going across batches within its budget"""
+        cache = ThreadSafeLRUCache(max_size=200, cleanup_batch_size=10, cleanup_max_lock_time=0,
+                                   cleanup_time_budget=10)
+        for i in range(100):
+            cache.put(f"key{i}", i, ttl=0.01)
+        time.sleep(0.05)
+        assert cache._run_cleanup_pass() == 100
+        assert cache.get_stats()["max_cleanup_lock_ms"] > 0
+
+class TestArrayLRUCache:
+    def test_put_get_delete(self):
+        """Test basic operations on the array-backed cache"""
+        cache = ArrayLRUCache(max_size=5)
+        cache.put("key1", "value1")
+        cache.put("key2", "value2")
+        assert cache.get("key1") == "value1"
+        cache.delete("key1")
+        assert cache.get("key1") is None
+        assert cache.get_all() == [{"key": "key2", "value": "value2"}]
+
+    def test_eviction_order(self):
+        """Test LRU eviction and slot reuse through the free list"""
+        cache = ArrayLRUCache(max_size=3)
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        cache.get("key0")
+        cache.put("key3", 3)
+        assert cache.get("key1") is None
+        assert [item["key"] for item in cache.get_all()] == ["key3", "key0", "key2"]
+        cache.clear()
+        for i in range(3):
+            cache.put(f"new{i}", i)
+        stats = cache.get_stats()
+        assert stats["current_size"] == 3
+        assert stats["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Test lazy and background expiration"""
+        cache = ArrayLRUCache(max_size=5, cleanup_interval=0.1)
+        cache.put("short", "value", ttl=0.2)
+        cache.put("lazy", "value", ttl=0.2)
+        cache.put("long", "value", ttl=60)
+        cache.put("lazy", "value2", ttl=0.2)
+        time.sleep(0.5)
+        assert cache.get("long") == "value"
+        stats = cache.get_stats()
+        assert stats["current_size"] == 1
+        assert stats["expired_removals"] == 2
+        cache.stop_cleanup_thread()
+
+class TestBatchOperations:
+    def test_get_many(self, cache):
+        """Test that get_many returns found keys and counts every lookup"""
+        cache.put("key1", "value1")
+        cache.put("key2", "value2")
+        assert cache.get_many(["key1", "key2", "key3"]) == {"key1": "value1", "key2": "value2"}
+        stats = cache.get_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+        assert stats["total_requests"] == 3
+
+    def test_put_many_and_delete_many(self, cache):
+        """Test bulk insert with a shared TTL and bulk delete"""
+        cache.put_many({"key1": "value1", "key2": "value2", "key3": "value3"}, ttl=60)
+        assert all(node.expire_at is not None for node in cache.cache.values())
+        cache.delete_many(["key1", "key3", "missing"])
+        assert cache.get_all() == [{"key": "key2", "value": "value2"}]
+
+    def test_get_many_promotes_hits(self, cache):
+        """Test that get_many applies LRU promotion like single gets"""
+        cache.put_many({f"key{i}": i for i in range(5)})
+        cache.get_many(["key0", "key1"])
+        cache.put_many({"key5": 5, "key6": 6})
+        assert cache.get_many(["key0", "key1", "key2", "key3"]) == {"key0": 0, "key1": 1}
+
+    def test_sharded_batch(self):
+        """Test batch operations across shards"""
+        sharded = ShardedLRUCache(max_size=100, num_shards=4)
+        sharded.put_many({f"key{i}": i for i in range(20)})
+        assert sharded.get_many([f"key{i}" for i in range(25)]) == {f"key{i}": i for i in range(20)}
+        sharded.delete_many([f"key{i}" for i in range(10)])
+        assert sharded.get_stats()["current_size"] == 10
+
+class TestReadBuffer:
+    def test_buffered_hits_promote_on_drain(self):
+        """Test that buffered hits are applied before the next eviction"""
+        cache = ThreadSafeLRUCache(max_size=3, read_buffer_size=64)
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        assert cache.get("key0") == 0
+        cache.put("key3", 3)
+        assert cache.get("key1") is None
+        assert cache.get("key0") == 0
+
+    def test_buffered_stats(self):
+        """Test that lock-free hits are counted in the statistics"""
+        cache = ThreadSafeLRUCache(max_size=5, read_buffer_size=4)
+        cache.put("key1", "value1")
+        for _ in range(10):
+            assert cache.get("key1") == "value1"
+        assert cache.get("missing") is None
+        stats = cache.get_stats()
+        assert stats["hits"] == 10
+        assert stats["misses"] == 1
+        assert stats["total_requests"] == 11
+
+    def test_expired_keys_bypass_buffer(self):
+        """Test that an expired key is still removed on get"""
+        cache = ThreadSafeLRUCache(max_size=5, read_buffer_size=64)
+        cache.put("key1", "value1", ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get("key1") is None
+        assert cache.get_stats()["expired_removals"] == 1
+
+    def test_concurrent_buffered_hits(self):
+        """Test that hits from many threads are all counted"""
+        cache = ThreadSafeLRUCache(max_size=10, read_buffer_size=16)
+        for i in range(10):
+            cache.put(f"key{i}", i)
+
+        def reader():
+            for _ in range(200):
+                for i in range(10):
+                    assert cache.get(f"key{i}") == i
+
+        threads = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.get_stats()
+        assert stats["hits"] == 8000
+        assert stats["current_size"] == 10
+
+class TestClockPolicy:
+    def test_second_chance(self):
+        """Test that a referenced entry survives one sweep of the hand"""
+        cache = ThreadSafeLRUCache(max_size=3, policy="clock")
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        cache.get("key0")
+        cache.put("key3", 3)
+        assert cache.get("key1") is None
+        assert cache.get("key0") == 0
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_slot_reuse(self):
+        """Test that deleted and evicted slots are reused"""
+        cache = ThreadSafeLRUCache(max_size=3, policy="clock")
+        for i in range(20):
+            cache.put(f"key{i}", i)
+            if i % 4 == 0:
+                cache.delete(f"key{i}")
+        assert len(cache._policy._slots) == 3
+        assert len(cache.get_all()) == cache.get_stats()["current_size"]
+
+    def test_unknown_policy(self):
+        """Test that an unknown policy name is rejected"""
+        with pytest.raises(ValueError):
+            ThreadSafeLRUCache(max_size=3, policy="nope")
+
+class TestTinyLFUPolicy:
+    def test_scan_does_not_flush_hot_keys(self):
+        """Test that one-off scan keys are refused admission over hot keys"""
+        cache = ThreadSafeLRUCache(max_size=100, policy="tinylfu")
+        for i in range(2000):
+            cache.put(f"scan{i}", i)
+            if cache.get(f"hot{i % 50}") is None:
+                cache.put(f"hot{i % 50}", i)
+        assert all(f"hot{i}" in cache.cache for i in range(50))
+        assert cache.get_stats()["admission_rejections"] > 0
+
+    def test_capacity_respected(self):
+        """Test that the policy keeps the cache at max_size"""
+        cache = ThreadSafeLRUCache(max_size=20, policy="tinylfu")
+        for i in range(500):
+            cache.put(f"key{i % 60}", i)
+            cache.get(f"key{i % 7}")
+        stats = cache.get_stats()
+        assert stats["current_size"] == 20
+        assert len(cache.get_all()) == 20
+
+    def test_sketch_aging(self):
+        """Test that the count-min sketch halves its counters periodically"""
+        sketch = CountMinSketch(capacity=16, sample_factor=10)
+        for _ in range(12):
+            sketch.increment("key")
+        assert sketch.frequency("key") >= 12
+        for i in range(150):
+            sketch.increment(f"other{i}")
+        assert sketch.frequency("key") < 12
+
+class TestARCPolicy:
+    def test_ghost_hit_adapts_target(self):
+        """Test that re-inserting a recently evicted key grows T1's target"""
+        cache = ThreadSafeLRUCache(max_size=4, policy="arc")
+        for key in "ab":
+            cache.put(key, key)
+            cache.get(key)  # Promote to T2
+        for key in "cde":
+            cache.put(key, key)
+        assert cache.get("c") is None
+        assert cache.get_stats()["arc_b1"] == 1
+        cache.put("c", "c")
+        stats = cache.get_stats()
+        assert stats["arc_target_t1"] == 1
+        assert stats["arc_t2"] == 3
+        assert cache.get("c") == "c"
+
+    def test_frequent_keys_survive_scan(self):
+        """Test that keys seen twice are kept over one-off keys"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="arc")
+        for i in range(5):
+            cache.put(f"hot{i}", i)
+            cache.get(f"hot{i}")
+        for i in range(100):
+            cache.put(f"scan{i}", i)
+        assert all(cache.get(f"hot{i}") == i for i in range(5))
+
+    def test_ghost_lists_bounded(self):
+        """Test that ghost lists never exceed the ARC bounds"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="arc")
+        for i in range(2000):
+            cache.put(f"key{(i * 7) % 53}", i)
+            cache.get(f"key{i % 13}")
+        stats = cache.get_stats()
+        assert stats["current_size"] == 10
+        assert stats["arc_t1"] + stats["arc_b1"] <= 11
+        assert stats["arc_t1"] + stats["arc_t2"] + stats["arc_b1"] + stats["arc_b2"] <= 21
+
+class TestS3FIFOPolicy:
+    def test_one_hit_wonders_leave_from_small(self):
+        """Test that keys never read again are evicted before reused ones"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="s3fifo")
+        for i in range(5):
+            cache.put(f"hot{i}", i)
+            cache.get(f"hot{i}")
+            cache.get(f"hot{i}")
+        for i in range(50):
+            cache.put(f"scan{i}", i)
+        assert all(cache.get(f"hot{i}") == i for i in range(5))
+        assert cache.get_stats()["s3fifo_main"] == 5
+
+    def test_ghost_readmits_to_main(self):
+        """Test that a recently evicted key goes straight to main"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="s3fifo")
+        for i in range(11):
+            cache.put(f"key{i}", i)
+        assert cache.get("key0") is None
+        cache.put("key0", 0)
+        assert cache._policy._main.get("key0") is cache.cache["key0"]
+
+    def test_hits_do_not_reorder(self):
+        """Test that get only bumps the frequency counter"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="s3fifo")
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        cache.get("key0")
+        assert list(cache._policy._small) == ["key0", "key1", "key2"]
+        assert cache.cache["key0"].freq == 1
+
+class TestLFUPolicy:
+    def test_evicts_least_frequent(self):
+        """Test that the least frequently used key is evicted first"""
+        cache = ThreadSafeLRUCache(max_size=3, policy="lfu")
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        for _ in range(3):
+            cache.get("key0")
+        cache.get("key2")
+        cache.put("key3", 3)
+        assert cache.get("key1") is None
+        assert cache.get("key0") == 0
+        assert cache.get("key2") == 2
+
+    def test_frequency_distribution(self):
+        """Test that get_stats reports counts per frequency range"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="lfu")
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+        cache.get("b")
+        for _ in range(5):
+            cache.get("c")
+        assert cache.get_stats()["lfu_frequency_distribution"] == {"1": 1, "2-3": 1, "4-7": 1}
+
+    def test_decay_halves_counts(self):
+        """Test that periodic halving lets new keys displace stale favourites"""
+        cache = ThreadSafeLRUCache(max_size=2, policy="lfu", policy_options={"decay_every": 4})
+        cache.put("old", 1)
+        for _ in range(3):
+            cache.get("old")
+        cache.put("new", 2)
+        cache.get("new")  # Fourth access triggers a decay: old 4 -> 2, new 2 -> 1
+        stats = cache.get_stats()
+        assert stats["lfu_decays"] == 1
+        assert stats["lfu_frequency_distribution"] == {"1": 1, "2-3": 1}
+
+    def test_sharded_stats_merge_distribution(self):
+        """Test that sharded stats merge the frequency distributions"""
+        sharded = ShardedLRUCache(max_size=40, num_shards=4, policy="lfu")
+        for i in range(20):
+            sharded.put(f"key{i}", i)
+        assert sharded.get_stats()["lfu_frequency_distribution"] == {"1": 20}
+
+class FIFOPolicy(EvictionPolicy):
+    """Minimal custom policy used to exercise the policy interface"""
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.queue = {}
+
+    def on_insert(self, node):
+        self.queue[node.key] = node
+
+    def on_access(self, node):
+        pass
+
+    def on_remove(self, node):
+        del self.queue[node.key]
+
+    def choose_victim(self, key):
+        return next(iter(self.queue.values()), None)
+
+    def clear(self):
+        self.queue.clear()
+
+    def __iter__(self):
+        return iter(list(self.queue.values()))
+
+class TestPolicyInterface:
+    def test_registered_policy_by_name(self):
+        """Test that a registered policy is selectable by name"""
+        register_policy("fifo", FIFOPolicy)
+        try:
+            cache = ThreadSafeLRUCache(max_size=2, policy="fifo")
+            cache.put("key1", "value1")
+            cache.put("key2", "value2")
+            cache.get("key1")  # FIFO ignores access
+            cache.put("key3", "value3")
+            assert cache.get("key1") is None
+            assert cache.get("key2") == "value2"
+        finally:
+            del POLICIES["fifo"]
+
+    def test_incomplete_policy_is_refused(self):
+        """Test that a policy missing a hook fails when registered or constructed"""
+        class NoVictimPolicy(FIFOPolicy):
+            choose_victim = EvictionPolicy.choose_victim
+
+        with pytest.raises(TypeError):
+            register_policy("novictim", NoVictimPolicy)
+        assert "novictim" not in POLICIES
+        with pytest.raises(TypeError):
+            NoVictimPolicy(2)
+
+    def test_policy_instance(self):
+        """Test that a policy instance can be passed directly"""
+        policy = FIFOPolicy(2)
+        cache = ThreadSafeLRUCache(max_size=2, policy=policy)
+        cache.put("key1", "value1", ttl=0.05)
+        cache.put("key2", "value2")
+        time.sleep(0.1)
+        assert cache.get("key1") is None  # TTL handled by the cache core
+        assert list(policy.queue) == ["key2"]
+        assert cache.get_stats()["expired_removals"] == 1
+
+    def test_foreign_victim_raises(self):
+        """Test that a victim not in the cache raises instead of looping"""
+        class StrangerPolicy(FIFOPolicy):
+            def choose_victim(self, key):
+                return Node("stranger", None, None)
+
+        cache = ThreadSafeLRUCache(max_size=1, policy=StrangerPolicy(1))
+        cache.put("key1", "value1")
+        with pytest.raises(RuntimeError):
+            cache.put("key2", "value2")
+        cache.stop_cleanup_thread()
+
+    def test_sharded_policy_factory(self):
+        """Test that shards get one policy each, and instances are refused"""
+        sharded = ShardedLRUCache(max_size=100, num_shards=4, policy=FIFOPolicy)
+        assert len({id(shard._policy) for shard in sharded.shards}) == 4
+        for i in range(200):
+            sharded.put(f"key{i}", i)
+        assert sharded.get_stats()["current_size"] <= 100
+        sharded.stop_cleanup_thread()
+        with pytest.raises(ValueError):
+            ShardedLRUCache(max_size=100, num_shards=4, policy=FIFOPolicy(100))
+
+    def test_builtin_policies_share_interface(self):
+        """Test that every built-in policy keeps the cache consistent"""
+        for name in ["lru", "clock", "tinylfu", "arc", "s3fifo", "lfu", "gdsf"]:
+            cache = ThreadSafeLRUCache(max_size=8, policy=name)
+            assert isinstance(cache._policy, EvictionPolicy)
+            for i in range(100):
+                cache.put(f"key{i % 20}", i)
+                cache.get(f"key{i % 3}")
+                if i % 9 == 0:
+                    cache.delete(f"key{i % 20}")
+            assert len(cache.get_all()) == cache.get_stats()["current_size"] <= 8
+            cache.stop_cleanup_thread()
+
+
+class TestByteCapacity:
+    def weigh(self, key, value):
+        return len(value)
+
+    def test_evicts_until_weight_fits(self):
+        """Test that inserting frees enough weight first"""
+        cache = ThreadSafeLRUCache(max_size=100, max_bytes=10, weigher=self.weigh)
+        cache.put("a", "xxxx")
+        cache.put("b", "xxxx")
+        cache.put("c", "xxxxxxx")  # needs 'a' and 'b' gone
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        stats = cache.get_stats()
+        assert stats["total_weight"] == 7
+        assert stats["evictions"] == 2
+        cache.stop_cleanup_thread()
+
+    def test_update_and_delete_adjust_weight(self):
+        """Test that overwrites and deletes keep total_weight exact"""
+        cache = ThreadSafeLRUCache(max_size=100, max_bytes=10, weigher=self.weigh)
+        cache.put("a", "xxx")
+        cache.put("b", "xxx")
+        cache.put("a", "xxxxxxx")  # grows to 10 in total
+        assert cache.get_stats()["total_weight"] == 10
+        cache.put("b", "xxxxx")  # evicts 'a'
+        assert cache.get("a") is None
+        assert cache.get_stats()["total_weight"] == 5
+        cache.delete("b")
+        assert cache.get_stats()["total_weight"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_oversize_rejected_without_flush(self):
+        """Test that an entry heavier than max_bytes leaves the cache alone"""
+        cache = ThreadSafeLRUCache(max_size=100, max_bytes=10, weigher=self.weigh)
+        cache.put("a", "xxxx")
+        with pytest.raises(ValueError):
+            cache.put("big", "x" * 11)
+        with pytest.raises(ValueError):
+            cache.put_many({"b": "x", "big": "x" * 11})
+        assert cache.get("a") == "xxxx"
+        assert cache.get("b") is None
+        stats = cache.get_stats()
+        assert stats["oversize_rejections"] == 2
+        assert stats["evictions"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_default_weigher(self):
+        """Test that the default weigher follows containers"""
+        small = default_weigher("k", "v")
+        blob = default_weigher("k", {"data": ["x" * 1000, "y" * 1000]})
+        assert 0 < small < blob
+        assert blob > 2000
+        cache = ThreadSafeLRUCache(max_size=100, max_bytes=5000)
+        for i in range(10):
+            cache.put(f"key{i}", "x" * 1000)
+        assert 0 < cache.get_stats()["total_weight"] <= 5000
+        assert cache.get("key9") is not None
+        cache.stop_cleanup_thread()
+
+    def test_default_weigher_is_bounded(self):
+        """Test that the default weigher samples large containers and counts shared objects once"""
+        rows = [{"id": i, "name": f"user{i}"} for i in range(100000)]
+        start = time.perf_counter()
+        weight = default_weigher("k", rows)
+        assert time.perf_counter() - start < 0.05
+        exact = sys.getsizeof(rows) + sum(
+            sys.getsizeof(row) + sys.getsizeof(row["id"]) + sys.getsizeof(row["name"]) for row in rows)
+        assert exact * 0.5 < weight < exact * 1.5
+        shared = "x" * 1000
+        assert default_weigher("k", [shared] * 2) < default_weigher("k", [shared, "y" * 1000])
+
+    def test_sharded_splits_budget(self):
+        """Test that max_bytes is divided between shards"""
+        cache = ShardedLRUCache(max_size=100, num_shards=4, max_bytes=40, weigher=self.weigh)
+        assert [shard.max_bytes for shard in cache.shards] == [10, 10, 10, 10]
+        for i in range(50):
+            cache.put(f"key{i}", "xxx")
+        assert cache.get_stats()["total_weight"] <= 40
+        cache.stop_cleanup_thread()
+
+
+class TestGDSFPolicy:
+    def test_keeps_expensive_entries(self):
+        """Test that cheap entries are evicted before expensive ones"""
+        cache = ThreadSafeLRUCache(max_size=3, policy="gdsf")
+        cache.put("expensive", 1, cost=100)
+        cache.put("cheap1", 2, cost=1)
+        cache.put("cheap2", 3, cost=1)
+        cache.put("cheap3", 4, cost=1)
+        assert cache.get("expensive") == 1
+        assert cache.get("cheap1") is None
+        cache.stop_cleanup_thread()
+
+    def test_frequency_and_size(self):
+        """Test that priority grows with hits and shrinks with weight"""
+        cache = ThreadSafeLRUCache(max_size=100, max_bytes=30, policy="gdsf",
+                                   weigher=lambda key, value: len(value))
+        cache.put("big", "x" * 20, cost=10)   # priority 10 / 20
+        cache.put("small", "x" * 5, cost=10)  # priority 10 / 5
+        cache.put("new", "x" * 8, cost=10)
+        assert cache.get("big") is None
+        assert cache.get("small") is not None
+        cache.stop_cleanup_thread()
+
+    def test_clock_ages_out_idle_entries(self):
+        """Test that the inflation clock lets new entries displace stale ones"""
+        cache = ThreadSafeLRUCache(max_size=2, policy="gdsf")
+        cache.put("old", 0, cost=5)
+        for i in range(10):
+            cache.put(f"key{i}", i, cost=1)
+            cache.get(f"key{i}")
+        assert cache.get("old") is None
+        assert cache.get_stats()["gdsf_clock"] > 0
+        cache.stop_cleanup_thread()
+
+    def test_heap_stays_bounded(self):
+        """Test that stale heap entries are compacted"""
+        cache = ThreadSafeLRUCache(max_size=10, policy="gdsf")
+        for i in range(10):
+            cache.put(f"key{i}", i)
+        for _ in range(1000):
+            cache.get("key0")
+        assert len(cache._policy._heap) <= 2 * 10 + 65
+        assert [item["key"] for item in cache.get_all()][0] == "key0"
+        cache.stop_cleanup_thread()
+
+
+class TestGetOrLoad:
+    def test_loads_once_and_caches(self):
+        """Test that a miss runs the loader and later calls hit"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        calls = []
+        loader = lambda key: calls.append(key) or f"loaded-{key}"
+        assert cache.get_or_load("key1", loader) == "loaded-key1"
+        assert cache.get_or_load("key1", loader) == "loaded-key1"
+        assert calls == ["key1"]
+        assert cache.get_stats()["loads"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_concurrent_misses_coalesce(self):
+        """Test that concurrent callers share one loader call"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        calls = []
+        release = threading.Event()
+
+        def loader(key):
+            calls.append(key)
+            release.wait(5)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("hot", loader)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while cache.get_stats()["coalesced_waits"] < 7:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == ["hot"]
+        assert results == ["value"] * 8
+        stats = cache.get_stats()
+        assert stats["loads"] == 1
+        assert stats["coalesced_waits"] == 7
+        assert stats["misses"] == 8
+        assert not cache._inflight
+        cache.stop_cleanup_thread()
+
+    def test_loader_error_reaches_waiters(self):
+        """Test that a failing load raises in every coalesced caller"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        started = threading.Event()
+        release = threading.Event()
+
+        def loader(key):
+            started.set()
+            release.wait(5)
+            raise KeyError(key)
+
+        errors = []
+
+        def call():
+            try:
+                cache.get_or_load("key1", loader)
+            except KeyError as exc:
+                errors.append(exc)
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=call)
+        waiter.start()
+        while cache.get_stats()["coalesced_waits"] < 1:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        waiter.join()
+        assert len(errors) == 2
+        assert cache.get_stats()["load_failures"] == 1
+        assert cache.get("key1") is None
+        # The failed load is forgotten, so the next call retries
+        assert cache.get_or_load("key1", lambda key: "ok") == "ok"
+        cache.stop_cleanup_thread()
+
+    def test_inflight_table_bounded(self):
+        """Test that callers load directly once the in-flight table is full"""
+        cache = ThreadSafeLRUCache(max_size=10, max_inflight=1)
+        inner = []
+
+        def loader(key):
+            # While "outer" is in flight the table is full
+            inner.append(cache.get_or_load("inner", lambda k: "inner-value"))
+            return "outer-value"
+
+        assert cache.get_or_load("outer", loader) == "outer-value"
+        assert inner == ["inner-value"]
+        stats = cache.get_stats()
+        assert stats["inflight_overflows"] == 1
+        assert stats["loads"] == 2
+        cache.stop_cleanup_thread()
+
+    def test_ttl_applies(self):
+        """Test that loaded values expire"""
+        cache = ShardedLRUCache(max_size=10, num_shards=2)
+        cache.get_or_load("key1", lambda key: "v1", ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get_or_load("key1", lambda key: "v2") == "v2"
+        cache.stop_cleanup_thread()
+
+
+class TestAsyncGetOrLoad:
+    def test_concurrent_coroutines_coalesce(self):
+        """Test that concurrent coroutines share one async loader call"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            return f"loaded-{key}"
+
+        async def main():
+            return await asyncio.gather(*(cache.aget_or_load("hot", loader) for _ in range(20)))
+
+        assert asyncio.run(main()) == ["loaded-hot"] * 20
+        assert calls == ["hot"]
+        stats = cache.get_stats()
+        assert stats["loads"] == 1
+        assert stats["coalesced_waits"] == 19
+        assert cache.get("hot") == "loaded-hot"
+        assert not cache._async_inflight
+        cache.stop_cleanup_thread()
+
+    def test_loader_error_reaches_waiters(self):
+        """Test that an async loader exception is raised in every coroutine"""
+        cache = ThreadSafeLRUCache(max_size=10)
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            raise KeyError(key)
+
+        async def main():
+            return await asyncio.gather(*(cache.aget_or_load("key1", loader) for _ in range(3)),
+                                        return_exceptions=True)
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, KeyError) for result in results)
+        assert cache.get_stats()["load_failures"] == 1
+        assert not cache._async_inflight
+        cache.stop_cleanup_thread()
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        """Test that cancelling the coroutine that started a load spares the others"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            return "loaded"
+
+        async def main():
+            leader = asyncio.ensure_future(cache.aget_or_load("key1", loader))
+            await asyncio.sleep(0)
+            waiters = [asyncio.ensure_future(cache.aget_or_load("key1", loader)) for _ in range(5)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*waiters)
+            assert leader.cancelled()
+            return results
+
+        assert asyncio.run(main()) == ["loaded"] * 5
+        assert calls == ["key1"]
+        assert cache.get("key1") == "loaded"
+        assert not cache._async_inflight
+        cache.stop_cleanup_thread()
+
+    def test_write_during_load_wins(self):
+        """Test that a put during an async load is not overwritten by it"""
+        cache = ThreadSafeLRUCache(max_size=10)
+
+        async def loader(key):
+            await asyncio.sleep(0.05)
+            return "old"
+
+        async def main():
+            load = asyncio.ensure_future(cache.aget_or_load("key1", loader))
+            await asyncio.sleep(0.01)
+            cache.put("key1", "new")
+            return await load
+
+        assert asyncio.run(main()) == "old"
+        assert cache.get("key1") == "new"
+        cache.stop_cleanup_thread()
+
+    def test_contended_lock_does_not_block_loop(self):
+        """Test that the event loop keeps running while another thread holds the lock"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put("key1", "value1")
+
+        async def loader(key):
+            return "unused"
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            task = asyncio.create_task(ticker())
+            value = await cache.aget_or_load("key1", loader)
+            task.cancel()
+            return value, ticks
+
+        holder_ready = threading.Event()
+
+        def hold_lock():
+            with cache.lock:
+                holder_ready.set()
+                time.sleep(0.2)
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        holder_ready.wait(5)
+        value, ticks = asyncio.run(main())
+        holder.join()
+        assert value == "value1"
+        assert ticks >= 5
+        cache.stop_cleanup_thread()
+
+
+class TestEarlyRefresh:
+    def test_hit_near_expiry_refreshes_in_background(self):
+        """Test that hits keep returning the cached value while one refresh runs"""
+        cache = ThreadSafeLRUCache(max_size=10, early_refresh_beta=1e6)
+        versions = iter(range(100))
+        release = threading.Event()
+
+        def loader(key):
+            version = next(versions)
+            if version:
+                release.wait(5)
+            else:
+                time.sleep(0.01)  # recorded as the recompute time
+            return version
+
+        assert cache.get_or_load("key1", loader, ttl=60) == 0
+        for _ in range(10):
+            assert cache.get_or_load("key1", loader, ttl=60) == 0
+        assert cache.get_stats()["early_refreshes"] == 1
+        release.set()
+        deadline = time.time() + 5
+        while cache.get("key1") != 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get("key1") == 1
+        assert cache.get_stats()["loads"] == 2
+        cache.stop_cleanup_thread()
+
+    def test_disabled_by_default(self):
+        """Test that entries are not refreshed without early_refresh_beta"""
+        cache = ThreadSafeLRUCache(max_size=10)
+
+        def loader(key):
+            time.sleep(0.01)
+            return "value"
+
+        for _ in range(10):
+            cache.get_or_load("key1", loader, ttl=60)
+        assert cache.get_stats()["early_refreshes"] == 0
+        assert cache.get_stats()["loads"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_far_from_expiry_rarely_refreshes(self):
+        """Test that a small beta leaves fresh entries alone"""
+        cache = ThreadSafeLRUCache(max_size=10, early_refresh_beta=1.0)
+        cache.get_or_load("key1", lambda key: "value", ttl=3600)
+        for _ in range(100):
+            cache.get_or_load("key1", lambda key: "value", ttl=3600)
+        assert cache.get_stats()["early_refreshes"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_async_refresh(self):
+        """Test that aget_or_load refreshes early in a background task"""
+        cache = ThreadSafeLRUCache(max_size=10, early_refresh_beta=1e6)
+        versions = iter(range(100))
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            return next(versions)
+
+        async def main():
+            first = await cache.aget_or_load("key1", loader, ttl=60)
+            during = [await cache.aget_or_load("key1", loader, ttl=60) for _ in range(5)]
+            await asyncio.sleep(0.1)
+            return first, during, await cache.aget_or_load("key1", loader, ttl=60)
+
+        first, during, after = asyncio.run(main())
+        assert first == 0
+        assert during == [0] * 5
+        assert after == 1
+        assert cache.get_stats()["early_refreshes"] >= 1
+        cache.stop_cleanup_thread()
+
+
+class TestStaleWhileRevalidate:
+    def test_serves_stale_then_expires(self):
+        """Test that an entry is served stale for stale_ttl, then removed"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put("key1", "value1", ttl=0.05, stale_ttl=0.2)
+        assert cache.get("key1") == "value1"
+        time.sleep(0.1)
+        assert cache.get("key1") == "value1"
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["stale_hits"] == 1
+        assert stats["hit_rate"] == 1.0
+        time.sleep(0.2)
+        assert cache.get("key1") is None
+        cache.stop_cleanup_thread()
+
+    def test_cleanup_uses_hard_expiry(self):
+        """Test that the expiry engines keep stale entries until stale_ttl ends"""
+        for engine in ["heap", "wheel", "sampled"]:
+            cache = ThreadSafeLRUCache(max_size=10, expiry=engine, cleanup_interval=3600)
+            cache.put("key1", "value1", ttl=1, stale_ttl=10)
+            with cache.lock:
+                assert cache._remove_expired(time.time() + 5) == 0
+                assert cache._remove_expired(time.time() + 12) == 1
+            cache.stop_cleanup_thread()
+
+    def test_no_refresh_after_shutdown(self):
+        """Test that stale hits after the refresh pool is gone neither raise nor wedge the key"""
+        cache = ThreadSafeLRUCache(max_size=10, loader=lambda key: "fresh")
+        cache.put("key0", "value0", ttl=0.01, stale_ttl=10)
+        time.sleep(0.05)
+        cache.get("key0")  # creates the refresh pool
+        cache._refresh_pool.shutdown(wait=True)
+        cache.put("key1", "value1", ttl=0.01, stale_ttl=10)
+        time.sleep(0.05)
+        assert cache.get("key1") == "value1"
+        assert "key1" not in cache._inflight
+        cache.stop_cleanup_thread()
+        cache.put("key2", "value2", ttl=0.01, stale_ttl=10)
+        time.sleep(0.05)
+        assert cache.get("key2") == "value2"
+        assert not cache._inflight
+
+    def test_registered_loader_refreshes_once(self):
+        """Test that stale hits trigger one background refresh"""
+        release = threading.Event()
+        calls = []
+
+        def loader(key):
+            calls.append(key)
+            release.wait(5)
+            return "fresh"
+
+        cache = ThreadSafeLRUCache(max_size=10, loader=loader, refresh_workers=2)
+        cache.put("key1", "stale", ttl=0.05, stale_ttl=5)
+        time.sleep(0.1)
+        for _ in range(10):
+            assert cache.get("key1") == "stale"
+        release.set()
+        deadline = time.time() + 5
+        while cache.get("key1") != "fresh" and time.time() < deadline:
+            time.sleep(0.01)
+        assert calls == ["key1"]
+        stats = cache.get_stats()
+        assert stats["stale_refreshes"] == 1
+        assert stats["stale_hits"] >= 10
+        # The refreshed entry keeps its stale window
+        assert cache.cache["key1"].stale_ttl == 5
+        cache.stop_cleanup_thread()
+
+    def test_get_or_load_refreshes_stale(self):
+        """Test that get_or_load returns a stale value and refreshes it"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        versions = iter(range(100))
+        loader = lambda key: next(versions)
+        assert cache.get_or_load("key1", loader, ttl=0.05, stale_ttl=5) == 0
+        time.sleep(0.1)
+        assert cache.get_or_load("key1", loader, ttl=0.05, stale_ttl=5) == 0
+        deadline = time.time() + 5
+        while cache.get("key1") != 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get_stats()["loads"] == 2
+        cache.stop_cleanup_thread()
+
+    def test_aget_or_load_refreshes_stale(self):
+        """Test that aget_or_load returns a stale value and refreshes it with its own loader"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        versions = iter(range(100))
+
+        async def loader(key):
+            await asyncio.sleep(0.01)
+            return next(versions)
+
+        async def main():
+            first = await cache.aget_or_load("key1", loader, ttl=0.05, stale_ttl=5)
+            await asyncio.sleep(0.1)
+            during = [await cache.aget_or_load("key1", loader, ttl=0.05, stale_ttl=5) for _ in range(3)]
+            stats = cache.get_stats()
+            await asyncio.sleep(0.03)
+            return first, during, stats, cache.get("key1")
+
+        first, during, stats, after = asyncio.run(main())
+        assert first == 0
+        assert during == [0] * 3
+        assert stats["stale_hits"] == 3
+        assert stats["stale_refreshes"] == 1
+        assert after == 1
+        assert cache.get_stats()["loads"] == 2
+        cache.stop_cleanup_thread()
+
+
+class TestRefreshAhead:
+    def test_hit_after_refresh_after_reloads(self):
+        """Test that an old but fresh entry is reloaded once in the background"""
+        versions = iter(range(100))
+        cache = ThreadSafeLRUCache(max_size=10, loader=lambda key: next(versions), refresh_after=0.05)
+        cache.register_refresh("key1")
+        cache.put("key1", "initial", ttl=10)
+        assert cache.get("key1") == "initial"
+        assert cache.get_stats()["refresh_aheads"] == 0
+        time.sleep(0.1)
+        for _ in range(5):
+            cache.get("key1")
+        deadline = time.time() + 5
+        while cache.get("key1") != 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get("key1") == 0
+        stats = cache.get_stats()
+        assert stats["refresh_aheads"] == 1
+        assert stats["stale_hits"] == 0
+        assert cache.cache["key1"].written_at > time.time() - 1
+        cache.stop_cleanup_thread()
+
+    def test_expired_entry_is_a_miss(self):
+        """Test that refresh-ahead does not extend an entry past its TTL"""
+        cache = ThreadSafeLRUCache(max_size=10, loader=lambda key: "reloaded", refresh_after=0.02)
+        cache.register_refresh("key1")
+        cache.put("key1", "value1", ttl=0.05)
+        time.sleep(0.1)
+        assert cache.get("key1") is None
+        assert cache.get_stats()["refresh_aheads"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_rate_limited(self):
+        """Test that refresh_rate caps refresh-ahead reloads"""
+        cache = ThreadSafeLRUCache(max_size=10, loader=lambda key: "reloaded", refresh_after=0.01,
+                                   refresh_rate=1)
+        for i in range(3):
+            cache.register_refresh(f"key{i}")
+            cache.put(f"key{i}", "value", ttl=10)
+        time.sleep(0.05)
+        for i in range(3):
+            cache.get(f"key{i}")
+        stats = cache.get_stats()
+        assert stats["refresh_aheads"] == 1
+        assert stats["refresh_ahead_throttled"] == 2
+        cache.stop_cleanup_thread()
+
+    def test_get_or_load_uses_its_loader(self):
+        """Test that get_or_load reloads due entries with its own loader"""
+        cache = ThreadSafeLRUCache(max_size=10, refresh_after=0.05)
+        cache.register_refresh("key1")
+        versions = iter(range(100))
+        loader = lambda key: next(versions)
+        assert cache.get_or_load("key1", loader, ttl=10) == 0
+        time.sleep(0.1)
+        assert cache.get_or_load("key1", loader, ttl=10) == 0
+        deadline = time.time() + 5
+        while cache.get("key1") != 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get("key1") == 1
+        assert cache.get_stats()["refresh_aheads"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_aget_or_load_uses_its_loader(self):
+        """Test that aget_or_load reloads due entries with its async loader"""
+        cache = ThreadSafeLRUCache(max_size=10, refresh_after=0.05)
+        cache.register_refresh("key1")
+        versions = iter(range(100))
+
+        async def loader(key):
+            return next(versions)
+
+        async def main():
+            first = await cache.aget_or_load("key1", loader, ttl=10)
+            await asyncio.sleep(0.1)
+            during = await cache.aget_or_load("key1", loader, ttl=10)
+            await asyncio.sleep(0.01)
+            return first, during, cache.get("key1")
+
+        assert asyncio.run(main()) == (0, 0, 1)
+        assert cache.get_stats()["refresh_aheads"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_only_registered_keys(self):
+        """Test that unregistered keys are left to expire and unregistering stops reloads"""
+        cache = ThreadSafeLRUCache(max_size=10, loader=lambda key: "reloaded", refresh_after=0.02)
+        cache.register_refresh("hot")
+        for key in ["hot", "cold", "gone"]:
+            cache.put(key, "value", ttl=10)
+        cache.register_refresh("gone")
+        cache.put("gone", "value", ttl=10)
+        cache.unregister_refresh("gone")
+        time.sleep(0.05)
+        for key in ["hot", "cold", "gone"]:
+            cache.get(key)
+        assert cache.get_stats()["refresh_aheads"] == 1
+        assert cache.cache["cold"].refresh_at is None
+        cache.stop_cleanup_thread()
+        plain = ThreadSafeLRUCache(max_size=10)
+        with pytest.raises(ValueError):
+            plain.register_refresh("key1")
+        plain.stop_cleanup_thread()
+
+    def test_sharded_register(self):
+        """Test that a sharded cache registers keys in their shard"""
+        cache = ShardedLRUCache(max_size=100, num_shards=4, loader=lambda key: "reloaded",
+                                refresh_after=0.02)
+        cache.register_refresh("key1")
+        cache.put("key1", "value", ttl=10)
+        cache.put("key2", "value", ttl=10)
+        time.sleep(0.05)
+        cache.get("key1")
+        cache.get("key2")
+        assert cache.get_stats()["refresh_aheads"] == 1
+        cache.stop_cleanup_thread()
+
+
+class TestNegativeCaching:
+    def test_put_missing(self):
+        """Test that negative entries answer get and expire on their own TTL"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put("key1", "value1")
+        cache.put_missing("key1", ttl=0.05)
+        assert cache.get("key1") is None
+        stats = cache.get_stats()
+        assert stats["negative_hits"] == 1
+        assert stats["misses"] == 0
+        assert stats["current_size"] == 0
+        time.sleep(0.1)
+        assert cache.get("key1") is None
+        assert cache.get_stats()["misses"] == 1
+        assert cache.get_stats()["negative_size"] == 0
+        cache.stop_cleanup_thread()
+
+    def test_loader_sentinel_skips_reloads(self):
+        """Test that a loader returning MISSING is not called again"""
+        cache = ThreadSafeLRUCache(max_size=10, negative_ttl=60)
+        calls = []
+        loader = lambda key: calls.append(key) or MISSING
+        assert cache.get_or_load("ghost", loader) is None
+        assert cache.get_or_load("ghost", loader) is None
+        assert calls == ["ghost"]
+        assert cache.get_stats()["negative_hits"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_async_loader_sentinel(self):
+        """Test that aget_or_load stores MISSING as a negative entry"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        calls = []
+
+        async def loader(key):
+            calls.append(key)
+            return MISSING
+
+        async def main():
+            return [await cache.aget_or_load("ghost", loader) for _ in range(3)]
+
+        assert asyncio.run(main()) == [None] * 3
+        assert calls == ["ghost"]
+        cache.stop_cleanup_thread()
+
+    def test_separate_capacity(self):
+        """Test that negative entries never evict values"""
+        cache = ThreadSafeLRUCache(max_size=3, negative_max_size=2)
+        for i in range(3):
+            cache.put(f"key{i}", i)
+        for i in range(5):
+            cache.put_missing(f"ghost{i}")
+        stats = cache.get_stats()
+        assert stats["current_size"] == 3
+        assert stats["negative_size"] == 2
+        assert stats["evictions"] == 0
+        assert [cache.get(f"key{i}") for i in range(3)] == [0, 1, 2]
+        cache.get("ghost0")  # evicted from the negative LRU
+        assert cache.get_stats()["misses"] == 1
+        cache.stop_cleanup_thread()
+
+    def test_put_and_delete_clear_negative(self):
+        """Test that storing or deleting a key drops its negative entry"""
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put_missing("key1")
+        cache.put("key1", "value1")
+        assert cache.get("key1") == "value1"
+        cache.put_missing("key2")
+        cache.delete("key2")
+        assert cache.get_or_load("key2", lambda key: "loaded") == "loaded"
+        assert cache.get_stats()["negative_size"] == 0
+        cache.stop_cleanup_thread()
+
+
+class RecordingStore:
+    """In-memory store that records every batch and can fail or block"""
+    def __init__(self):
+        self.data = {}
+        self.batches = []
+        self.fail_next = False
+        self.down = False
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def put_many(self, items):
+        self.gate.wait(5)
+        self.calls += 1
+        if self.fail_next or self.down:
+            self.fail_next = False
+            raise IOError("store unavailable")
+        self.batches.append(dict(items))
+        self.data.update(items)
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class TestWriteBehind:
+    def test_coalesces_and_flushes_to_sqlite(self, tmp_path):
+        """Test that repeated writes to a key reach SQLite once"""
+        store = SQLiteStore(str(tmp_path / "cache.db"))
+        cache = ThreadSafeLRUCache(max_size=100, store=store, write_behind=True, flush_interval=60)
+        for i in range(100):
+            cache.put(f"key{i % 5}", i)
+        assert cache.get("key4") == 99  # memory is updated immediately
+        assert store.get("key4") is None
+        cache.flush()
+        assert [store.get(f"key{i}") for i in range(5)] == [95, 96, 97, 98, 99]
+        stats = cache.get_stats()
+        assert stats["write_behind_coalesced"] == 95
+        assert stats["write_behind_flushed_keys"] == 5
+        assert stats["write_behind_pending"] == 0
+        cache.delete("key0")
+        cache.stop_cleanup_thread()  # flushes on shutdown
+        assert store.get("key0") is None
+        assert store.get("key1") == 96
+        store.close()
+
+    def test_flushes_when_batch_is_full(self):
+        """Test that flush_size pending keys wake the flusher before the interval"""
+        store = RecordingStore()
+        cache = ThreadSafeLRUCache(max_size=100, store=store, write_behind=True,
+                                   flush_size=10, flush_interval=60)
+        cache.put_many({f"key{i}": i for i in range(10)})
+        deadline = time.time() + 5
+        while not store.batches and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(store.batches[0]) == 10
+        assert cache.get_stats()["max_write_behind_lag_ms"] > 0
+        cache.stop_cleanup_thread()
+
+    def test_backpressure(self):
+        """Test that writers block while the queue is full"""
+        store = RecordingStore()
+        store.gate.clear()
+        cache = ThreadSafeLRUCache(max_size=100, store=store, write_behind=True,
+                                   flush_size=2, flush_interval=60, max_pending=2)
+        cache.put("key0", 0)
+        cache.put("key1", 1)  # the flusher takes these and blocks in the store
+        deadline = time.time() + 5
+        while cache.get_stats()["write_behind_pending"] and time.time() < deadline:
+            time.sleep(0.01)
+        cache.put("key2", 2)
+        cache.put("key3", 3)
+        done = threading.Event()
+        writer = threading.Thread(target=lambda: (cache.put("key4", 4), done.set()))
+        writer.start()
+        assert not done.wait(0.1)
+        assert cache.get_stats()["write_behind_waits"] == 1
+        store.gate.set()
+        writer.join(5)
+        assert done.is_set()
+        cache.stop_cleanup_thread()
+        assert store.data == {f"key{i}": i for i in range(5)}
+
+    def test_failed_flush_is_retried(self):
+        """Test that a batch the store rejects stays queued"""
+        store = RecordingStore()
+        store.fail_next = True
+        cache = ThreadSafeLRUCache(max_size=100, store=store, write_behind=True, flush_interval=60)
+        cache.put("key1", "value1")
+        cache.flush()
+        stats = cache.get_stats()
+        assert stats["write_behind_errors"] == 1
+        assert stats["write_behind_pending"] == 1
+        cache.put("key2", "value2")
+        cache.flush()
+        assert store.data == {"key1": "value1", "key2": "value2"}
+        cache.stop_cleanup_thread()
+
+    def test_backs_off_while_store_is_down(self):
+        """Test that a failing store is retried after growing delays, not in a loop"""
+        store = RecordingStore()
+        store.down = True
+        cache = ThreadSafeLRUCache(max_size=100, store=store, write_behind=True,
+                                   flush_size=2, flush_interval=0.05)
+        for i in range(10):
+            cache.put(f"key{i}", i)
+        time.sleep(0.5)
+        # Retries after about 0.05, 0.1, 0.2 s: a handful, not thousands
+        assert 2 <= store.calls <= 6
+        store.down = False
+        deadline = time.time() + 5
+        while cache.get_stats()["write_behind_pending"] and time.time() < deadline:
+            time.sleep(0.05)
+        assert len(store.data) == 10
+        cache.stop_cleanup_thread()
+
+    def test_requires_store(self):
+        """Test that write_behind needs a store"""
+        with pytest.raises(ValueError):
+            ThreadSafeLRUCache(max_size=10, write_behind=True)
+
+
+class DictStore(BackingStore):
+    """BackingStore over a dict that records every call and can block reads"""
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_many(self, keys):
+        self.calls.append(("get_many", list(keys)))
+        self.gate.wait(5)
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def put_many(self, items):
+        self.calls.append(("put_many", dict(items)))
+        self.data.update(items)
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        self.calls.append(("delete_many", keys))
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class TestReadThrough:
+    def test_incomplete_store_is_refused(self):
+        """Test that a store missing part of the interface cannot be constructed"""
+        class ReadOnlyStore(BackingStore):
+            def get_many(self, keys):
+                return {}
+
+        with pytest.raises(TypeError):
+            ReadOnlyStore()
+
+    def test_reads_and_writes_through_sqlite(self, tmp_path):
+        """Test that misses load from SQLite and writes reach it at once"""
+        store = SQLiteStore(str(tmp_path / "cache.db"))
+        store.put_many({"key1": "value1"})
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        assert cache.get("key1") == "value1"
+        assert cache.get("key1") == "value1"
+        cache.put("key2", {"a": 1})
+        assert store.get("key2") == {"a": 1}
+        cache.delete("key1")
+        assert store.get("key1") is None
+        assert cache.get("key1") is None
+        stats = cache.get_stats()
+        assert stats["store_reads"] == 2
+        assert stats["store_writes"] == 2
+        cache.stop_cleanup_thread()
+        store.close()
+
+    def test_store_misses_are_cached_as_negative(self):
+        """Test that a key the store lacks is not looked up again"""
+        store = DictStore()
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        assert cache.get("ghost") is None
+        assert cache.get("ghost") is None
+        assert store.calls == [("get_many", ["ghost"])]
+        assert cache.get_stats()["negative_hits"] == 1
+        cache.put("ghost", "boo")
+        assert cache.get("ghost") == "boo"
+        cache.stop_cleanup_thread()
+
+    def test_get_many_batches_misses(self):
+        """Test that get_many fetches all misses in one store call"""
+        store = DictStore({f"key{i}": i for i in range(5)})
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        cache.put("key0", 0)
+        store.calls.clear()
+        assert cache.get_many(["key0", "key1", "key2", "nope"]) == {"key0": 0, "key1": 1, "key2": 2}
+        assert store.calls == [("get_many", ["key1", "key2", "nope"])]
+        assert cache.get_many(["key1", "key2", "nope"]) == {"key1": 1, "key2": 2}
+        assert len(store.calls) == 1
+        cache.stop_cleanup_thread()
+
+    def test_get_many_skips_oversize_values(self):
+        """Test that a value too heavy to cache does not fail or wedge the batch"""
+        store = DictStore({"big": "x" * 1000, "ok": "small"})
+        cache = ThreadSafeLRUCache(max_size=10, max_bytes=500, store=store)
+        assert cache.get_many(["big", "ok"]) == {"big": "x" * 1000, "ok": "small"}
+        assert cache._inflight == {}
+        assert "big" not in cache.cache
+        assert cache.get("ok") == "small"
+        cache.stop_cleanup_thread()
+
+    def test_get_many_respects_max_inflight(self):
+        """Test that get_many registers misses only up to max_inflight and fetches the rest too"""
+        store = DictStore({f"key{i}": i for i in range(0, 100, 2)})
+        store.gate.clear()
+        cache = ThreadSafeLRUCache(max_size=200, max_inflight=16, store=store)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(cache.get_many([f"key{i}" for i in range(100)])))
+        thread.start()
+        time.sleep(0.1)
+        assert len(cache._inflight) == 16
+        store.gate.set()
+        thread.join()
+        assert results == [{f"key{i}": i for i in range(0, 100, 2)}]
+        assert len(store.calls) == 1
+        assert cache._inflight == {}
+        stats = cache.get_stats()
+        assert stats["inflight_overflows"] == 84
+        assert stats["loads"] == 100
+        assert cache.get("key98") == 98
+        assert cache.get("key99") is None
+        assert store.calls == [("get_many", [f"key{i}" for i in range(100)])]
+        cache.stop_cleanup_thread()
+
+    def test_concurrent_misses_share_one_read(self):
+        """Test that get calls missing the same key read the store once"""
+        store = DictStore({"key1": "value1"})
+        store.gate.clear()
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get("key1"))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        store.gate.set()
+        for thread in threads:
+            thread.join()
+        assert results == ["value1"] * 5
+        assert store.calls == [("get_many", ["key1"])]
+        cache.stop_cleanup_thread()
+
+    def test_write_during_load_wins(self):
+        """Test that a put during a store read is not overwritten by it"""
+        store = DictStore({"key1": "old"})
+        store.gate.clear()
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        reader = threading.Thread(target=cache.get, args=("key1",))
+        reader.start()
+        time.sleep(0.05)
+        cache.put("key1", "new")
+        store.gate.set()
+        reader.join()
+        assert cache.get("key1") == "new"
+        assert store.data["key1"] == "new"
+        cache.stop_cleanup_thread()
+
+    def test_get_or_load_uses_its_own_loader(self):
+        """Test that get_or_load's loader replaces the store read"""
+        store = DictStore({"key1": "stored"})
+        cache = ThreadSafeLRUCache(max_size=10, store=store)
+        assert cache.get_or_load("key1", lambda key: "loaded") == "loaded"
+        assert store.calls == []
+        cache.stop_cleanup_thread()
+
+    def test_sqlite_get_many_in_chunks(self, tmp_path):
+        """Test that SQLiteStore.get_many handles more keys than one query takes"""
+        store = SQLiteStore(str(tmp_path / "cache.db"), pool_size=2)
+        store.put_many({f"key{i}": i for i in range(1200)})
+        found = store.get_many([f"key{i}" for i in range(0, 1300)])
+        assert len(found) == 1200
+        assert found["key1199"] == 1199
+        conn = store._pool.get()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        store._pool.put(conn)
+        store.close()
+
+
+class TestSnapshot:
+    def test_round_trip(self, tmp_path):
+        """Test that load restores values, TTLs and LRU order"""
+        path = str(tmp_path / "cache.snap")
+        cache = ThreadSafeLRUCache(max_size=3)
+        cache.put("key1", {"a": [1, 2]})
+        cache.put("key2", "value2", ttl=60)
+        cache.put("key3", 3)
+        cache.get("key1")  # key2 is now least recently used
+        assert cache.snapshot(path) == 3
+
+        restored = ThreadSafeLRUCache(max_size=3)
+        assert restored.load(path) == 3
+        assert restored.get("key1") == {"a": [1, 2]}
+        assert restored.cache["key2"].expire_at == cache.cache["key2"].expire_at
+        restored.put("key4", "value4")
+        assert restored.get("key2") is None
+        assert restored.get("key3") == 3
+        assert restored.get_stats()["current_size"] == 3
+        cache.stop_cleanup_thread()
+        restored.stop_cleanup_thread()
+
+    def test_skips_expired_entries(self, tmp_path):
+        """Test that entries expired by load time are not restored"""
+        path = str(tmp_path / "cache.snap")
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put("short", "gone", ttl=0.1)
+        cache.put("long", "kept", ttl=60)
+        cache.snapshot(path)
+        time.sleep(0.2)
+        restored = ThreadSafeLRUCache(max_size=10)
+        assert restored.load(path) == 1
+        assert restored.get("short") is None
+        assert restored.get("long") == "kept"
+        cache.stop_cleanup_thread()
+        restored.stop_cleanup_thread()
+
+    def test_keeps_stale_window(self, tmp_path):
+        """Test that an entry with stale_ttl comes back with its stale period"""
+        path = str(tmp_path / "cache.snap")
+        cache = ThreadSafeLRUCache(max_size=10)
+        cache.put("key1", "value1", ttl=60, stale_ttl=30)
+        cache.snapshot(path)
+        restored = ThreadSafeLRUCache(max_size=10)
+        restored.load(path)
+        node, original = restored.cache["key1"], cache.cache["key1"]
+        assert (node.stale_at, node.expire_at) == (original.stale_at, original.expire_at)
+        cache.stop_cleanup_thread()
+        restored.stop_cleanup_thread()
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that load refuses a file that is not a snapshot"""
+        path = tmp_path / "junk.snap"
+        path.write_bytes(b"not a snapshot")
+        cache = ThreadSafeLRUCache(max_size=10)
+        with pytest.raises(ValueError):
+            cache.load(str(path))
+        cache.stop_cleanup_thread()
+
+    def test_sharded_round_trip(self, tmp_path):
+        """Test snapshot and load across shards"""
+        path = str(tmp_path / "cache.snap")
+        cache = ShardedLRUCache(max_size=100, num_shards=4)
+        for i in range(50):
+            cache.put(f"key{i}", i)
+        assert cache.snapshot(path) == 50
+        restored = ShardedLRUCache(max_size=100, num_shards=4)
+        assert restored.load(path) == 50
+        assert restored.get_many([f"key{i}" for i in range(50)]) == {f"key{i}": i for i in range(50)}
+        cache.stop_cleanup_thread()
+        restored.stop_cleanup_thread()
+
+
+class TestOpLog:
+    def test_replay_rebuilds_cache(self, tmp_path):
+        """Test that a new cache replays puts, deletes and clears in order"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        cache.put("gone", 0)
+        cache.clear()
+        cache.put("key1", "value1")
+        cache.put_many({"key2": [2], "key3": 3})
+        cache.put("key1", "updated", ttl=60)
+        cache.delete("key3")
+        cache.put("key4", "alice")
+        cache.put_missing("key4")
+        cache.stop_cleanup_thread()
+
+        restored = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        assert restored.get_many(["gone", "key1", "key2", "key3", "key4"]) == {"key1": "updated", "key2": [2]}
+        assert restored.cache["key1"].expire_at == cache.cache["key1"].expire_at
+        restored.stop_cleanup_thread()
+
+    def test_skips_expired_puts(self, tmp_path):
+        """Test that a put whose TTL ran out is not replayed"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        cache.put("key1", "old")
+        cache.put("key1", "short", ttl=0.1)
+        cache.stop_cleanup_thread()
+        time.sleep(0.2)
+        restored = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        assert restored.get("key1") is None
+        restored.stop_cleanup_thread()
+
+    def test_truncates_torn_tail(self, tmp_path):
+        """Test that a half-written last record is cut off and appends continue"""
+        path = tmp_path / "cache.log"
+        cache = ThreadSafeLRUCache(max_size=10, oplog_path=str(path))
+        cache.put("key1", "value1")
+        cache.stop_cleanup_thread()
+        good_size = path.stat().st_size
+        with open(path, "ab") as f:
+            f.write(b"\x01partial record")
+        restored = ThreadSafeLRUCache(max_size=10, oplog_path=str(path))
+        assert path.stat().st_size == good_size
+        restored.put("key2", "value2")
+        restored.stop_cleanup_thread()
+        again = ThreadSafeLRUCache(max_size=10, oplog_path=str(path))
+        assert again.get_many(["key1", "key2"]) == {"key1": "value1", "key2": "value2"}
+        again.stop_cleanup_thread()
+
+    def test_always_fsync_groups_commits(self, tmp_path):
+        """Test that fsync='always' syncs before put returns, once per batch"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=1000, oplog_path=path, oplog_fsync="always")
+
+        def writer(n):
+            for i in range(50):
+                cache.put(f"key{n}-{i}", i)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.get_stats()
+        assert stats["oplog_records"] == 400
+        assert stats["oplog_pending"] == 0
+        assert stats["oplog_fsyncs"] == stats["oplog_batches"]
+        cache.stop_cleanup_thread()
+
+    def test_compaction_keeps_live_state(self, tmp_path):
+        """Test that compaction shrinks the log without losing writes"""
+        path = tmp_path / "cache.log"
+        cache = ThreadSafeLRUCache(max_size=100, oplog_path=str(path), oplog_fsync="no")
+        for i in range(1000):
+            cache.put(f"key{i % 10}", i)
+        cache.delete("key0")
+        while cache.get_stats()["oplog_pending"]:
+            time.sleep(0.01)
+        before = path.stat().st_size
+        thread = threading.Thread(target=lambda: [cache.put("busy", i) for i in range(2000)])
+        thread.start()
+        cache.compact()
+        thread.join()
+        cache.compact()
+        cache.stop_cleanup_thread()
+        assert path.stat().st_size < before
+        assert cache.get_stats()["oplog_compactions"] == 2
+
+        restored = ThreadSafeLRUCache(max_size=100, oplog_path=str(path))
+        assert restored.get_many([f"key{i}" for i in range(10)]) == {f"key{i}": 990 + i for i in range(1, 10)}
+        assert restored.get("busy") == 1999
+        restored.stop_cleanup_thread()
+
+    def test_compaction_copies_in_chunks(self, tmp_path):
+        """Test that compaction holds the lock per chunk and keeps writes made between chunks"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=5000, oplog_path=path, oplog_fsync="no")
+        cache.put_many({f"key{i}": i for i in range(3000)})
+        copy = cache._oplog._live_entries
+        chunks = []
+
+        def live_entries(keys):
+            # Runs under the lock; change a key in a chunk still to come
+            chunks.append(len(keys))
+            cache.put(f"key{len(chunks) * 1000 + 1}", "changed")
+            cache.delete(f"key{len(chunks) * 1000 + 2}")
+            return copy(keys)
+
+        cache._oplog._live_entries = live_entries
+        cache.compact()
+        assert chunks == [1000, 1000, 1000]
+        assert cache.get_stats()["oplog_max_lock_ms"] > 0
+        expected = {key: cache.get(key) for key in cache.cache}
+        cache.stop_cleanup_thread()
+        restored = ThreadSafeLRUCache(max_size=5000, oplog_path=path)
+        assert {key: restored.get(key) for key in restored.cache} == expected
+        assert restored.get("key1001") == "changed"
+        assert restored.get("key1002") is None
+        restored.stop_cleanup_thread()
+
+    def test_close_waits_for_compaction(self, tmp_path):
+        """Test that closing the log lets a running compaction finish first"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=10, oplog_path=path, oplog_fsync="no")
+        cache.put("key1", "value1")
+        copy = cache._oplog._live_entries
+        started = threading.Event()
+
+        def slow_live_entries(keys):
+            started.set()
+            time.sleep(0.2)
+            return copy(keys)
+
+        cache._oplog._live_entries = slow_live_entries
+        thread = threading.Thread(target=cache.compact)
+        thread.start()
+        started.wait(5)
+        cache.stop_cleanup_thread()
+        assert not thread.is_alive()
+        assert cache.get_stats()["oplog_compactions"] == 1
+        assert cache._oplog._file.closed
+        thread.join()
+        restored = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        assert restored.get("key1") == "value1"
+        restored.stop_cleanup_thread()
+
+    def test_compacts_automatically(self, tmp_path):
+        """Test that the log is rewritten once it outgrows oplog_compact_size"""
+        path = str(tmp_path / "cache.log")
+        cache = ThreadSafeLRUCache(max_size=10, oplog_path=path, oplog_fsync="no", oplog_compact_size=4096)
+        for i in range(2000):
+            cache.put("key1", i)
+        deadline = time.time() + 5
+        while cache.get_stats()["oplog_compactions"] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert cache.get_stats()["oplog_compactions"] >= 1
+        cache.stop_cleanup_thread()
+        restored = ThreadSafeLRUCache(max_size=10, oplog_path=path)
+        assert restored.get("key1") == 1999
+        restored.stop_cleanup_thread()
+
+    def test_rejects_bad_options(self, tmp_path):
+        """Test that an unknown fsync policy and a sharded cache are refused"""
+        threads = threading.active_count()
+        with pytest.raises(ValueError):
+            ThreadSafeLRUCache(max_size=10, oplog_path=str(tmp_path / "a.log"), oplog_fsync="sometimes")
+        assert threading.active_count() == threads
+        assert not (tmp_path / "a.log").exists()
+        with pytest.raises(ValueError):
+            ShardedLRUCache(max_size=10, oplog_path=str(tmp_path / "b.log"))
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+PUT = 'put'
+DELETE = 'delete'
+
+
+class WriteBehindQueue:
+    """
+    Coalescing queue of cache mutations that a flusher thread writes to a
+    store in batches.
+
+    Only the latest mutation per key is kept, so a key updated many times
+    between flushes costs one store write. The flusher wakes up every
+    flush_interval seconds, or as soon as flush_size keys are pending, and
+    writes pending keys in batches of flush_size with store.put_many and
+    store.delete_many. A failed batch is put back (unless the key changed
+    again meanwhile) and the flusher backs off: it retries after
+    flush_interval, doubling the wait after each further failure up to
+    MAX_BACKOFF times flush_interval. Writers wait for room once
+    max_pending keys are queued.
+    """
+    MAX_BACKOFF = 32
+
+    def __init__(self, store: Any, flush_size: int = 100, flush_interval: float = 1.0,
+                 max_pending: int = 10000):
+        self.store = store
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        # key -> (op, value, enqueued_at); enqueued_at is the oldest unflushed change
+        self._pending: 'OrderedDict[str, Tuple[str, Any, float]]' = OrderedDict()
+        # Held while a batch is written, so that batches reach the store in order
+        self._flush_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'flushed_keys': 0,
+            'flush_errors': 0,
+            'backpressure_waits': 0,
+            'max_lag': 0.0
+        }
+        # Consecutive failed batches, for the flusher's backoff
+        self._failures = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def wait_for_room(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block while the queue is full. Returns False on timeout.
+        """
+        with self._cond:
+            if len(self._pending) < self.max_pending:
+                return True
+            self.stats['backpressure_waits'] += 1
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: len(self._pending) < self.max_pending or self._closed,
+                                       timeout)
+
+    def enqueue(self, key: str, op: str, value: Any = None):
+        """
+        Record the latest mutation of key. Does not block; callers apply
+        backpressure with wait_for_room first.
+        """
+        with self._cond:
+            self.stats['enqueued'] += 1
+            previous = self._pending.get(key)
+            if previous is not None:
+                self.stats['coalesced'] += 1
+                self._pending[key] = (op, value, previous[2])
+            else:
+                self._pending[key] = (op, value, time.time())
+                if len(self._pending) >= self.flush_size:
+                    self._cond.notify_all()
+
+    def flush(self):
+        """
+        Write every pending mutation now, in the caller's thread. Stops
+        early if the store fails.
+        """
+        while self._flush_batch():
+            pass
+
+    def close(self):
+        """
+        Stop the flusher thread after writing everything still pending.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+    def pending(self) -> int:
+        """
+        Return the number of keys waiting to be written.
+        """
+        with self._cond:
+            return len(self._pending)
+
+    def metrics(self) -> dict:
+        """
+        Return the queue's statistics as reported by the cache's get_stats:
+        counters, the longest flush lag seen (first change to written) and
+        the age of the oldest change still pending, both in milliseconds.
+        """
+        with self._cond:
+            oldest = min((entry[2] for entry in self._pending.values()), default=None)
+            age = time.time() - oldest if oldest is not None else 0.0
+            return {
+                'write_behind_pending': len(self._pending),
+                'write_behind_enqueued': self.stats['enqueued'],
+                'write_behind_coalesced': self.stats['coalesced'],
+                'write_behind_flushes': self.stats['flushes'],
+                'write_behind_flushed_keys': self.stats['flushed_keys'],
+                'write_behind_errors': self.stats['flush_errors'],
+                'write_behind_waits': self.stats['backpressure_waits'],
+                'max_write_behind_lag_ms': round(self.stats['max_lag'] * 1000, 3),
+                'max_write_behind_age_ms': round(age * 1000, 3)
+            }
+
+    def _run(self):
+        """
+        Flusher thread: flush on interval or once flush_size keys pile up.
+        """
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._pending) >= min(self.flush_size, self.max_pending),
+                                    self.flush_interval)
+                if self._closed:
+                    return
+            while self._flush_batch():
+                pass
+            if self._failures:
+                backoff = self.flush_interval * min(2 ** (self._failures - 1), self.MAX_BACKOFF)
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, backoff)
+
+    def _flush_batch(self) -> bool:
+        """
+        Take up to flush_size pending mutations and write them. Returns
+        False when there was nothing to write or the store failed.
+        """
+        with self._flush_lock:
+            return self._write_batch()
+
+    def _write_batch(self) -> bool:
+        """
+        Body of _flush_batch; caller must hold the flush lock.
+        """
+        with self._cond:
+            if not self._pending:
+                return False
+            batch: List[Tuple[str, Tuple[str, Any, float]]] = []
+            while self._pending and len(batch) < self.flush_size:
+                batch.append(self._pending.popitem(last=False))
+            self._cond.notify_all()
+        puts: Dict[str, Any] = {key: entry[1] for key, entry in batch if entry[0] == PUT}
+        deletes = [key for key, entry in batch if entry[0] == DELETE]
+        try:
+            if puts:
+                self.store.put_many(puts)
+            if deletes:
+                self.store.delete_many(deletes)
+        except Exception:
+            with self._cond:
+                self.stats['flush_errors'] += 1
+                self._failures += 1
+                for key, entry in reversed(batch):
+                    if key not in self._pending:
+                        self._pending[key] = entry
+                        self._pending.move_to_end(key, last=False)
+            return False
+        now = time.time()
+        lag = now - min(entry[2] for _, entry in batch)
+        with self._cond:
+            self._failures = 0
+            self.stats['flushes'] += 1
+            self.stats['flushed_keys'] += len(batch)
+            self.stats['max_lag'] = max(self.stats['max_lag'], lag)
+        return True